@@ -16,6 +16,7 @@
 """
 """
 # ==============================================================================
+import sys
 import numpy
 from Cython.Build import cythonize
 from setuptools import setup, find_packages, Extension, Command
@@ -29,6 +30,13 @@ package_dir = dict([('', pkg_root_dir)] +
                    [(pkg, pkg_root_dir + "/" + pkg.replace('.', '/'))
                     for pkg in top_pkgs])
 
+# OpenMP is used by the native kernels when the compiler supports it
+if sys.platform.startswith('linux'):
+    openmp_args = ['-fopenmp']
+elif sys.platform == 'win32':
+    openmp_args = ['/openmp']
+else:
+    openmp_args = []
 
 extentions = [
     Extension('openalea.phenomenal.segmentation._c_skeleton',
@@ -38,8 +46,11 @@ extentions = [
         language="c++"),
     Extension('openalea.phenomenal.multi_view_reconstruction._c_mvr',
         sources=['src/openalea/phenomenal/multi_view_reconstruction/src/c_mvr.pyx',
-                 'src/openalea/phenomenal/multi_view_reconstruction/src/integral_image.cpp'],
+                 'src/openalea/phenomenal/multi_view_reconstruction/src/integral_image.cpp',
+                 'src/openalea/phenomenal/multi_view_reconstruction/src/projection.cpp'],
         include_dirs=[numpy.get_include()],
+        extra_compile_args=openmp_args,
+        extra_link_args=openmp_args,
         language="c++")
         ]
 
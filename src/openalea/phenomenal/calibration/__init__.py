@@ -31,6 +31,14 @@ Calibration
    CalibrationCameraTop
    CalibrationCameraSideWith2TargetYXZ
 
+Calibration cache
+=================
+.. autosummary::
+   :toctree: generated/
+
+   calibrate_cached
+   calibration_key
+
 Frame
 =====
 .. autosummary::
@@ -45,6 +53,7 @@ Frame
 from __future__ import division, print_function, absolute_import
 
 from .calibration import *
+from .calibration_cache import *
 from .calibration_manual import *
 from .calibration_opencv import *
 from .chessboard import *
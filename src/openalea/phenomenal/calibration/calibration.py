@@ -15,6 +15,8 @@ from __future__ import division, print_function, absolute_import
 
 import json
 import math
+import multiprocessing
+import concurrent.futures
 import numpy
 import scipy.optimize
 
@@ -153,6 +155,251 @@ class CalibrationCamera(object):
 
         return Frame(rot[:3, :3].T, origin)
 
+    @staticmethod
+    def arr_target_points_global_3d(pos_x, pos_y, pos_z,
+                                    rot_x, rot_y, rot_z,
+                                    alphas, points_local_3d):
+        """ Compute the global coordinates of the target points for several
+        angles, vectorized version of target_frame(..., alpha).global_point
+
+        Args:
+         - alphas (numpy.ndarray): (N, ) angles of the target in radians
+         - points_local_3d (numpy.ndarray): (M, 3) points in the target frame
+
+        return:
+         - (numpy.ndarray): (N, M, 3) points in the global frame
+        """
+        rot = concatenate_matrices(rotation_matrix(rot_x, x_axis),
+                                   rotation_matrix(rot_y, y_axis))
+
+        pts = numpy.dot(numpy.asarray(points_local_3d, dtype=float),
+                        rot[:3, :3].T)
+
+        alphas = numpy.asarray(alphas, dtype=float)[:, numpy.newaxis]
+        cos_alpha, sin_alpha = numpy.cos(alphas), numpy.sin(alphas)
+        cos_rot, sin_rot = numpy.cos(alphas + rot_z), numpy.sin(alphas + rot_z)
+
+        points = numpy.empty((alphas.shape[0], pts.shape[0], 3))
+        points[..., 0] = (cos_rot * pts[:, 0] - sin_rot * pts[:, 1] +
+                          pos_x * cos_alpha - pos_y * sin_alpha)
+        points[..., 1] = (sin_rot * pts[:, 0] + cos_rot * pts[:, 1] +
+                          pos_x * sin_alpha + pos_y * cos_alpha)
+        points[..., 2] = pts[:, 2] + pos_z
+
+        return points
+
+    @staticmethod
+    def arr_frame_pixel_coordinates(fr_cam, points_3d,
+                                    width_image, height_image,
+                                    focal_length_x, focal_length_y):
+        """ Compute image coordinates of 3d points with a camera frame
+
+        Args:
+         - points_3d (numpy.ndarray): (..., 3) points in the global frame
+
+        return:
+         - (numpy.ndarray): (..., 2) coordinates of the points in image in pix
+        """
+        pts = numpy.dot(points_3d - fr_cam.origin(),
+                        fr_cam.rotation_to_local().T)
+
+        pixels = pts[..., :2] / pts[..., 2:]
+        pixels *= (focal_length_x, focal_length_y)
+        pixels += (width_image / 2.0, height_image / 2.0)
+
+        return pixels
+
+    @staticmethod
+    def stack_target_points_2d(ref_target_points_2d, number_of_points):
+        """ Stack the target points detected for each angle
+
+        Args:
+         - ref_target_points_2d dict of (angle, list of pts): the M points
+                    of the target in the picture taken with a given angle
+         - number_of_points (int): M
+
+        return:
+         - (numpy.ndarray): (N, ) angles in degrees
+         - (numpy.ndarray): (N, M, 2) points in image in pix
+        """
+        angles = numpy.array(list(ref_target_points_2d.keys()), dtype=float)
+        points_2d = numpy.array(list(ref_target_points_2d.values()),
+                                dtype=float).reshape(
+            (len(angles), number_of_points, 2))
+
+        return angles, points_2d
+
+    @staticmethod
+    def target_residuals(fr_cam,
+                         width_image, height_image,
+                         focal_length_x, focal_length_y,
+                         target_pos_x, target_pos_y, target_pos_z,
+                         target_rot_x, target_rot_y, target_rot_z,
+                         angle_factor,
+                         ref_angles, ref_points_2d, ref_points_local_3d):
+        """ Differences between the projection of the target points and the
+        points detected in the pictures, for all the angles at once.
+
+        Args:
+         - ref_angles, ref_points_2d: as returned by stack_target_points_2d
+         - ref_points_local_3d (numpy.ndarray): (M, 3) points in the
+                    target frame
+
+        return:
+         - (numpy.ndarray): (N * M * 2, ) residuals in pix, the (u, v)
+                    differences of each point of each angle
+        """
+        points_3d = CalibrationCamera.arr_target_points_global_3d(
+            target_pos_x, target_pos_y, target_pos_z,
+            target_rot_x, target_rot_y, target_rot_z,
+            numpy.radians(ref_angles * angle_factor),
+            ref_points_local_3d)
+
+        pixels = CalibrationCamera.arr_frame_pixel_coordinates(
+            fr_cam, points_3d,
+            width_image, height_image,
+            focal_length_x, focal_length_y)
+
+        return (pixels - ref_points_2d).ravel()
+
+    @staticmethod
+    def target_jacobian(parameters, cam_origin_axis,
+                        ref_angles, ref_points_local_3d):
+        """ Jacobian of target_residuals, in closed form
+
+        Args:
+         - parameters (sequence): the 15 parameters
+                    (cam_focal_length_x, cam_focal_length_y,
+                     cam_pos_x, cam_pos_y, cam_pos_z,
+                     cam_rot_x, cam_rot_y, cam_rot_z,
+                     angle_factor,
+                     target_pos_x, target_pos_y, target_pos_z,
+                     target_rot_x, target_rot_y, target_rot_z)
+         - cam_origin_axis (numpy.ndarray): 4x4 matrix of camera_frame
+         - ref_angles (numpy.ndarray): (N, ) angles in degrees
+         - ref_points_local_3d (numpy.ndarray): (M, 3) points in the
+                    target frame
+
+        return:
+         - (numpy.ndarray): (N * M * 2, 15) derivatives of the residuals
+                    with respect to the parameters, in the order of
+                    target_residuals
+        """
+        focal_length_x, focal_length_y, \
+            cam_pos_x, cam_pos_y, cam_pos_z, \
+            cam_rot_x, cam_rot_y, cam_rot_z, \
+            angle_factor, \
+            target_pos_x, target_pos_y, target_pos_z, \
+            target_rot_x, target_rot_y, target_rot_z = parameters
+
+        # Derivative of a rotation matrix around axis : skew(axis) . R
+        def skew(axis):
+            return numpy.cross(numpy.eye(3), axis)
+
+        def rot(angle, axis):
+            return rotation_matrix(angle, axis)[:3, :3]
+
+        # Camera frame, axes = (O . Rx . Ry . Rz)^T
+        origin_axis = numpy.asarray(cam_origin_axis, dtype=float)[:3, :3]
+        cam_rx = rot(cam_rot_x, x_axis)
+        cam_ry = rot(cam_rot_y, y_axis)
+        cam_rz = rot(cam_rot_z, z_axis)
+
+        axes = numpy.linalg.multi_dot(
+            [origin_axis, cam_rx, cam_ry, cam_rz]).T
+        d_axes = [
+            numpy.linalg.multi_dot(
+                [origin_axis, skew(x_axis), cam_rx, cam_ry, cam_rz]).T,
+            numpy.linalg.multi_dot(
+                [origin_axis, cam_rx, skew(y_axis), cam_ry, cam_rz]).T,
+            numpy.linalg.multi_dot(
+                [origin_axis, cam_rx, cam_ry, skew(z_axis), cam_rz]).T]
+
+        # Target points, g = Rz(alpha + rot_z) . Rx . Ry . p + origin(alpha)
+        pts = numpy.asarray(ref_points_local_3d, dtype=float)
+        target_rx = rot(target_rot_x, x_axis)
+        target_ry = rot(target_rot_y, y_axis)
+
+        q = numpy.dot(pts, numpy.dot(target_rx, target_ry).T)
+        dq_rot_x = numpy.dot(
+            pts, numpy.linalg.multi_dot([skew(x_axis), target_rx,
+                                         target_ry]).T)
+        dq_rot_y = numpy.dot(
+            pts, numpy.linalg.multi_dot([target_rx, skew(y_axis),
+                                         target_ry]).T)
+
+        d_alphas = numpy.radians(numpy.asarray(ref_angles, dtype=float))
+        alphas = (d_alphas * angle_factor)[:, numpy.newaxis]
+        cos_alpha, sin_alpha = numpy.cos(alphas), numpy.sin(alphas)
+        cos_rot = numpy.cos(alphas + target_rot_z)
+        sin_rot = numpy.sin(alphas + target_rot_z)
+
+        def rotate_z(v):
+            out = numpy.empty((alphas.shape[0], v.shape[0], 3))
+            out[..., 0] = cos_rot * v[:, 0] - sin_rot * v[:, 1]
+            out[..., 1] = sin_rot * v[:, 0] + cos_rot * v[:, 1]
+            out[..., 2] = v[:, 2]
+            return out
+
+        g = rotate_z(q)
+        dg_rot_z = numpy.zeros_like(g)
+        dg_rot_z[..., 0] = - g[..., 1]
+        dg_rot_z[..., 1] = g[..., 0]
+
+        g[..., 0] += target_pos_x * cos_alpha - target_pos_y * sin_alpha
+        g[..., 1] += target_pos_x * sin_alpha + target_pos_y * cos_alpha
+        g[..., 2] += target_pos_z
+
+        dg_alpha = dg_rot_z.copy()
+        dg_alpha[..., 0] -= target_pos_x * sin_alpha + target_pos_y * cos_alpha
+        dg_alpha[..., 1] += target_pos_x * cos_alpha - target_pos_y * sin_alpha
+        dg_angle_factor = dg_alpha * d_alphas[:, numpy.newaxis, numpy.newaxis]
+
+        dg_pos = numpy.zeros((3, alphas.shape[0], 1, 3))
+        dg_pos[0, :, :, 0], dg_pos[0, :, :, 1] = cos_alpha, sin_alpha
+        dg_pos[1, :, :, 0], dg_pos[1, :, :, 1] = - sin_alpha, cos_alpha
+        dg_pos[2, :, :, 2] = 1.0
+
+        # Points in the camera frame and derivative of the projection
+        g_cam = g - (cam_pos_x, cam_pos_y, cam_pos_z)
+        local = numpy.dot(g_cam, axes.T)
+        x_z = local[..., 0] / local[..., 2]
+        y_z = local[..., 1] / local[..., 2]
+        inv_z = 1.0 / local[..., 2]
+
+        def d_pixels(d_local):
+            d_local = numpy.broadcast_to(d_local, local.shape)
+            return (focal_length_x * inv_z * (d_local[..., 0] -
+                                              x_z * d_local[..., 2]),
+                    focal_length_y * inv_z * (d_local[..., 1] -
+                                              y_z * d_local[..., 2]))
+
+        jacobian = numpy.zeros(local.shape[:2] + (2, 15))
+        jacobian[..., 0, 0] = x_z
+        jacobian[..., 1, 1] = y_z
+
+        columns = [- axes[:, 0], - axes[:, 1], - axes[:, 2]]
+        columns += [numpy.dot(g_cam, d.T) for d in d_axes]
+        columns += [numpy.dot(dg_angle_factor, axes.T)]
+        columns += [numpy.dot(dg_pos[i], axes.T) for i in range(3)]
+        columns += [numpy.dot(rotate_z(dq_rot_x), axes.T),
+                    numpy.dot(rotate_z(dq_rot_y), axes.T),
+                    numpy.dot(dg_rot_z, axes.T)]
+
+        for i, d_local in enumerate(columns):
+            du, dv = d_pixels(d_local)
+            jacobian[..., 0, i + 2] = du
+            jacobian[..., 1, i + 2] = dv
+
+        return jacobian.reshape((-1, 15))
+
+    @staticmethod
+    def residuals_error(residuals):
+        """ Sum of the distances in pix between the projected and the
+        detected points, residuals as returned by target_residuals """
+        residuals = residuals.reshape((-1, 2))
+        return numpy.sqrt(numpy.einsum('ij,ij->i', residuals, residuals)).sum()
+
     @staticmethod
     def camera_frame(pos_x, pos_y, pos_z,
                      rot_x, rot_y, rot_z,
@@ -175,25 +422,66 @@ class CalibrationCamera(object):
             self._cam_rot_x, self._cam_rot_y, self._cam_rot_z,
             self._cam_origin_axis)
 
-    def get_projection(self, alpha):
+    @staticmethod
+    def arr_projection_matrix_coordinates(points_3d, projection_matrix,
+                                          out=None):
+        """ Compute image coordinates of 3d points with a projection matrix
+
+        Args:
+         - points_3d (numpy.ndarray): (N, 3) points in the world frame
+         - projection_matrix (numpy.ndarray): 3x4 homogeneous projection
+                    matrix (see get_projection_matrix)
+         - out (numpy.ndarray): optional (N, 2) float array where the
+                    result is written
+
+        return:
+         - (numpy.ndarray): (N, 2) coordinates of the points in image in pix
+        """
+        uvw = numpy.dot(points_3d, projection_matrix[:, :3].T)
+        uvw += projection_matrix[:, 3]
+
+        if out is None:
+            out = numpy.empty((uvw.shape[0], 2), dtype=uvw.dtype)
+
+        return numpy.divide(uvw[:, :2], uvw[:, 2:], out=out)
+
+    def get_projection_matrix(self, alpha):
+        """ Return the 3x4 projection matrix P of the camera for the angle
+        alpha, such that for a world point (x, y, z) :
+        (u * w, v * w, w) = P . (x, y, z, 1)
+        """
 
         fr_cam = self.get_camera_frame()
 
         angle = math.radians(alpha * self._angle_factor)
+        cos_angle, sin_angle = math.cos(angle), math.sin(angle)
+
+        # Rotation of the world (the plant rotate, not the camera) and
+        # inversion of the X axis orientation
+        rotation = numpy.array([[-cos_angle, -sin_angle, 0.0],
+                                [-sin_angle, cos_angle, 0.0],
+                                [0.0, 0.0, 1.0]])
+
+        axes = fr_cam.rotation_to_local()
+        extrinsic = numpy.column_stack((numpy.dot(axes, rotation),
+                                        - numpy.dot(axes, fr_cam.origin())))
+
+        intrinsic = numpy.array(
+            [[self._cam_focal_length_x, 0.0, self._cam_width_image / 2.0],
+             [0.0, self._cam_focal_length_y, self._cam_height_image / 2.0],
+             [0.0, 0.0, 1.0]])
 
-        def projection(pts):
+        return numpy.dot(intrinsic, extrinsic)
 
-            x = - pts[:, 0] * math.cos(angle) - pts[:, 1] * math.sin(angle)
-            y = - pts[:, 0] * math.sin(angle) + pts[:, 1] * math.cos(angle)
-            z = pts[:, 2]
+    def get_projection(self, alpha):
+
+        projection_matrix = self.get_projection_matrix(alpha)
 
-            origin = numpy.column_stack((x, y, z))
+        def projection(pts, out=None):
+            return self.arr_projection_matrix_coordinates(
+                pts, projection_matrix, out=out)
 
-            return self.arr_pixel_coordinates(fr_cam.arr_local_point(origin),
-                                              self._cam_width_image,
-                                              self._cam_height_image,
-                                              self._cam_focal_length_x,
-                                              self._cam_focal_length_y)
+        projection.projection_matrix = projection_matrix
 
         return projection
 
@@ -908,6 +1196,7 @@ class CalibrationCameraSideWith1Target(CalibrationCamera):
         self._ref_target_points_local_3d = None
         self._ref_number = None
         self._ref_target_points_2d = None
+        self._ref_target_stack = None
 
         self._cam_pos_z = 0.0
         self._cam_origin_axis = numpy.array([[0., 0., 1., 0.],
@@ -936,9 +1225,10 @@ class CalibrationCameraSideWith1Target(CalibrationCamera):
 
         return out
 
-    def fit_function(self, x0):
-        err = 0
-
+    def residuals(self, x0):
+        """ Residuals in pix between the projected and the detected target
+        points, for all the angles, as expected by
+        scipy.optimize.least_squares """
         cam_focal_length_x, cam_focal_length_y, \
             cam_pos_x, cam_pos_y, \
             cam_rot_x, cam_rot_y, cam_rot_z, \
@@ -951,80 +1241,87 @@ class CalibrationCameraSideWith1Target(CalibrationCamera):
             cam_rot_x, cam_rot_y, cam_rot_z,
             self._cam_origin_axis)
 
-        for alpha, ref_pts in self._ref_target_points_2d.items():
-            fr_target = self.target_frame(
-                target_pos_x, target_pos_y, target_pos_z,
-                target_rot_x, target_rot_y, target_rot_z,
-                math.radians(alpha * angle_factor))
+        ref_angles, ref_points_2d = self._ref_target_stack
 
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_points_local_3d))
+        return self.target_residuals(
+            fr_cam,
+            self._cam_width_image, self._cam_height_image,
+            cam_focal_length_x, cam_focal_length_y,
+            target_pos_x, target_pos_y, target_pos_z,
+            target_rot_x, target_rot_y, target_rot_z,
+            angle_factor,
+            ref_angles, ref_points_2d, self._ref_target_points_local_3d)
 
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
+    def jacobian(self, x0):
+        """ Jacobian of residuals with respect to x0 """
+        x0 = numpy.asarray(x0, dtype=float)
 
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
+        # Parameters of target_jacobian, cam_pos_z is fixed
+        parameters = numpy.insert(x0, 4, self._cam_pos_z)
 
-        if self._verbose:
-            print(err)
+        ref_angles, _ = self._ref_target_stack
+        jacobian = self.target_jacobian(
+            parameters, self._cam_origin_axis,
+            ref_angles, self._ref_target_points_local_3d)
 
-        return err
+        return numpy.delete(jacobian, 4, axis=1)
 
-    def find_parameters(self, number_of_repetition):
-
-        best_parameters = None
-        min_err = float('inf')
-        for i in range(number_of_repetition + 1):
-
-            cam_focal_length_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_focal_length_y = numpy.random.uniform(1000.0, 10000.0)
-            cam_pos_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_pos_y = 0.0
-            cam_rot_x = 0.0
-            cam_rot_y = 0.0
-            cam_rot_z = 0.0
-
-            angle_factor = 1.0
-
-            target_pos_x = numpy.random.uniform(-1000.0, 1000.0)
-            target_pos_y = numpy.random.uniform(-1000.0, 1000.0)
-            target_pos_z = numpy.random.uniform(0, 1000.0)
-            target_rot_x = 0.0
-            target_rot_y = 0.0
-            target_rot_z = 0.0
-
-            parameters = [cam_focal_length_x, cam_focal_length_y,
-                          cam_pos_x, cam_pos_y,
-                          cam_rot_x, cam_rot_y, cam_rot_z,
-                          angle_factor,
-                          target_pos_x, target_pos_y, target_pos_z,
-                          target_rot_x, target_rot_y, target_rot_z]
-
-            parameters = scipy.optimize.minimize(
-                self.fit_function, parameters, method='BFGS').x
+    def fit_function(self, x0):
+        err = self.residuals_error(self.residuals(x0))
 
-            err = self.fit_function(parameters)
-            if err < min_err:
-                min_err = err
-                best_parameters = parameters
+        if self._verbose:
+            print(err)
 
-            if self._verbose:
-                err = self.fit_function(parameters)
-                print('Result : ', parameters)
-                print('Err : ', err / self._ref_number)
+        return err
 
-        return best_parameters
+    def random_parameters(self, random_state):
+        """ Random starting parameters of find_parameters, drawn with
+        random_state (numpy.random.RandomState) """
+
+        cam_focal_length_x = random_state.uniform(1000.0, 10000.0)
+        cam_focal_length_y = random_state.uniform(1000.0, 10000.0)
+        cam_pos_x = random_state.uniform(1000.0, 10000.0)
+        cam_pos_y = 0.0
+        cam_rot_x = 0.0
+        cam_rot_y = 0.0
+        cam_rot_z = 0.0
+
+        angle_factor = 1.0
+
+        target_pos_x = random_state.uniform(-1000.0, 1000.0)
+        target_pos_y = random_state.uniform(-1000.0, 1000.0)
+        target_pos_z = random_state.uniform(0, 1000.0)
+        target_rot_x = 0.0
+        target_rot_y = 0.0
+        target_rot_z = 0.0
+
+        parameters = [cam_focal_length_x, cam_focal_length_y,
+                      cam_pos_x, cam_pos_y,
+                      cam_rot_x, cam_rot_y, cam_rot_z,
+                      angle_factor,
+                      target_pos_x, target_pos_y, target_pos_z,
+                      target_rot_x, target_rot_y, target_rot_z]
+
+        return parameters
+
+    def find_parameters(self, number_of_repetition,
+                        n_processes=1, seed=None, err_threshold=None):
+        """ Best of number_of_repetition + 1 Levenberg-Marquardt fits from
+        random_parameters, see _find_parameters """
+        return _find_parameters(self, number_of_repetition,
+                                n_processes=n_processes,
+                                seed=seed,
+                                err_threshold=err_threshold)
 
     def calibrate(self,
                   ref_target_points_2d,
                   ref_target_points_local_3d,
                   size_image,
                   number_of_repetition=1,
-                  verbose=False):
+                  verbose=False,
+                  n_processes=1,
+                  seed=None,
+                  err_threshold=None):
         """ Find physical parameters associated with a camera
         (i.e. distances and angles), using pictures of a rotating
         target.
@@ -1035,17 +1332,24 @@ class CalibrationCameraSideWith1Target(CalibrationCamera):
                         a picture taken with a given angle, list
                         the coordinates of all intersections on
                         the target in the picture
+         - 'number_of_repetition', 'n_processes', 'seed', 'err_threshold':
+                        random restarts of find_parameters
         """
         self._verbose = verbose
 
         self._ref_target_points_2d = ref_target_points_2d.copy()
         self._ref_target_points_local_3d = ref_target_points_local_3d
+        self._ref_target_stack = self.stack_target_points_2d(
+            ref_target_points_2d, len(ref_target_points_local_3d))
         self._ref_number = len(ref_target_points_2d)
 
         self._cam_width_image = size_image[0]
         self._cam_height_image = size_image[1]
 
-        parameters = self.find_parameters(number_of_repetition)
+        parameters = self.find_parameters(number_of_repetition,
+                                          n_processes=n_processes,
+                                          seed=seed,
+                                          err_threshold=err_threshold)
 
         for i in [4, 5, 6, 11, 12, 13]:
             parameters[i] %= math.pi* 2.0
@@ -1185,6 +1489,8 @@ class CalibrationCameraSideWith2Target(CalibrationCamera):
         self._ref_number = None
         self._ref_target_1_points_2d = None
         self._ref_target_2_points_2d = None
+        self._ref_target_1_stack = None
+        self._ref_target_2_stack = None
 
         self._cam_pos_z = 0.0
 
@@ -1235,9 +1541,10 @@ class CalibrationCameraSideWith2Target(CalibrationCamera):
 
         return out
 
-    def fit_function(self, x0):
-        err = 0
-
+    def residuals(self, x0):
+        """ Residuals in pix between the projected and the detected points
+        of the two targets, for all the angles, as expected by
+        scipy.optimize.least_squares """
         cam_focal_length_x, cam_focal_length_y, \
             cam_pos_x, cam_pos_y, \
             cam_rot_x, cam_rot_z, \
@@ -1247,114 +1554,115 @@ class CalibrationCameraSideWith2Target(CalibrationCamera):
             target_2_pos_x, target_2_pos_y, target_2_pos_z,\
             target_2_rot_x, target_2_rot_y, target_2_rot_z = x0
 
-        # angle_factor = abs(angle_factor)
-
         fr_cam = self.camera_frame(
             cam_pos_x, cam_pos_y, self._cam_pos_z,
             cam_rot_x, self._cam_rot_y, cam_rot_z,
             self._cam_origin_axis)
 
-        for alpha, ref_pts in self._ref_target_1_points_2d.items():
-
-            fr_target = self.target_frame(target_1_pos_x,
-                                          target_1_pos_y,
-                                          target_1_pos_z,
-                                          target_1_rot_x,
-                                          target_1_rot_y,
-                                          target_1_rot_z,
-                                          math.radians(alpha * angle_factor))
+        ref_angles, ref_points_2d = self._ref_target_1_stack
+        residuals_1 = self.target_residuals(
+            fr_cam,
+            self._cam_width_image, self._cam_height_image,
+            cam_focal_length_x, cam_focal_length_y,
+            target_1_pos_x, target_1_pos_y, target_1_pos_z,
+            target_1_rot_x, target_1_rot_y, target_1_rot_z,
+            angle_factor,
+            ref_angles, ref_points_2d, self._ref_target_1_points_local_3d)
+
+        ref_angles, ref_points_2d = self._ref_target_2_stack
+        residuals_2 = self.target_residuals(
+            fr_cam,
+            self._cam_width_image, self._cam_height_image,
+            cam_focal_length_x, cam_focal_length_y,
+            target_2_pos_x, target_2_pos_y, target_2_pos_z,
+            target_2_rot_x, target_2_rot_y, target_2_rot_z,
+            angle_factor,
+            ref_angles, ref_points_2d, self._ref_target_2_points_local_3d)
+
+        return numpy.concatenate((residuals_1, residuals_2))
+
+    def jacobian(self, x0):
+        """ Jacobian of residuals with respect to x0 """
+        x0 = numpy.asarray(x0, dtype=float)
+
+        # Parameters of target_jacobian, cam_pos_z and cam_rot_y are fixed
+        camera = [x0[0], x0[1], x0[2], x0[3], self._cam_pos_z,
+                  x0[4], self._cam_rot_y, x0[5], x0[6]]
+
+        jacobians = list()
+        for i, (ref_angles, _), ref_points_local_3d in [
+                (0, self._ref_target_1_stack,
+                 self._ref_target_1_points_local_3d),
+                (1, self._ref_target_2_stack,
+                 self._ref_target_2_points_local_3d)]:
+
+            target = x0[7 + 6 * i:7 + 6 * (i + 1)]
+            jacobian = self.target_jacobian(
+                numpy.concatenate((camera, target)), self._cam_origin_axis,
+                ref_angles, ref_points_local_3d)
+
+            target_jacobian = numpy.zeros((len(jacobian), 12))
+            target_jacobian[:, 6 * i:6 * (i + 1)] = jacobian[:, 9:]
+            jacobians.append(numpy.column_stack(
+                (jacobian[:, [0, 1, 2, 3, 5, 7, 8]],
+                 target_jacobian)))
+
+        return numpy.concatenate(jacobians)
 
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_1_points_local_3d))
-
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
-
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
-
-        for alpha, ref_pts in self._ref_target_2_points_2d.items():
-
-            fr_target = self.target_frame(target_2_pos_x,
-                                          target_2_pos_y,
-                                          target_2_pos_z,
-                                          target_2_rot_x,
-                                          target_2_rot_y,
-                                          target_2_rot_z,
-                                          math.radians(alpha * angle_factor))
-
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_2_points_local_3d))
-
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
-
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
+    def fit_function(self, x0):
+        err = self.residuals_error(self.residuals(x0))
 
         if self._verbose:
             print(err)
 
         return err
 
-    def find_parameters(self, number_of_repetition):
-
-        best_parameters = None
-        min_err = float('inf')
-        for i in range(number_of_repetition + 1):
-
-            cam_focal_length_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_focal_length_y = numpy.random.uniform(1000.0, 10000.0)
-            cam_pos_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_pos_y = 0.0
-            cam_rot_x = 0.0
-            cam_rot_z = 0.0
-
-            angle_factor = 1.0
-
-            target_1_pos_x = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_y = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_z = numpy.random.uniform(0, 1000.0)
-            target_1_rot_x = 0
-            target_1_rot_y = 0
-            target_1_rot_z = 0
-
-            target_2_pos_x = - target_1_pos_x
-            target_2_pos_y = - target_1_pos_y
-            target_2_pos_z = numpy.random.uniform(0, 1000.0)
-            target_2_rot_x = 0
-            target_2_rot_y = 0
-            target_2_rot_z = 0
-
-            parameters = [cam_focal_length_x, cam_focal_length_y,
-                          cam_pos_x, cam_pos_y,
-                          cam_rot_x, cam_rot_z,
-                          angle_factor,
-                          target_1_pos_x, target_1_pos_y, target_1_pos_z,
-                          target_1_rot_x, target_1_rot_y, target_1_rot_z,
-                          target_2_pos_x, target_2_pos_y, target_2_pos_z,
-                          target_2_rot_x, target_2_rot_y, target_2_rot_z]
-
-            parameters = scipy.optimize.minimize(
-                self.fit_function, parameters, method='BFGS').x
-
-            err = self.fit_function(parameters)
-            if err < min_err:
-                min_err = err
-                best_parameters = parameters
-
-            if self._verbose:
-                err = self.fit_function(parameters)
-                print('Result : ', parameters)
-                print('Err : ', err / self._ref_number)
-
-        return best_parameters
+    def random_parameters(self, random_state):
+        """ Random starting parameters of find_parameters, drawn with
+        random_state (numpy.random.RandomState) """
+
+        cam_focal_length_x = random_state.uniform(1000.0, 10000.0)
+        cam_focal_length_y = random_state.uniform(1000.0, 10000.0)
+        cam_pos_x = random_state.uniform(1000.0, 10000.0)
+        cam_pos_y = 0.0
+        cam_rot_x = 0.0
+        cam_rot_z = 0.0
+
+        angle_factor = 1.0
+
+        target_1_pos_x = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_y = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_z = random_state.uniform(0, 1000.0)
+        target_1_rot_x = 0
+        target_1_rot_y = 0
+        target_1_rot_z = 0
+
+        target_2_pos_x = - target_1_pos_x
+        target_2_pos_y = - target_1_pos_y
+        target_2_pos_z = random_state.uniform(0, 1000.0)
+        target_2_rot_x = 0
+        target_2_rot_y = 0
+        target_2_rot_z = 0
+
+        parameters = [cam_focal_length_x, cam_focal_length_y,
+                      cam_pos_x, cam_pos_y,
+                      cam_rot_x, cam_rot_z,
+                      angle_factor,
+                      target_1_pos_x, target_1_pos_y, target_1_pos_z,
+                      target_1_rot_x, target_1_rot_y, target_1_rot_z,
+                      target_2_pos_x, target_2_pos_y, target_2_pos_z,
+                      target_2_rot_x, target_2_rot_y, target_2_rot_z]
+
+        return parameters
+
+    def find_parameters(self, number_of_repetition,
+                        n_processes=1, seed=None, err_threshold=None):
+        """ Best of number_of_repetition + 1 Levenberg-Marquardt fits from
+        random_parameters, see _find_parameters """
+        return _find_parameters(self, number_of_repetition,
+                                n_processes=n_processes,
+                                seed=seed,
+                                err_threshold=err_threshold)
 
     def calibrate(self,
                   ref_target_1_points_2d,
@@ -1363,7 +1671,10 @@ class CalibrationCameraSideWith2Target(CalibrationCamera):
                   ref_target_2_points_local_3d,
                   size_image,
                   number_of_repetition=3,
-                  verbose=False):
+                  verbose=False,
+                  n_processes=1,
+                  seed=None,
+                  err_threshold=None):
         """ Find physical parameters associated with a camera
         (i.e. distances and angles), using pictures of a rotating
         target.
@@ -1374,6 +1685,8 @@ class CalibrationCameraSideWith2Target(CalibrationCamera):
                         a picture taken with a given angle, list
                         the coordinates of all intersections on
                         the target in the picture
+         - 'number_of_repetition', 'n_processes', 'seed', 'err_threshold':
+                        random restarts of find_parameters
         """
         self._verbose = verbose
 
@@ -1385,11 +1698,18 @@ class CalibrationCameraSideWith2Target(CalibrationCamera):
 
         self._ref_target_1_points_2d = ref_target_1_points_2d.copy()
         self._ref_target_2_points_2d = ref_target_2_points_2d.copy()
+        self._ref_target_1_stack = self.stack_target_points_2d(
+            ref_target_1_points_2d, len(ref_target_1_points_local_3d))
+        self._ref_target_2_stack = self.stack_target_points_2d(
+            ref_target_2_points_2d, len(ref_target_2_points_local_3d))
 
         self._cam_width_image = size_image[0]
         self._cam_height_image = size_image[1]
 
-        parameters = self.find_parameters(number_of_repetition)
+        parameters = self.find_parameters(number_of_repetition,
+                                          n_processes=n_processes,
+                                          seed=seed,
+                                          err_threshold=err_threshold)
 
         for i in [4, 5, 10, 11, 12, 16, 17, 18]:
             parameters[i] %= math.pi * 2.0
@@ -1598,6 +1918,8 @@ class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
         self._ref_number = None
         self._ref_target_1_points_2d = None
         self._ref_target_2_points_2d = None
+        self._ref_target_1_stack = None
+        self._ref_target_2_stack = None
 
         self._cam_pos_z = 0.0
 
@@ -1643,9 +1965,10 @@ class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
 
         return out
 
-    def fit_function(self, x0):
-        err = 0
-
+    def residuals(self, x0):
+        """ Residuals in pix between the projected and the detected points
+        of the two targets, for all the angles, as expected by
+        scipy.optimize.least_squares """
         cam_focal_length_x, cam_focal_length_y, \
         cam_pos_x, cam_pos_y, \
         cam_rot_x, cam_rot_z, \
@@ -1660,106 +1983,111 @@ class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
             cam_rot_x, self._cam_rot_y, cam_rot_z,
             self._cam_origin_axis)
 
-        for alpha, ref_pts in self._ref_target_1_points_2d.items():
-            fr_target = self.target_frame(target_1_pos_x,
-                                          target_1_pos_y,
-                                          target_1_pos_z,
-                                          target_1_rot_x,
-                                          target_1_rot_y,
-                                          target_1_rot_z,
-                                          math.radians(alpha * angle_factor))
+        ref_angles, ref_points_2d = self._ref_target_1_stack
+        residuals_1 = self.target_residuals(
+            fr_cam,
+            self._cam_width_image, self._cam_height_image,
+            cam_focal_length_x, cam_focal_length_y,
+            target_1_pos_x, target_1_pos_y, target_1_pos_z,
+            target_1_rot_x, target_1_rot_y, target_1_rot_z,
+            angle_factor,
+            ref_angles, ref_points_2d, self._ref_target_1_points_local_3d)
+
+        ref_angles, ref_points_2d = self._ref_target_2_stack
+        residuals_2 = self.target_residuals(
+            fr_cam,
+            self._cam_width_image, self._cam_height_image,
+            cam_focal_length_x, cam_focal_length_y,
+            target_2_pos_x, target_2_pos_y, target_2_pos_z,
+            target_2_rot_x, target_2_rot_y, target_2_rot_z,
+            angle_factor,
+            ref_angles, ref_points_2d, self._ref_target_2_points_local_3d)
+
+        return numpy.concatenate((residuals_1, residuals_2))
+
+    def jacobian(self, x0):
+        """ Jacobian of residuals with respect to x0 """
+        x0 = numpy.asarray(x0, dtype=float)
+
+        # Parameters of target_jacobian, cam_pos_z and cam_rot_y are fixed
+        camera = [x0[0], x0[1], x0[2], x0[3], self._cam_pos_z,
+                  x0[4], self._cam_rot_y, x0[5], x0[6]]
+
+        jacobians = list()
+        for i, (ref_angles, _), ref_points_local_3d in [
+                (0, self._ref_target_1_stack,
+                 self._ref_target_1_points_local_3d),
+                (1, self._ref_target_2_stack,
+                 self._ref_target_2_points_local_3d)]:
+
+            target = x0[7 + 6 * i:7 + 6 * (i + 1)]
+            jacobian = self.target_jacobian(
+                numpy.concatenate((camera, target)), self._cam_origin_axis,
+                ref_angles, ref_points_local_3d)
+
+            target_jacobian = numpy.zeros((len(jacobian), 12))
+            target_jacobian[:, 6 * i:6 * (i + 1)] = jacobian[:, 9:]
+            jacobians.append(numpy.column_stack(
+                (jacobian[:, [0, 1, 2, 3, 5, 7, 8]],
+                 target_jacobian)))
+
+        return numpy.concatenate(jacobians)
 
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_1_points_local_3d))
-
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
-
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
-
-        for alpha, ref_pts in self._ref_target_2_points_2d.items():
-            fr_target = self.target_frame(target_2_pos_x,
-                                          target_2_pos_y,
-                                          target_2_pos_z,
-                                          target_2_rot_x,
-                                          target_2_rot_y,
-                                          target_2_rot_z,
-                                          math.radians(alpha * angle_factor))
-
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_2_points_local_3d))
-
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
-
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
+    def fit_function(self, x0):
+        err = self.residuals_error(self.residuals(x0))
 
         if self._verbose:
             print(err)
 
         return err
 
-    def find_parameters(self, number_of_repetition):
-
-        best_parameters = None
-        min_err = float('inf')
-        for i in range(number_of_repetition + 1):
-
-            cam_focal_length_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_focal_length_y = numpy.random.uniform(1000.0, 10000.0)
-            cam_pos_x = 0.0
-            cam_pos_y = - numpy.random.uniform(10000.0, 1000.0)
-
-            cam_rot_x = 0.0
-            cam_rot_z = 0.0
-
-            angle_factor = 1.0
-
-            target_1_pos_x = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_y = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_z = numpy.random.uniform(-1000, 1000.0)
-            target_1_rot_x = 0
-            target_1_rot_y = 0
-            target_1_rot_z = 0
-
-            target_2_pos_x = -target_1_pos_x
-            target_2_pos_y = -target_1_pos_y
-            target_2_pos_z = numpy.random.uniform(-1000, 1000.0)
-            target_2_rot_x = 0
-            target_2_rot_y = 0
-            target_2_rot_z = 0
-
-            parameters = [cam_focal_length_x, cam_focal_length_y,
-                          cam_pos_x, cam_pos_y,
-                          cam_rot_x, cam_rot_z,
-                          angle_factor,
-                          target_1_pos_x, target_1_pos_y, target_1_pos_z,
-                          target_1_rot_x, target_1_rot_y, target_1_rot_z,
-                          target_2_pos_x, target_2_pos_y, target_2_pos_z,
-                          target_2_rot_x, target_2_rot_y, target_2_rot_z]
-
-            parameters = scipy.optimize.minimize(
-                self.fit_function, parameters, method='BFGS').x
-
-            err = self.fit_function(parameters)
-            if err < min_err:
-                min_err = err
-                best_parameters = parameters
-
-            if self._verbose:
-                err = self.fit_function(parameters)
-                print('Result : ', parameters)
-                print('Err : ', err / self._ref_number)
-
-        return best_parameters
+    def random_parameters(self, random_state):
+        """ Random starting parameters of find_parameters, drawn with
+        random_state (numpy.random.RandomState) """
+
+        cam_focal_length_x = random_state.uniform(1000.0, 10000.0)
+        cam_focal_length_y = random_state.uniform(1000.0, 10000.0)
+        cam_pos_x = 0.0
+        cam_pos_y = - random_state.uniform(10000.0, 1000.0)
+
+        cam_rot_x = 0.0
+        cam_rot_z = 0.0
+
+        angle_factor = 1.0
+
+        target_1_pos_x = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_y = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_z = random_state.uniform(-1000, 1000.0)
+        target_1_rot_x = 0
+        target_1_rot_y = 0
+        target_1_rot_z = 0
+
+        target_2_pos_x = -target_1_pos_x
+        target_2_pos_y = -target_1_pos_y
+        target_2_pos_z = random_state.uniform(-1000, 1000.0)
+        target_2_rot_x = 0
+        target_2_rot_y = 0
+        target_2_rot_z = 0
+
+        parameters = [cam_focal_length_x, cam_focal_length_y,
+                      cam_pos_x, cam_pos_y,
+                      cam_rot_x, cam_rot_z,
+                      angle_factor,
+                      target_1_pos_x, target_1_pos_y, target_1_pos_z,
+                      target_1_rot_x, target_1_rot_y, target_1_rot_z,
+                      target_2_pos_x, target_2_pos_y, target_2_pos_z,
+                      target_2_rot_x, target_2_rot_y, target_2_rot_z]
+
+        return parameters
+
+    def find_parameters(self, number_of_repetition,
+                        n_processes=1, seed=None, err_threshold=None):
+        """ Best of number_of_repetition + 1 Levenberg-Marquardt fits from
+        random_parameters, see _find_parameters """
+        return _find_parameters(self, number_of_repetition,
+                                n_processes=n_processes,
+                                seed=seed,
+                                err_threshold=err_threshold)
 
     def get_target_1_projected(self, alpha, ref_target_1_points_local_3d):
 
@@ -1852,7 +2180,10 @@ class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
                   ref_target_2_points_local_3d,
                   size_image,
                   number_of_repetition=3,
-                  verbose=False):
+                  verbose=False,
+                  n_processes=1,
+                  seed=None,
+                  err_threshold=None):
         """ Find physical parameters associated with a camera
         (i.e. distances and angles), using pictures of a rotating
         target.
@@ -1863,6 +2194,8 @@ class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
                         a picture taken with a given angle, list
                         the coordinates of all intersections on
                         the target in the picture
+         - 'number_of_repetition', 'n_processes', 'seed', 'err_threshold':
+                        random restarts of find_parameters
         """
         self._verbose = verbose
 
@@ -1880,11 +2213,18 @@ class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
 
         self._ref_target_1_points_2d = ref_target_1_points_2d.copy()
         self._ref_target_2_points_2d = ref_target_2_points_2d.copy()
+        self._ref_target_1_stack = self.stack_target_points_2d(
+            ref_target_1_points_2d, len(ref_target_1_points_local_3d))
+        self._ref_target_2_stack = self.stack_target_points_2d(
+            ref_target_2_points_2d, len(ref_target_2_points_local_3d))
 
         self._cam_width_image = size_image[0]
         self._cam_height_image = size_image[1]
 
-        parameters = self.find_parameters(number_of_repetition)
+        parameters = self.find_parameters(number_of_repetition,
+                                          n_processes=n_processes,
+                                          seed=seed,
+                                          err_threshold=err_threshold)
 
         for i in [4, 6, 10, 11, 12, 16, 17, 18]:
             parameters[i] %= math.pi * 2.0
@@ -2009,6 +2349,8 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
         self._ref_number = None
         self._ref_target_1_points_2d = None
         self._ref_target_2_points_2d = None
+        self._ref_target_1_stack = None
+        self._ref_target_2_stack = None
 
         self._cam_pos_z = 0.0
         self._cam_pos_y = -5452.4708060356961
@@ -2056,9 +2398,10 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
 
         return out
 
-    def fit_function(self, x0):
-        err = 0
-
+    def residuals(self, x0):
+        """ Residuals in pix between the projected and the detected points
+        of the two targets, for all the angles, as expected by
+        scipy.optimize.least_squares """
         cam_focal_length_x, cam_focal_length_y, \
         cam_pos_x, \
         cam_rot_x, cam_rot_z, \
@@ -2073,109 +2416,115 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
             cam_rot_x, self._cam_rot_y, cam_rot_z,
             self._cam_origin_axis)
 
-        for alpha, ref_pts in self._ref_target_1_points_2d.items():
-            fr_target = self.target_frame(target_1_pos_x,
-                                          target_1_pos_y,
-                                          target_1_pos_z,
-                                          target_1_rot_x,
-                                          target_1_rot_y,
-                                          target_1_rot_z,
-                                          math.radians(alpha * angle_factor))
+        ref_angles, ref_points_2d = self._ref_target_1_stack
+        residuals_1 = self.target_residuals(
+            fr_cam,
+            self._cam_width_image, self._cam_height_image,
+            cam_focal_length_x, cam_focal_length_y,
+            target_1_pos_x, target_1_pos_y, target_1_pos_z,
+            target_1_rot_x, target_1_rot_y, target_1_rot_z,
+            angle_factor,
+            ref_angles, ref_points_2d, self._ref_target_1_points_local_3d)
+
+        ref_angles, ref_points_2d = self._ref_target_2_stack
+        residuals_2 = self.target_residuals(
+            fr_cam,
+            self._cam_width_image, self._cam_height_image,
+            cam_focal_length_x, cam_focal_length_y,
+            target_2_pos_x, target_2_pos_y, target_2_pos_z,
+            target_2_rot_x, target_2_rot_y, target_2_rot_z,
+            angle_factor,
+            ref_angles, ref_points_2d, self._ref_target_2_points_local_3d)
+
+        return numpy.concatenate((residuals_1, residuals_2))
+
+    def jacobian(self, x0):
+        """ Jacobian of residuals with respect to x0 """
+        x0 = numpy.asarray(x0, dtype=float)
+
+        # Parameters of target_jacobian, cam_pos_y, cam_pos_z and cam_rot_y
+        # are fixed
+        camera = [x0[0], x0[1], x0[2], self._cam_pos_y, self._cam_pos_z,
+                  x0[3], self._cam_rot_y, x0[4], x0[5]]
+
+        jacobians = list()
+        for i, (ref_angles, _), ref_points_local_3d in [
+                (0, self._ref_target_1_stack,
+                 self._ref_target_1_points_local_3d),
+                (1, self._ref_target_2_stack,
+                 self._ref_target_2_points_local_3d)]:
+
+            target = x0[6 + 6 * i:6 + 6 * (i + 1)]
+            jacobian = self.target_jacobian(
+                numpy.concatenate((camera, target)), self._cam_origin_axis,
+                ref_angles, ref_points_local_3d)
+
+            target_jacobian = numpy.zeros((len(jacobian), 12))
+            target_jacobian[:, 6 * i:6 * (i + 1)] = jacobian[:, 9:]
+            jacobians.append(numpy.column_stack(
+                (jacobian[:, [0, 1, 2, 5, 7, 8]],
+                 target_jacobian)))
+
+        return numpy.concatenate(jacobians)
 
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_1_points_local_3d))
-
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
-
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
-
-        for alpha, ref_pts in self._ref_target_2_points_2d.items():
-            fr_target = self.target_frame(target_2_pos_x,
-                                          target_2_pos_y,
-                                          target_2_pos_z,
-                                          target_2_rot_x,
-                                          target_2_rot_y,
-                                          target_2_rot_z,
-                                          math.radians(alpha * angle_factor))
-
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_2_points_local_3d))
-
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
-
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
+    def fit_function(self, x0):
+        err = self.residuals_error(self.residuals(x0))
 
         if self._verbose:
             print(err)
 
         return err
 
-    def find_parameters(self, number_of_repetition):
-
-        best_parameters = None
-        min_err = float('inf')
-        for i in range(number_of_repetition + 1):
-
-            cam_focal_length_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_focal_length_y = numpy.random.uniform(1000.0, 10000.0)
-
-            # cam_focal_length_x = 4679
-            # cam_focal_length_y = 4676
-
-            cam_pos_x = 0.0
-
-            cam_rot_x = 0.0
-            cam_rot_z = 0.0
-
-            angle_factor = 1.0
-
-            target_1_pos_x = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_y = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_z = numpy.random.uniform(-1000, 1000.0)
-            target_1_rot_x = 0
-            target_1_rot_y = 0
-            target_1_rot_z = 0
-
-            target_2_pos_x = -target_1_pos_x
-            target_2_pos_y = -target_1_pos_y
-            target_2_pos_z = numpy.random.uniform(-1000, 1000.0)
-            target_2_rot_x = 0
-            target_2_rot_y = 0
-            target_2_rot_z = 0
-
-            parameters = [cam_focal_length_x, cam_focal_length_y,
-                          cam_pos_x,
-                          cam_rot_x, cam_rot_z,
-                          angle_factor,
-                          target_1_pos_x, target_1_pos_y, target_1_pos_z,
-                          target_1_rot_x, target_1_rot_y, target_1_rot_z,
-                          target_2_pos_x, target_2_pos_y, target_2_pos_z,
-                          target_2_rot_x, target_2_rot_y, target_2_rot_z]
-
-            parameters = scipy.optimize.minimize(
-                self.fit_function, parameters, method='BFGS').x
-
-            err = self.fit_function(parameters)
-            if err < min_err:
-                min_err = err
-                best_parameters = parameters
-
-            if self._verbose:
-                err = self.fit_function(parameters)
-                print('Result : ', parameters)
-                print('Err : ', err / self._ref_number)
-
-        return best_parameters
+    def random_parameters(self, random_state):
+        """ Random starting parameters of find_parameters, drawn with
+        random_state (numpy.random.RandomState) """
+
+        cam_focal_length_x = random_state.uniform(1000.0, 10000.0)
+        cam_focal_length_y = random_state.uniform(1000.0, 10000.0)
+
+        # cam_focal_length_x = 4679
+        # cam_focal_length_y = 4676
+
+        cam_pos_x = 0.0
+
+        cam_rot_x = 0.0
+        cam_rot_z = 0.0
+
+        angle_factor = 1.0
+
+        target_1_pos_x = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_y = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_z = random_state.uniform(-1000, 1000.0)
+        target_1_rot_x = 0
+        target_1_rot_y = 0
+        target_1_rot_z = 0
+
+        target_2_pos_x = -target_1_pos_x
+        target_2_pos_y = -target_1_pos_y
+        target_2_pos_z = random_state.uniform(-1000, 1000.0)
+        target_2_rot_x = 0
+        target_2_rot_y = 0
+        target_2_rot_z = 0
+
+        parameters = [cam_focal_length_x, cam_focal_length_y,
+                      cam_pos_x,
+                      cam_rot_x, cam_rot_z,
+                      angle_factor,
+                      target_1_pos_x, target_1_pos_y, target_1_pos_z,
+                      target_1_rot_x, target_1_rot_y, target_1_rot_z,
+                      target_2_pos_x, target_2_pos_y, target_2_pos_z,
+                      target_2_rot_x, target_2_rot_y, target_2_rot_z]
+
+        return parameters
+
+    def find_parameters(self, number_of_repetition,
+                        n_processes=1, seed=None, err_threshold=None):
+        """ Best of number_of_repetition + 1 Levenberg-Marquardt fits from
+        random_parameters, see _find_parameters """
+        return _find_parameters(self, number_of_repetition,
+                                n_processes=n_processes,
+                                seed=seed,
+                                err_threshold=err_threshold)
 
     def get_target_1_projected(self, alpha, ref_target_1_points_local_3d):
 
@@ -2268,7 +2617,10 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
                   ref_target_2_points_local_3d,
                   size_image,
                   number_of_repetition=3,
-                  verbose=False):
+                  verbose=False,
+                  n_processes=1,
+                  seed=None,
+                  err_threshold=None):
         """ Find physical parameters associated with a camera
         (i.e. distances and angles), using pictures of a rotating
         target.
@@ -2279,6 +2631,8 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
                         a picture taken with a given angle, list
                         the coordinates of all intersections on
                         the target in the picture
+         - 'number_of_repetition', 'n_processes', 'seed', 'err_threshold':
+                        random restarts of find_parameters
         """
         self._verbose = verbose
 
@@ -2290,11 +2644,18 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
 
         self._ref_target_1_points_2d = ref_target_1_points_2d.copy()
         self._ref_target_2_points_2d = ref_target_2_points_2d.copy()
+        self._ref_target_1_stack = self.stack_target_points_2d(
+            ref_target_1_points_2d, len(ref_target_1_points_local_3d))
+        self._ref_target_2_stack = self.stack_target_points_2d(
+            ref_target_2_points_2d, len(ref_target_2_points_local_3d))
 
         self._cam_width_image = size_image[0]
         self._cam_height_image = size_image[1]
 
-        parameters = self.find_parameters(number_of_repetition)
+        parameters = self.find_parameters(number_of_repetition,
+                                          n_processes=n_processes,
+                                          seed=seed,
+                                          err_threshold=err_threshold)
 
         for i in [3, 4, 9, 10, 11, 15, 16, 17]:
             parameters[i] %= math.pi * 2.0
@@ -2375,7 +2736,7 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
         with open(filename, 'r') as input_file:
             save_class = json.load(input_file)
 
-            c = CalibrationCameraSideWith2TargetYXZ()
+            c = CalibrationCameraSideWith2TargetYXZBis()
 
             c._cam_width_image = save_class['cam_width_image']
             c._cam_height_image = save_class['cam_height_image']
@@ -2409,6 +2770,124 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
         return c
 
 
+# ==============================================================================
+# Multi-start search of the side calibrations
+
+
+def _fit_restart(calibration, seed, best=None, err_threshold=None):
+    """ Fit the parameters from the random start drawn with seed.
+
+    Return (err, parameters), err as returned by calibrate, or None if the
+    shared best error is already under err_threshold.
+    """
+    if (best is not None and err_threshold is not None and
+            best.value <= err_threshold):
+        return None
+
+    parameters = calibration.random_parameters(
+        numpy.random.RandomState(seed))
+
+    # The restarts converging take less than 100 evaluations, the
+    # others drift to a camera at infinity with an infinite focal
+    parameters = scipy.optimize.least_squares(
+        calibration.residuals, parameters,
+        jac=calibration.jacobian, method='lm', max_nfev=200).x
+
+    err = calibration.fit_function(parameters) / calibration._ref_number
+
+    if best is not None:
+        with best.get_lock():
+            best.value = min(best.value, err)
+
+    return err, parameters
+
+
+_restart_calibration = None
+_restart_best = None
+_restart_err_threshold = None
+
+
+def _init_restart(calibration, best, err_threshold):
+    global _restart_calibration, _restart_best, _restart_err_threshold
+    _restart_calibration = calibration
+    _restart_best = best
+    _restart_err_threshold = err_threshold
+
+
+def _run_restart(seed):
+    return _fit_restart(_restart_calibration, seed,
+                        best=_restart_best,
+                        err_threshold=_restart_err_threshold)
+
+
+def _find_parameters(calibration, number_of_repetition,
+                     n_processes=1, seed=None, err_threshold=None):
+    """ Random restarts of the Levenberg-Marquardt fit of a side calibration
+
+    Parameters
+    ----------
+    calibration : CalibrationCameraSideWith*Target
+        Calibration with the reference points, random_parameters, residuals
+        and jacobian
+    number_of_repetition : int
+        number_of_repetition + 1 restarts are run
+    n_processes : int, optional
+        Number of processes running the restarts, 1 runs them in the
+        current process.
+    seed : int, optional
+        Seed of the restarts, the start of the i-th restart only depends on
+        seed and i. If None, it is drawn from numpy.random.
+    err_threshold : float, optional
+        Error (as returned by calibrate) under which the search stops, the
+        restarts not started are skipped. With n_processes > 1, the restart
+        returned depends on the order in which they end.
+
+    Returns
+    -------
+    parameters : numpy.ndarray
+        Parameters of the restart with the lowest error
+    """
+    if seed is None:
+        seed = numpy.random.randint(0, 2 ** 31 - 1)
+    seeds = numpy.random.SeedSequence(seed).generate_state(
+        number_of_repetition + 1)
+
+    results = list()
+    if n_processes == 1:
+        for s in seeds:
+            results.append(_fit_restart(calibration, s))
+            if err_threshold is not None and results[-1][0] <= err_threshold:
+                break
+    else:
+        best = multiprocessing.Value('d', float('inf'))
+        with concurrent.futures.ProcessPoolExecutor(
+                n_processes,
+                initializer=_init_restart,
+                initargs=(calibration, best, err_threshold)) as executor:
+
+            futures = [executor.submit(_run_restart, s) for s in seeds]
+            for future in concurrent.futures.as_completed(futures):
+                results.append(future.result())
+                if (err_threshold is not None and results[-1] is not None and
+                        results[-1][0] <= err_threshold):
+                    for f in futures:
+                        f.cancel()
+                    break
+
+    best_err, best_parameters = float('inf'), None
+    for result in results:
+        if result is None:
+            continue
+        err, parameters = result
+        if calibration._verbose:
+            print('Result : ', parameters)
+            print('Err : ', err)
+        if err < best_err:
+            best_err, best_parameters = err, parameters
+
+    return best_parameters
+
+
 def find_position_3d_points(pt2d, calibrations):
 
     def fit_function(x0):
@@ -0,0 +1,136 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+# ==============================================================================
+""" On disk cache of the calibrations, keyed by the content of the reference
+points they are fitted on.
+"""
+# ==============================================================================
+from __future__ import division, print_function, absolute_import
+
+import os
+import json
+import numbers
+import hashlib
+import tempfile
+import numpy
+# ==============================================================================
+
+__all__ = ["calibration_key",
+           "calibrate_cached"]
+
+# ==============================================================================
+
+# Change it when the calibration models change, to invalidate the cache
+_CACHE_VERSION = 1
+
+
+def _update_hash(h, value):
+    """ Update h with a canonical serialization of value. Numbers are hashed
+    as float64 (angle 42 and 42.0 have the same key), sequences as float64
+    arrays with their shape and dict by sorted key. """
+    if isinstance(value, dict):
+        h.update(b"dict")
+        for key in sorted(value):
+            _update_hash(h, key)
+            _update_hash(h, value[key])
+    elif isinstance(value, str):
+        h.update(b"str" + value.encode("utf-8"))
+    elif isinstance(value, numbers.Real):
+        h.update(b"real" + numpy.float64(value).tobytes())
+    else:
+        array = numpy.ascontiguousarray(value, dtype=numpy.float64)
+        h.update(b"array" + str(array.shape).encode("utf-8"))
+        h.update(array.tobytes())
+
+
+def calibration_key(calibration_class, *args):
+    """ Key of a calibration in the cache : sha256 hexadecimal digest of the
+    model class and of the calibrate arguments (reference 2d points of each
+    angle, 3d points of the targets, size of the images, ...)
+
+    Parameters
+    ----------
+    calibration_class : class
+        Calibration model, CalibrationCameraSideWith2TargetYXZ for example
+    args :
+        Positional arguments of calibration_class.calibrate
+
+    Returns
+    -------
+    key : str
+    """
+    h = hashlib.sha256()
+    _update_hash(h, "{}.{}:{}".format(calibration_class.__module__,
+                                      calibration_class.__name__,
+                                      _CACHE_VERSION))
+    for value in args:
+        _update_hash(h, value)
+
+    return h.hexdigest()
+
+
+def calibrate_cached(calibration_class, cache_dir, *args, **kwargs):
+    """ Calibrate a camera, or load the calibration from cache_dir if the
+    same model was already calibrated on the same reference points.
+
+    The calibration is saved with calibration_class.dump in
+    cache_dir/<calibration_key>.json, with the error returned by calibrate.
+    The keyword arguments (number_of_repetition, seed, ...) are not part of
+    the key, remove the file to calibrate again with other ones.
+
+    Parameters
+    ----------
+    calibration_class : class
+        Calibration model, CalibrationCameraSideWith2TargetYXZ for example
+    cache_dir : str
+        Directory of the cache, created if needed
+    args, kwargs :
+        Arguments of calibration_class.calibrate
+
+    Returns
+    -------
+    calibration : calibration_class
+        Calibration computed, or read by calibration_class.load
+    err : float
+        Error returned by calibrate
+    """
+    filename = os.path.join(
+        cache_dir, "{}.json".format(calibration_key(calibration_class,
+                                                    *args)))
+
+    if os.path.exists(filename):
+        with open(filename, 'r') as input_file:
+            err = json.load(input_file)['calibration_err']
+        return calibration_class.load(filename), err
+
+    calibration = calibration_class()
+    err = calibration.calibrate(*args, **kwargs)
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Written in a temporary file renamed at the end, so concurrent runs
+    # never read a partial file
+    fd, tmp_filename = tempfile.mkstemp(suffix=".json", dir=cache_dir)
+    os.close(fd)
+    try:
+        calibration.dump(tmp_filename)
+        with open(tmp_filename, 'r') as input_file:
+            save_class = json.load(input_file)
+        save_class['calibration_err'] = float(err)
+        with open(tmp_filename, 'w') as output_file:
+            json.dump(save_class, output_file,
+                      sort_keys=True,
+                      indent=4,
+                      separators=(',', ': '))
+        os.replace(tmp_filename, filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+    return calibration, err
@@ -9,13 +9,98 @@
 # ==============================================================================
 from __future__ import division, print_function, absolute_import
 
+import os
 import cv2
+import time
 import numpy
 import json
 import collections
+import concurrent.futures
 # ==============================================================================
 
-__all__ = ["Target", "Chessboard"]
+__all__ = ["Target",
+           "Chessboard",
+           "ChessboardDetection",
+           "find_chessboard_corners"]
+
+# ==============================================================================
+
+ChessboardDetection = collections.namedtuple(
+    "ChessboardDetection", ["id_camera", "angle", "found", "seconds", "error"])
+
+
+def _find_corners(image, shape):
+    found, corners = cv2.findChessboardCorners(
+        image,
+        tuple(shape),
+        flags=cv2.CALIB_CB_ADAPTIVE_THRESH +
+        cv2.CALIB_CB_NORMALIZE_IMAGE)
+
+    if not found:
+        return None
+
+    # (N, 1, 2) whatever the version of OpenCV
+    return corners.reshape((-1, 1, 2))
+
+
+def find_chessboard_corners(image, shape, scale=None):
+    """ Find the corners of a chessboard in an image, refined to sub-pixel
+    accuracy.
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        GRAYSCALE or RGB image containing the chessboard
+    shape : (int, int)
+        Number of inner corners of the chessboard
+    scale : float, optional
+        If given (0.25 for example), the chessboard is first searched in the
+        image downscaled by scale, then in the region of the full resolution
+        image around the corners found. The search falls back to the whole
+        image if one of the two fails.
+
+    Returns
+    -------
+    corners : numpy.ndarray or None
+        (N, 1, 2) float32 corners, None if the chessboard is not found
+    """
+    if len(image.shape) == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+    corners = None
+    if scale is not None:
+        small_image = cv2.resize(image, None, fx=scale, fy=scale,
+                                 interpolation=cv2.INTER_AREA)
+        small_corners = _find_corners(small_image, shape)
+
+        if small_corners is not None:
+            small_corners = small_corners.reshape((-1, 2)) / scale
+
+            # Bounding box of the corners with a margin of a quarter of
+            # the chessboard, to include the outer squares
+            lo = numpy.floor(small_corners.min(axis=0))
+            hi = numpy.ceil(small_corners.max(axis=0))
+            margin = 0.25 * (hi - lo).max() + 1.0 / scale
+            x_min, y_min = numpy.maximum(lo - margin, 0).astype(int)
+            x_max, y_max = numpy.minimum(
+                hi + margin, (image.shape[1], image.shape[0])).astype(int)
+
+            corners = _find_corners(image[y_min:y_max, x_min:x_max], shape)
+            if corners is not None:
+                corners = corners + numpy.array([x_min, y_min],
+                                                dtype=corners.dtype)
+
+    if corners is None:
+        corners = _find_corners(image, shape)
+
+    if corners is None:
+        return None
+
+    return cv2.cornerSubPix(
+        image, numpy.ascontiguousarray(corners, dtype=numpy.float32),
+        (11, 11), (-1, -1),
+        criteria=(cv2.TERM_CRITERIA_EPS +
+                  cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001))
 
 # ==============================================================================
 
@@ -69,7 +154,7 @@ class Chessboard(object):
 
         return corners_2d
 
-    def detect_corners(self, id_camera, angle, image):
+    def detect_corners(self, id_camera, angle, image, scale=None):
         """
         Detect chessboard corner in a image and save it in object with the
         id_camera and angle like keys.
@@ -77,33 +162,73 @@ class Chessboard(object):
         :param id_camera: id/label/name_key of the camera who take the picture
         :param angle: Angle of chessboard on the turnable platform
         :param image: numpy GRAYSCALE Image containing the chessboard target
+        :param scale: search first in the image downscaled by scale, see
+        find_chessboard_corners
         :return: True if chessboard corner are found otherwise False.
         """
 
-        if len(image.shape) == 3:
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-
         try:
+            corners = find_chessboard_corners(image, self.shape, scale=scale)
+        except cv2.error:
+            return False
 
-            found, corners = cv2.findChessboardCorners(
-                image,
-                tuple(self.shape),
-                flags=cv2.CALIB_CB_ADAPTIVE_THRESH +
-                cv2.CALIB_CB_NORMALIZE_IMAGE)
-
-            if found:
-
-                cv2.cornerSubPix(
-                    image, corners, (11, 11), (-1, -1),
-                    criteria=(cv2.TERM_CRITERIA_EPS +
-                              cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001))
+        if corners is None:
+            return False
 
-                self.image_points[id_camera][angle] = corners
+        self.image_points[id_camera][angle] = corners
 
-        except cv2.error:
-            return False
+        return True
 
-        return found
+    def detect_corners_many(self, images, n_jobs=1, scale=None):
+        """
+        Detect chessboard corners in several images, in parallel, and save
+        them in object with the id_camera and angle like keys.
+
+        :param images: dict[id_camera][angle] of images containing the
+        chessboard target
+        :param n_jobs: number of threads detecting the corners (OpenCV
+        releases the GIL), -1 for the number of CPUs
+        :param scale: search first in the images downscaled by scale, see
+        find_chessboard_corners
+        :return: list of ChessboardDetection (id_camera, angle, found,
+        seconds, error), error is the message of the cv2.error raised or
+        None
+        """
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+
+        def detect(id_camera, angle):
+            t0 = time.time()
+            corners, error = None, None
+            try:
+                corners = find_chessboard_corners(images[id_camera][angle],
+                                                  self.shape, scale=scale)
+            except cv2.error as e:
+                error = str(e)
+            return corners, ChessboardDetection(
+                id_camera=id_camera,
+                angle=angle,
+                found=corners is not None,
+                seconds=time.time() - t0,
+                error=error)
+
+        keys = [(id_camera, angle)
+                for id_camera in images for angle in images[id_camera]]
+
+        if n_jobs == 1:
+            results = [detect(*key) for key in keys]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(n_jobs) as executor:
+                results = list(executor.map(lambda key: detect(*key), keys))
+
+        detections = list()
+        for corners, detection in results:
+            if corners is not None:
+                self.image_points[detection.id_camera][
+                    detection.angle] = corners
+            detections.append(detection)
+
+        return detections
 
     def dump(self, filename):
         # Convert to json format
@@ -142,6 +267,6 @@ class Chessboard(object):
                 for angle in image_points[id_camera]:
                     chessboard.image_points[id_camera][float(angle)] = \
                         numpy.array(image_points[id_camera][angle]).astype(
-                            numpy.float)
+                            float)
 
         return chessboard
@@ -34,12 +34,7 @@ def show_voxel_grid(voxel_grid,
     ipyvolume.figure(width=width, height=height, controls=True, lighting=True)
     plot_voxel(voxel_grid.voxels_position, size=size, color=color)
 
-    x_min = voxel_grid.voxels_position[:, 0].min()
-    x_max = voxel_grid.voxels_position[:, 0].max()
-    y_min = voxel_grid.voxels_position[:, 1].min()
-    y_max = voxel_grid.voxels_position[:, 1].max()
-    z_min = voxel_grid.voxels_position[:, 2].min()
-    z_max = voxel_grid.voxels_position[:, 2].max()
+    (x_min, y_min, z_min), (x_max, y_max, z_max) = voxel_grid.bounding_box()
 
     xyz_max = max(x_max - x_min, y_max - y_min, z_max - z_min)
     ipyvolume.xlim(x_min, x_min + xyz_max)
@@ -20,6 +20,7 @@ from .vtk_transformation import (
     from_vtk_poly_data_to_vertices_faces,
     from_vertices_faces_to_vtk_poly_data,
     from_vtk_image_data_to_voxels_center)
+from ..object import BrickImage3D
 
 # ==============================================================================
 
@@ -56,7 +57,7 @@ def meshing(image_3d, smoothing_iteration=0, reduction=0.0, verbose=False):
     Parameters
     ----------
     
-    image_3d : 3D numpy array
+    image_3d : 3D numpy array or BrickImage3D
         3D Array with positive values 
         
     smoothing_iteration : int, optional
@@ -83,6 +84,10 @@ def meshing(image_3d, smoothing_iteration=0, reduction=0.0, verbose=False):
     if image_3d.size < 8:
         raise ValueError("image_3d must have size >= 8")
 
+    # Marching cubes works on the dense volume
+    if isinstance(image_3d, BrickImage3D):
+        image_3d = image_3d.to_image_3d()
+
     image_3d = image_3d.astype(numpy.uint8)
 
     vtk_image_data = from_numpy_matrix_to_vtk_image_data(
@@ -20,6 +20,7 @@ Main's function
    :toctree: generated/
 
     reconstruction_3d
+    reconstruction_3d_batch
     project_voxel_centers_on_image
     project_voxels_position_on_image
     image_error
@@ -31,6 +32,10 @@ from __future__ import division, print_function, absolute_import
 
 from .multi_view_reconstruction import *
 from ._multi_view_reconstruction_octree import *
+from ._image_view_cache import *
+from ._integral_image import *
+from ._batch import *
+from ._reconstruction_monitor import *
 # ==============================================================================
 
 __all__ = [s for s in dir() if not s.startswith('_')]
@@ -0,0 +1,310 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+# ==============================================================================
+from __future__ import division, print_function, absolute_import
+
+import os
+import time
+import traceback
+import collections
+import concurrent.futures
+
+from ..data import bin_images as read_bin_images
+from ..data import raw_images as read_raw_images
+from ..object import ImageView
+from ._image_view_cache import foreground_bounding_box
+from .multi_view_reconstruction import reconstruction_3d
+# ==============================================================================
+
+__all__ = ["BatchResult",
+           "BatchStats",
+           "reconstruction_3d_batch"]
+
+# ==============================================================================
+
+BatchResult = collections.namedtuple(
+    "BatchResult", ["name_dir", "filename", "voxel_grid", "nb_voxels",
+                    "nb_images", "seconds", "error"])
+
+_STAGES = ("decode", "binarize", "reconstruction", "write")
+
+
+class BatchStats(object):
+    """ Time spent in each stage of reconstruction_3d_batch.
+
+    seconds[stage] is the sum over the plants of the time spent in the stage
+    ("decode", "binarize", "reconstruction", "write"), by all the workers.
+    wall_seconds is the elapsed time of the whole batch. nb_errors is the
+    number of plants whose reconstruction failed.
+    """
+
+    def __init__(self):
+        self.nb_plants = 0
+        self.nb_errors = 0
+        self.nb_images = 0
+        self.nb_voxels = 0
+        self.wall_seconds = 0.0
+        self.seconds = collections.OrderedDict((s, 0.0) for s in _STAGES)
+
+    def add(self, result):
+        self.nb_plants += 1
+        if result.error is not None:
+            self.nb_errors += 1
+        self.nb_images += result.nb_images
+        self.nb_voxels += result.nb_voxels
+        for stage, seconds in result.seconds.items():
+            self.seconds[stage] += seconds
+
+    @property
+    def plants_per_second(self):
+        """ Throughput of the whole batch """
+        if self.wall_seconds == 0:
+            return 0.0
+        return self.nb_plants / self.wall_seconds
+
+    def images_per_second(self, stage):
+        """ Throughput of one worker in the stage """
+        if self.seconds[stage] == 0:
+            return float("inf")
+        return self.nb_images / self.seconds[stage]
+
+    def __str__(self):
+        lines = ["{} plants, {} images in {:.2f}s - {:.3f} plants/s".format(
+            self.nb_plants, self.nb_images, self.wall_seconds,
+            self.plants_per_second)]
+        if self.nb_errors > 0:
+            lines.append("{} plants failed".format(self.nb_errors))
+        for stage, seconds in self.seconds.items():
+            if seconds == 0:
+                continue
+            lines.append("{:>16} : {:.2f}s - {:.1f} images/s".format(
+                stage, seconds, self.images_per_second(stage)))
+        return "\n".join(lines)
+
+# ==============================================================================
+
+
+def _select_ref_angle(bin_side_images):
+    """ Angle of the side image with the widest foreground, as
+    routine_select_ref_angle of the phenoarch routines """
+    max_len = 0
+    max_angle = None
+    for angle in bin_side_images:
+        bbox = foreground_bounding_box(bin_side_images[angle])
+        if bbox is not None and bbox[2] - bbox[0] + 1 > max_len:
+            max_len = bbox[2] - bbox[0] + 1
+            max_angle = angle
+    return max_angle
+
+
+class _BatchWorker(object):
+    """ Reconstruct one plant directory. The projections are computed once
+    per (id_camera, angle) and reused for all the plants of the worker.
+    """
+
+    def __init__(self, calibrations, output_dir, extension, binarize,
+                 with_ref_view, kwargs):
+        self.calibrations = calibrations
+        self.output_dir = output_dir
+        self.extension = extension
+        self.binarize = binarize
+        self.with_ref_view = with_ref_view
+        self.kwargs = kwargs
+        self._projections = dict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_projections"] = dict()
+        return state
+
+    def projection(self, id_camera, angle):
+        key = (id_camera, angle)
+        if key not in self._projections:
+            self._projections[key] = self.calibrations[
+                id_camera].get_projection(angle)
+        return self._projections[key]
+
+    def image_views(self, bin_images):
+        ref_angle = None
+        if self.with_ref_view and "side" in bin_images:
+            ref_angle = _select_ref_angle(bin_images["side"])
+
+        image_views = list()
+        for id_camera in bin_images:
+            for angle in bin_images[id_camera]:
+                image_ref = None
+                if id_camera == "side" and angle == ref_angle:
+                    image_ref = bin_images[id_camera][angle]
+
+                image_views.append(ImageView(
+                    bin_images[id_camera][angle],
+                    self.projection(id_camera, angle),
+                    inclusive=id_camera == "top",
+                    image_ref=image_ref))
+        return image_views
+
+    def __call__(self, name_dir, output_name=None):
+        """ BatchResult of the plant, with the traceback in error if its
+        reconstruction failed """
+        seconds = collections.OrderedDict((s, 0.0) for s in _STAGES)
+        try:
+            return self._reconstruct(name_dir, output_name, seconds)
+        except Exception:
+            return BatchResult(name_dir=name_dir,
+                               filename=None,
+                               voxel_grid=None,
+                               nb_voxels=0,
+                               nb_images=0,
+                               seconds=seconds,
+                               error=traceback.format_exc())
+
+    def _reconstruct(self, name_dir, output_name, seconds):
+        t0 = time.time()
+        if self.binarize is None:
+            bin_images = read_bin_images(name_dir)
+            seconds["decode"] = time.time() - t0
+        else:
+            raw_images = read_raw_images(name_dir)
+            t1 = time.time()
+            seconds["decode"] = t1 - t0
+            bin_images = self.binarize(raw_images)
+            seconds["binarize"] = time.time() - t1
+
+        t0 = time.time()
+        image_views = self.image_views(bin_images)
+        voxel_grid = reconstruction_3d(image_views, **self.kwargs)
+        seconds["reconstruction"] = time.time() - t0
+
+        nb_voxels = len(voxel_grid)
+        filename = None
+        if self.output_dir is not None:
+            t0 = time.time()
+            if output_name is None:
+                output_name = os.path.basename(os.path.normpath(name_dir))
+            filename = os.path.join(
+                self.output_dir, "{}.{}".format(output_name, self.extension))
+            voxel_grid.write(filename)
+            seconds["write"] = time.time() - t0
+            voxel_grid = None
+
+        return BatchResult(name_dir=name_dir,
+                           filename=filename,
+                           voxel_grid=voxel_grid,
+                           nb_voxels=nb_voxels,
+                           nb_images=len(image_views),
+                           seconds=seconds,
+                           error=None)
+
+
+_worker = None
+
+
+def _init_worker(worker):
+    global _worker
+    _worker = worker
+
+
+def _run_worker(name_dir, output_name):
+    return _worker(name_dir, output_name)
+
+# ==============================================================================
+
+
+def reconstruction_3d_batch(name_dirs,
+                            calibrations,
+                            output_dir=None,
+                            extension="npz",
+                            binarize=None,
+                            with_ref_view=True,
+                            n_processes=1,
+                            output_names=None,
+                            **kwargs):
+    """ Reconstruct the plants of several directories with the same
+    calibrations.
+
+    Each plant is decoded, binarized, carved with reconstruction_3d and
+    written by one process of a pool, so the stages of different plants
+    overlap. The calibrations are sent once to each process, which computes
+    the projection of each (id_camera, angle) once for all its plants.
+
+    A plant whose reconstruction raises an exception does not stop the
+    batch : its BatchResult has voxel_grid None and the traceback in error.
+
+    Parameters
+    ----------
+    name_dirs : list of str
+        Plant directories, organized as read by openalea.phenomenal.data
+        (bin/ or raw/ sub-directories)
+    calibrations : dict
+        dict[id_camera] of CalibrationCamera, shared by all the plants
+    output_dir : str, optional
+        If given, the VoxelGrid of each plant is written in
+        output_dir/<output name>.<extension> and not returned.
+    extension : str, optional
+        Format of the written files ("npz", "json" or "csv")
+    binarize : callable, optional
+        binarize(raw_images) -> bin_images, both dict[id_camera][angle] of
+        images. If None, the binary images of bin/ are read. It must be
+        picklable when n_processes > 1 (module level function).
+    with_ref_view : bool, optional
+        If True, the side image with the widest foreground is used as
+        image_ref, as get_image_views of the phenoarch routines.
+    n_processes : int, optional
+        Number of processes, 1 reconstructs in the current process.
+    output_names : list of str, optional
+        Name of the written file of each plant. By default the basename of
+        its directory, a ValueError is raised if two plant directories have
+        the same basename (day_1/plant_1 and day_2/plant_1 for example).
+    kwargs :
+        Parameters of reconstruction_3d (voxels_size, error_tolerance, ...)
+
+    Returns
+    -------
+    results : list of BatchResult
+        One result by plant, in the order of name_dirs
+    stats : BatchStats
+        Time spent in each stage
+    """
+    if output_names is None:
+        output_names = [os.path.basename(os.path.normpath(name_dir))
+                        for name_dir in name_dirs]
+        if output_dir is not None:
+            counter = collections.Counter(output_names)
+            duplicates = sorted(n for n in counter if counter[n] > 1)
+            if duplicates:
+                raise ValueError(
+                    "Plant directories with the same basename {}, give "
+                    "output_names to write them in different files".format(
+                        duplicates))
+    elif len(output_names) != len(name_dirs):
+        raise ValueError("output_names and name_dirs have different "
+                         "lengths")
+
+    worker = _BatchWorker(calibrations, output_dir, extension, binarize,
+                          with_ref_view, kwargs)
+    stats = BatchStats()
+    results = list()
+
+    start = time.time()
+    if n_processes == 1:
+        for name_dir, output_name in zip(name_dirs, output_names):
+            results.append(worker(name_dir, output_name))
+            stats.add(results[-1])
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+                n_processes,
+                initializer=_init_worker,
+                initargs=(worker,)) as executor:
+            for result in executor.map(_run_worker, name_dirs,
+                                       output_names):
+                results.append(result)
+                stats.add(result)
+    stats.wall_seconds = time.time() - start
+
+    return results, stats
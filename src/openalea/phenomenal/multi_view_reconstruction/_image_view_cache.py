@@ -0,0 +1,166 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+# ==============================================================================
+from __future__ import division, print_function, absolute_import
+
+import collections
+import threading
+import weakref
+import numpy
+
+from ._integral_image import integral_image
+# ==============================================================================
+
+__all__ = ["foreground_bounding_box",
+           "ImageViewCache",
+           "image_view_cache"]
+
+# ==============================================================================
+
+
+def foreground_bounding_box(image):
+    """ (x_min, y_min, x_max, y_max) of the positive pixels of the image,
+    bounds included, None if the image is empty """
+    yy = numpy.flatnonzero(numpy.any(image > 0, axis=1))
+    xx = numpy.flatnonzero(numpy.any(image > 0, axis=0))
+    if len(xx) == 0:
+        return None
+    return int(xx[0]), int(yy[0]), int(xx[-1]), int(yy[-1])
+
+
+def _nbytes(value):
+    if isinstance(value, numpy.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+class ImageViewCache(object):
+    """ Cache of the data computed from the binary image of the image views
+    (integral image, foreground bounding box, downsampled images).
+
+    The data are computed lazily the first time they are asked and kept for
+    the next calls with the same ImageView object. An entry is dropped when
+    its ImageView is garbage collected or when its image attribute is
+    replaced by another array. Modifying the image in place is not detected,
+    call clear() in that case.
+
+    When the cached arrays exceed max_nbytes, the least recently used image
+    views are evicted.
+    """
+
+    def __init__(self, max_nbytes=1024 ** 3):
+        self._nbytes = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.RLock()
+        self.max_nbytes = max_nbytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    @property
+    def max_nbytes(self):
+        return self._max_nbytes
+
+    @max_nbytes.setter
+    def max_nbytes(self, value):
+        self._max_nbytes = value
+        self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def _remove(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._nbytes -= sum(_nbytes(v) for v in entry[2].values())
+
+    def _evict(self):
+        with self._lock:
+            while self._nbytes > self._max_nbytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+
+    def get(self, image_view, name, compute):
+        """ Return the data name of image_view, computed with
+        compute(image_view) if not in the cache.
+        """
+        key = id(image_view)
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is None or entry[0]() is not image_view or
+                    entry[1]() is not image_view.image):
+                self._remove(key)
+                entry = (weakref.ref(image_view,
+                                     lambda ref, key=key: self._remove(key)),
+                         weakref.ref(image_view.image),
+                         dict())
+                self._entries[key] = entry
+
+            self._entries.move_to_end(key)
+            if name in entry[2]:
+                return entry[2][name]
+
+        value = compute(image_view)
+
+        with self._lock:
+            if self._entries.get(key) is entry and name not in entry[2]:
+                entry[2][name] = value
+                self._nbytes += _nbytes(value)
+                self._evict()
+
+        return value
+
+    # ==========================================================================
+
+    def integral_image(self, image_view):
+        """ Integral image of the binary image, see integral_image """
+
+        def compute(iv):
+            return integral_image(iv.image)
+
+        return self.get(image_view, "integral_image", compute)
+
+    def foreground_bounding_box(self, image_view):
+        """ Bounding box of the positive pixels of the binary image, see
+        foreground_bounding_box """
+
+        def compute(iv):
+            return foreground_bounding_box(iv.image)
+
+        return self.get(image_view, "foreground_bounding_box", compute)
+
+    def pyramid(self, image_view, nb_levels):
+        """ List of the nb_levels binary images downsampled by 2 at each
+        level, level 0 is the image itself. A pixel is positive if one of
+        the pixel it covers is positive.
+        """
+
+        def compute(iv):
+            images = [(iv.image > 0).astype(numpy.uint8)]
+            for i in range(1, nb_levels):
+                img = images[-1]
+                height, length = img.shape
+                img = numpy.pad(img, ((0, height % 2), (0, length % 2)))
+                img = img.reshape((img.shape[0] // 2, 2,
+                                   img.shape[1] // 2, 2)).max(axis=(1, 3))
+                images.append(img)
+            return images
+
+        return self.get(image_view, "pyramid_{}".format(nb_levels), compute)
+
+
+image_view_cache = ImageViewCache()
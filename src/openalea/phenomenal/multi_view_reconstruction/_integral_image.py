@@ -0,0 +1,82 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+# ==============================================================================
+from __future__ import division, print_function, absolute_import
+
+import numpy
+
+try:
+    import openalea.phenomenal.multi_view_reconstruction._c_mvr as c_mvr
+except ImportError:
+    c_mvr = None
+# ==============================================================================
+
+__all__ = ["integral_image_dtype",
+           "integral_image"]
+
+# ==============================================================================
+
+
+def integral_image_dtype(shape):
+    """ Smallest unsigned dtype (numpy.uint32 or numpy.uint64) able to
+    count all the pixels of an image of this shape """
+    if numpy.prod(shape, dtype=numpy.uint64) < 2 ** 32:
+        return numpy.dtype(numpy.uint32)
+    return numpy.dtype(numpy.uint64)
+
+
+def integral_image(image, dtype=None, method="auto"):
+    """ Integral image (summed-area table) of the positive pixels of image.
+
+    a[y, x] is the number of positive pixels image[:y + 1, :x + 1].
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        2D image, any dtype and memory layout
+
+    dtype : numpy.dtype, optional
+        dtype of the result. If None, numpy.uint32 or numpy.uint64 according
+        the number of pixels (see integral_image_dtype).
+
+    method : str, optional
+        "native" : compiled kernel of _c_mvr (numpy.uint32 only)
+        "numpy" : numpy.cumsum
+        "auto" : "native" when the kernel is available and dtype is
+        numpy.uint32, "numpy" else.
+
+    Returns
+    -------
+    out : numpy.ndarray
+    """
+    dtype = (integral_image_dtype(image.shape) if dtype is None
+             else numpy.dtype(dtype))
+
+    if method == "auto":
+        method = ("native" if c_mvr is not None and dtype == numpy.uint32
+                  else "numpy")
+
+    if method == "native":
+        if c_mvr is None:
+            raise ImportError("Native kernel _c_mvr is not compiled")
+        if dtype != numpy.uint32:
+            raise ValueError("Native kernel only supports numpy.uint32")
+
+        if image.dtype != numpy.uint8 or not image.flags.c_contiguous:
+            image = numpy.ascontiguousarray(image > 0, dtype=numpy.uint8)
+
+        a = numpy.zeros(image.shape, dtype=numpy.uint32)
+        c_mvr.integral_image(image, a)
+        return a
+
+    if method == "numpy":
+        a = numpy.cumsum(image > 0, axis=0, dtype=dtype)
+        return numpy.cumsum(a, axis=1, out=a)
+
+    raise ValueError("Unknown method {}".format(method))
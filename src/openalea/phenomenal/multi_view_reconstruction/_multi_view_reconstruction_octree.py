@@ -11,10 +11,14 @@ from __future__ import division, print_function, absolute_import
 
 import collections
 import math
+import time
 import numpy
 
-from .multi_view_reconstruction import get_bounding_box_voxel_projected
-from ..object import VoxelOctree
+from .multi_view_reconstruction import (get_bounding_box_voxel_projected,
+                                        get_integral_images,
+                                        visible_count)
+from ._reconstruction_monitor import ReconstructionMonitor
+from ..object import VoxelLinearOctree
 # ==============================================================================
 # Function for no kep
 
@@ -171,45 +175,15 @@ def remove_surrounded_fully_visible(leaf_nodes,
 # ==============================================================================
 
 
-def _keep_visible(voxels_node,
-                  image_views,
-                  error_tolerance=0):
-
-    kept = collections.deque()
-    for voxel_node in voxels_node:
-
-        voxel_position = voxel_node.position
-        voxel_size = voxel_node.size
-        negative_weight = 0
-
-        for image_view in image_views:
-            if not voxel_is_visible_in_image(
-                    voxel_position,
-                    voxel_size,
-                    image_view.image,
-                    image_view.projection,
-                    image_view.inclusive):
-                negative_weight += 1
-                if negative_weight > error_tolerance:
-                    break
-
-        if negative_weight <= error_tolerance:
-            kept.append(voxel_node)
-
-        else:
-            voxel_node.data = False
-
-    return kept
-
-
-# ==============================================================================
-
 def reconstruction_3d_octree(image_views,
                              voxels_size=4,
                              error_tolerance=0,
                              voxel_center_origin=(0.0, 0.0, 0.0),
                              world_size=4096,
-                             verbose=False):
+                             verbose=False,
+                             linear_octree=False,
+                             cache=None,
+                             monitor=None):
     """
     Construct a list of voxel represented object with positive value on binary
     image in images of images_projections.
@@ -242,21 +216,37 @@ def reconstruction_3d_octree(image_views,
         If True, print for each iteration of split, number of voxel before and
         after projection on images
 
+    linear_octree : bool, optional
+        If True, return the VoxelLinearOctree built by the carving instead of
+        converting it to a VoxelOctree (much lighter at small voxels size).
+
+    cache : ImageViewCache, optional
+        Cache of the integral images of the image views, for instance
+        image_view_cache, see reconstruction_3d. None by default.
+
+    monitor : ReconstructionMonitor, optional
+        Hooks called for each level and each image view, see
+        reconstruction_3d.
+
     Returns
     -------
-    out : collections.deque
-        List of visible voxel projected on each image according
-        the error_tolerance
+    out : VoxelOctree or VoxelLinearOctree
+        Octree of all the levels, the nodes with data True are visible
+        on each image according the error_tolerance
     """
 
     if len(image_views) == 0:
         raise ValueError("Len images view have not length")
 
-    voxel_octree = VoxelOctree.from_position(
-        voxel_center_origin, world_size, True)
+    if monitor is None:
+        monitor = ReconstructionMonitor()
+
+    start = time.perf_counter()
+    int_images = get_integral_images(image_views, cache=cache)
+    monitor.step("integral_images", time.perf_counter() - start)
 
-    leaf_nodes = collections.deque()
-    leaf_nodes.append(voxel_octree.root)
+    voxel_octree = VoxelLinearOctree.from_position(
+        voxel_center_origin, world_size, True)
 
     nb_iteration = 0
     while voxels_size < world_size:
@@ -265,26 +255,34 @@ def reconstruction_3d_octree(image_views,
 
     for i in range(nb_iteration):
 
-        tmp = collections.deque()
-        for leaf in leaf_nodes:
-            tmp.extend(leaf.creates_sons())
-        leaf_nodes = tmp
+        # Split the visible nodes of the last level, the others stay leaf
+        start = time.perf_counter()
+        voxels_position = voxel_octree.creates_sons(
+            mask=voxel_octree.get_level_data(i))
+        voxels_size = voxel_octree.level_size(i + 1)
+        monitor.level_start(voxels_size, len(voxels_position))
 
         if verbose is True:
             print('Iteration', i + 1, '/', nb_iteration, end="")
-            print(' : ', len(leaf_nodes), end="")
+            print(' : ', len(voxels_position), end="")
 
-        leaf_nodes = _keep_visible(leaf_nodes,
-                                   image_views,
-                                   error_tolerance)
+        kept = visible_count(voxels_position,
+                             voxels_size,
+                             image_views,
+                             error_tolerance=error_tolerance,
+                             int_images=int_images,
+                             monitor=monitor)
+        kept = kept >= len(image_views) - error_tolerance
 
-        # Gain time is not enough for keeping that
-        # if i + 1 < nb_iteration:
-        #     leaf_nodes = remove_surrounded_fully_visible(leaf_nodes,
-        #                                                  images_projections,
-        #                                                  error_tolerance)
+        voxel_octree.set_level_data(i + 1, kept)
+        monitor.level_end(voxels_size, len(voxels_position),
+                          numpy.count_nonzero(kept),
+                          time.perf_counter() - start)
 
         if verbose is True:
-            print(' - ', len(leaf_nodes))
+            print(' - ', numpy.count_nonzero(kept))
+
+    if linear_octree:
+        return voxel_octree
 
-    return voxel_octree
+    return voxel_octree.to_voxel_octree()
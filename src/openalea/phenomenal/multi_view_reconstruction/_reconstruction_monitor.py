@@ -0,0 +1,165 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+# ==============================================================================
+from __future__ import division, print_function, absolute_import
+
+import collections
+import logging
+import threading
+import tracemalloc
+# ==============================================================================
+
+__all__ = ["ReconstructionMonitor",
+           "LoggingMonitor",
+           "RecordingMonitor"]
+
+logger = logging.getLogger("openalea.phenomenal.multi_view_reconstruction")
+
+# ==============================================================================
+
+
+class ReconstructionMonitor(object):
+    """ Hooks called by reconstruction_3d and reconstruction_3d_octree,
+    override the methods to instrument the reconstruction. The default
+    methods do nothing.
+
+    With n_jobs > 1, view is called from the threads carving the chunks, once
+    for each chunk.
+    """
+
+    def step(self, name, seconds):
+        """ A step out of the levels ("integral_images", "bounding_volume",
+        "inconsistent") took seconds """
+
+    def level_start(self, voxels_size, nb_candidates):
+        """ nb_candidates voxels of voxels_size are going to be carved """
+
+    def view(self, voxels_size, index, nb_candidates, nb_kept, seconds):
+        """ nb_candidates voxels tested on the image view index, nb_kept
+        remain. seconds is a dict of the time spent in "projection" of the
+        voxels centers, "bounding_box" of the voxels projected and "lookup"
+        in the integral images """
+
+    def level_end(self, voxels_size, nb_candidates, nb_kept, seconds):
+        """ nb_kept voxels of voxels_size remain after a level of seconds """
+
+
+class LoggingMonitor(ReconstructionMonitor):
+    """ Log the steps and the levels with the logger
+    "openalea.phenomenal.multi_view_reconstruction", and the views with
+    view_level.
+    """
+
+    def __init__(self, level=logging.INFO, view_level=logging.DEBUG):
+        self.level = level
+        self.view_level = view_level
+
+    def step(self, name, seconds):
+        logger.log(self.level, "%s : %.3fs", name, seconds)
+
+    def view(self, voxels_size, index, nb_candidates, nb_kept, seconds):
+        if logger.isEnabledFor(self.view_level):
+            logger.log(self.view_level,
+                       "voxels size %s - view %d : %d -> %d voxels - %s",
+                       voxels_size, index, nb_candidates, nb_kept,
+                       ", ".join("{} {:.4f}s".format(k, v)
+                                 for k, v in seconds.items()))
+
+    def level_end(self, voxels_size, nb_candidates, nb_kept, seconds):
+        logger.log(self.level, "voxels size %s : %d -> %d voxels - %.3fs",
+                   voxels_size, nb_candidates, nb_kept, seconds)
+
+
+class RecordingMonitor(ReconstructionMonitor):
+    """ Record the steps, levels and views, to be exported to a monitoring
+    system.
+
+    steps : dict name -> seconds
+    levels : list of dict (voxels_size, nb_candidates, nb_kept, seconds,
+        peak_nbytes)
+    views : list of dict (voxels_size, index, nb_candidates, nb_kept and
+        the seconds of projection, bounding_box and lookup), one for each
+        level, image view and chunk
+
+    If trace_memory, tracemalloc is started and peak_nbytes is the peak of
+    the memory allocated during the level (numpy arrays included), None
+    else. Tracing slows down the allocations, close() stops it.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.steps = collections.OrderedDict()
+        self.levels = list()
+        self.views = list()
+        self.trace_memory = trace_memory
+        self._lock = threading.Lock()
+
+        self._tracing = trace_memory and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+
+    def close(self):
+        """ Stop tracemalloc if started by the monitor """
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def step(self, name, seconds):
+        with self._lock:
+            self.steps[name] = self.steps.get(name, 0.0) + seconds
+
+    def level_start(self, voxels_size, nb_candidates):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    def view(self, voxels_size, index, nb_candidates, nb_kept, seconds):
+        record = dict(voxels_size=voxels_size,
+                      index=index,
+                      nb_candidates=nb_candidates,
+                      nb_kept=nb_kept)
+        record.update(seconds)
+        with self._lock:
+            self.views.append(record)
+
+    def level_end(self, voxels_size, nb_candidates, nb_kept, seconds):
+        peak_nbytes = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak_nbytes = tracemalloc.get_traced_memory()[1]
+
+        with self._lock:
+            self.levels.append(dict(voxels_size=voxels_size,
+                                    nb_candidates=nb_candidates,
+                                    nb_kept=nb_kept,
+                                    seconds=seconds,
+                                    peak_nbytes=peak_nbytes))
+
+    def view_seconds(self, voxels_size):
+        """ Time spent in projection, bounding_box and lookup for the
+        voxels_size level, summed over the views """
+        seconds = collections.OrderedDict(
+            (k, 0.0) for k in ("projection", "bounding_box", "lookup"))
+        for record in self.views:
+            if record["voxels_size"] == voxels_size:
+                for k in seconds:
+                    seconds[k] += record[k]
+        return seconds
+
+    def __str__(self):
+        lines = ["{} : {:.3f}s".format(k, v) for k, v in self.steps.items()]
+        for level in self.levels:
+            line = "voxels size {} : {} -> {} voxels - {:.3f}s".format(
+                level["voxels_size"], level["nb_candidates"],
+                level["nb_kept"], level["seconds"])
+            seconds = self.view_seconds(level["voxels_size"])
+            if any(seconds.values()):
+                line += " (" + ", ".join("{} {:.3f}s".format(k, v)
+                                         for k, v in seconds.items()) + ")"
+            if level["peak_nbytes"] is not None:
+                line += " - peak {:.1f} MB".format(level["peak_nbytes"] / 1e6)
+            lines.append(line)
+        return "\n".join(lines)
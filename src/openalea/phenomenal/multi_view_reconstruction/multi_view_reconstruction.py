@@ -9,16 +9,22 @@
 # ==============================================================================
 from __future__ import division, print_function
 
+import os
 import math
+import time
+import logging
+import concurrent.futures
 import cv2
 import scipy.spatial
 import collections
 import numpy
+import scipy.optimize
 import sklearn.neighbors
 
-import openalea.phenomenal.multi_view_reconstruction._c_mvr as c_mvr
-
 from ..object import VoxelGrid
+from ._integral_image import c_mvr, integral_image
+from ._reconstruction_monitor import LoggingMonitor, logger
+from ._image_view_cache import foreground_bounding_box
 # ==============================================================================
 # Class
 
@@ -92,9 +98,23 @@ def get_bounding_box_voxel_projected(voxels_position,
     Returns
     -------
     bbox : numpy.ndarray
-        [[x_min, x_max, y_min, y_max], ...]
+        [[x_min, y_min, x_max, y_max], ...]
         Containing min and max value of point_3d projection in x and y axes.
+
+    Notes
+    -----
+    If the projection carries its 3x4 projection_matrix (see
+    CalibrationCamera.get_projection), the native kernel of _c_mvr projects
+    the corners without building them, parallelized with OpenMP.
     """
+    projection_matrix = _native_projection_matrix(projection)
+    if projection_matrix is not None:
+        voxels_position = numpy.ascontiguousarray(voxels_position,
+                                                  dtype=numpy.float64)
+        bbox = numpy.empty((len(voxels_position), 4), dtype=numpy.float64)
+        c_mvr.bounding_box_voxel_projected(
+            voxels_position, voxels_size, projection_matrix, bbox)
+        return bbox
 
     voxels_corners = get_voxels_corners(voxels_position, voxels_size)
 
@@ -106,6 +126,114 @@ def get_bounding_box_voxel_projected(voxels_position,
 
     return bbox
 
+
+def get_clamped_bounding_box_voxel_projected(voxels_position,
+                                             voxels_size,
+                                             projection,
+                                             shape_image):
+    """ Integer bounding boxes of the voxels projected, floored and clamped
+    on the image.
+
+    Parameters
+    ----------
+    voxels_position : numpy.ndarray
+        Center position of voxel
+
+    voxels_size : float
+        Size of side geometry of voxel
+
+    projection : function ((x, y, z)) -> (x, y)
+        Function of projection, see get_bounding_box_voxel_projected
+
+    shape_image : 2-tuple
+        Size height and length of the image
+
+    Returns
+    -------
+    out : (numpy.ndarray, numpy.ndarray)
+        [[x_min, y_min, x_max, y_max], ...] integer boxes (numpy.int64) of
+        pixels of the image, bounds included, and True for the voxels
+        projected out of the image.
+    """
+    height, length = shape_image
+
+    projection_matrix = _native_projection_matrix(projection)
+    if projection_matrix is not None:
+        voxels_position = numpy.ascontiguousarray(voxels_position,
+                                                  dtype=numpy.float64)
+        bbox = numpy.empty((len(voxels_position), 4), dtype=numpy.int64)
+        outside = numpy.empty(len(voxels_position), dtype=numpy.uint8)
+        c_mvr.clamped_bounding_box_voxel_projected(
+            voxels_position, voxels_size, projection_matrix,
+            height, length, bbox, outside)
+        return bbox, outside.view(bool)
+
+    bbox = get_bounding_box_voxel_projected(
+        voxels_position, voxels_size, projection)
+
+    outside = ((bbox[:, 2] < 0) | (bbox[:, 0] >= length) |
+               (bbox[:, 3] < 0) | (bbox[:, 1] >= height))
+
+    bbox = numpy.floor(bbox).astype(numpy.int64)
+    bbox[:, 0::2] = numpy.clip(bbox[:, 0::2], 0, length - 1)
+    bbox[:, 1::2] = numpy.clip(bbox[:, 1::2], 0, height - 1)
+
+    return bbox, outside
+
+
+def voxels_footprint_visible(voxels_position,
+                             voxels_size,
+                             projection,
+                             image_int):
+    """ Return True for the voxels whose exact footprint on the image (the
+    convex hull of the 8 corners projected) covers a positive pixel.
+
+    Parameters
+    ----------
+    voxels_position : numpy.ndarray
+        Center position of voxel
+
+    voxels_size : float
+        Size of side geometry of voxel
+
+    projection : function
+        Projection with a projection_matrix attribute (see
+        CalibrationCamera.get_projection)
+
+    image_int : numpy.ndarray
+        Integral image (numpy.uint32) of the binary image, see
+        integral_image
+
+    Returns
+    -------
+    out : numpy.ndarray
+        Boolean array
+    """
+    projection_matrix = _native_projection_matrix(projection)
+    if projection_matrix is None:
+        raise ValueError("The exact footprint needs the native kernel and a "
+                         "projection with a projection_matrix")
+    if image_int.dtype != numpy.uint32:
+        raise ValueError("Native kernel only supports numpy.uint32")
+
+    voxels_position = numpy.ascontiguousarray(voxels_position,
+                                              dtype=numpy.float64)
+    image_int = numpy.ascontiguousarray(image_int)
+    output = numpy.empty(len(voxels_position), dtype=numpy.uint8)
+    c_mvr.voxels_footprint_visible(
+        voxels_position, voxels_size, projection_matrix, image_int, output)
+
+    return output.view(bool)
+
+
+def _native_projection_matrix(projection):
+    """ Projection matrix usable by the native kernels, None if the kernels
+    are not compiled or the projection has no matrix """
+    projection_matrix = getattr(projection, "projection_matrix", None)
+    if c_mvr is None or projection_matrix is None:
+        return None
+    return numpy.ascontiguousarray(projection_matrix, dtype=numpy.float64)
+
 # ==============================================================================
 
 
@@ -163,12 +291,42 @@ def split_voxels_in_eight(voxels):
 
 # ==============================================================================
 
+def integral_image_boxes_sum(image_int, min_xy_max_xy):
+    """ Query the integral image for all the boxes at once.
+
+    Parameters
+    ----------
+    image_int : numpy.ndarray
+        Integral image of a binary image
+
+    min_xy_max_xy : numpy.ndarray
+        [[x_min, y_min, x_max, y_max], ...] integer boxes, already clamped on
+        the image, with x_min and y_min shifted of -1 for the integral image
+        lookup.
+
+    Returns
+    -------
+    out : numpy.ndarray
+        Sum of the integral image corners for each box, with the dtype of
+        image_int.
+    """
+    x_min = min_xy_max_xy[:, 0]
+    y_min = min_xy_max_xy[:, 1]
+    x_max = min_xy_max_xy[:, 2]
+    y_max = min_xy_max_xy[:, 3]
+
+    return (image_int[y_max, x_max] + image_int[y_min, x_min] -
+            image_int[y_min, x_max] - image_int[y_max, x_min])
+
+
 def voxels_is_visible_in_image(voxels_position,
                                voxels_size,
                                image,
                                projection,
                                inclusive,
-                               image_int=None):
+                               image_int=None,
+                               exact_footprint=False,
+                               timings=None):
     """
     Return a numpy array containing True if the voxel are
         projected is photo-consistent on image else False
@@ -209,6 +367,14 @@ def voxels_is_visible_in_image(voxels_position,
 
     image_int: Integrale image of the binary image (optimization)
 
+    exact_footprint: If True, the voxels whose bounding box projected
+    contains positive pixels are tested with their exact footprint (the
+    hexagon of the cube projected), row by row on the integral image. It
+    needs the native kernel and a projection with a projection_matrix.
+
+    timings: dict, optional. If given, the seconds spent in "projection" of
+    the voxels centers, "bounding_box" of the voxels projected and "lookup"
+    in the integral images are added to it.
 
     Returns
     -------
@@ -217,6 +383,8 @@ def voxels_is_visible_in_image(voxels_position,
         projected is photo-consistent on image else False
     """
 
+    t0 = time.perf_counter()
+
     height, length = image.shape
     ori_result = numpy.zeros((len(voxels_position, )), dtype=int)
 
@@ -237,13 +405,12 @@ def voxels_is_visible_in_image(voxels_position,
 
     # ==========================================================================
 
-    min_xy_max_xy = get_bounding_box_voxel_projected(
-        voxels_position, voxels_size, projection)
+    t1 = time.perf_counter()
 
-    vv = ((min_xy_max_xy[:, 2] < 0) |
-          (min_xy_max_xy[:, 0] >= length) |
-          (min_xy_max_xy[:, 3] < 0) |
-          (min_xy_max_xy[:, 1] >= height))
+    min_xy_max_xy, vv = get_clamped_bounding_box_voxel_projected(
+        voxels_position, voxels_size, projection, image.shape)
+
+    t2 = time.perf_counter()
 
     not_vv = numpy.logical_not(vv)
     result[vv] = 1 if inclusive else 0
@@ -251,43 +418,84 @@ def voxels_is_visible_in_image(voxels_position,
     min_xy_max_xy = min_xy_max_xy[not_vv]
     bb = result[not_vv]
 
-    min_xy_max_xy = numpy.floor(min_xy_max_xy).astype(int)
-
-    # X limit
-    (min_xy_max_xy[:, 0])[min_xy_max_xy[:, 0] >= length] = length - 1
-    (min_xy_max_xy[:, 2])[min_xy_max_xy[:, 2] >= length] = length - 1
-    # Y limit
-    (min_xy_max_xy[:, 1])[min_xy_max_xy[:, 1] >= height] = height - 1
-    (min_xy_max_xy[:, 3])[min_xy_max_xy[:, 3] >= height] = height - 1
     # Under zero limit
     min_xy_max_xy[:, 0:2] -= 1 # For integral image optimization
     min_xy_max_xy[min_xy_max_xy < 0] = 0
 
     # ==========================================================================
 
-    for i, (x_min, y_min, x_max, y_max) in enumerate(min_xy_max_xy):
+    bb[integral_image_boxes_sum(image_int, min_xy_max_xy) > 0] = 1
 
-        if (image_int[y_max, x_max] + image_int[y_min, x_min]
-        - image_int[y_min, x_max] - image_int[y_max, x_min]) > 0:
-            bb[i] = 1
-
-    # for i, (x_min, y_min, x_max, y_max) in enumerate(min_xy_max_xy):
-    #     if numpy.count_nonzero(image[y_min:y_max + 1, x_min:x_max + 1]) > 0:
-    #         bb[i] = 1
+    if exact_footprint:
+        index = numpy.flatnonzero(bb)
+        bb[index] = voxels_footprint_visible(
+            voxels_position[not_vv][index], voxels_size, projection,
+            image_int)
 
     result[not_vv] = bb
     ori_result[not_cond] = result
 
+    _add_timings(timings, t0, t1, t2)
     return ori_result
 
 
+def _add_timings(timings, t0, t1, t2):
+    if timings is not None:
+        t3 = time.perf_counter()
+        timings["projection"] = timings.get("projection", 0.0) + t1 - t0
+        timings["bounding_box"] = timings.get("bounding_box", 0.0) + t2 - t1
+        timings["lookup"] = timings.get("lookup", 0.0) + t3 - t2
+
 # ==============================================================================
 
+def _kept_visible_voxel(voxels_position,
+                        voxels_size,
+                        image_views,
+                        error_tolerance,
+                        int_images,
+                        exact_footprint=False,
+                        monitor=None):
+    """ Return the position of the voxels kept and, for each image view,
+    the position of the voxels removed on it.
+    """
+    photo_consistent = numpy.zeros((len(voxels_position), ),  dtype=int)
+    no_kept = list()
+
+    for i, image_view in enumerate(image_views):
+        timings = None if monitor is None else dict()
+        nb_candidates = len(voxels_position)
+        photo_consistent += voxels_is_visible_in_image(
+            voxels_position,
+            voxels_size,
+            image_view.image,
+            image_view.projection,
+            image_view.inclusive,
+            image_int=int_images[i],
+            exact_footprint=exact_footprint,
+            timings=timings)
+
+        cond = photo_consistent >= i + 1 - error_tolerance
+
+        no_kept.append(voxels_position[numpy.logical_not(cond)])
+        voxels_position = voxels_position[cond]
+        photo_consistent = photo_consistent[cond]
+
+        if monitor is not None:
+            monitor.view(voxels_size, i, nb_candidates, len(voxels_position),
+                         timings)
+
+    return voxels_position, no_kept
+
+
 def kept_visible_voxel(voxels_position,
                        voxels_size,
                        image_views,
                        error_tolerance=0,
-                       int_images=None):
+                       int_images=None,
+                       n_jobs=1,
+                       executor=None,
+                       exact_footprint=False,
+                       monitor=None):
     """
     Kept in a new collections.deque the voxel who is visible on each image of
     images_projections according the error_tolerance
@@ -311,40 +519,156 @@ def kept_visible_voxel(voxels_position,
 
     int_images: Integral image of the binary image (optimization)
 
+    n_jobs : int, optional
+        Number of chunks the voxels are split in, each chunk is carved in
+        parallel. The result is identical to the serial one (n_jobs=1).
+
+    executor : concurrent.futures.Executor, optional
+        Executor used to carve the chunks. If None and n_jobs > 1, a
+        ThreadPoolExecutor is created for the call. Threads share the images
+        and the integral images, nothing is copied.
+
+    exact_footprint: Test the exact footprint of the voxels, see
+    voxels_is_visible_in_image
+
+    monitor : ReconstructionMonitor, optional
+        Its view method is called for each image view (and chunk)
+
     Returns
     -------
     out : VoxelsStage
     """
 
-    photo_consistent = numpy.zeros((len(voxels_position), ),  dtype=int)
+    n_chunks = max(min(n_jobs, len(voxels_position)), 1)
+
+    if n_chunks == 1:
+        results = [_kept_visible_voxel(voxels_position, voxels_size,
+                                       image_views, error_tolerance,
+                                       int_images, exact_footprint,
+                                       monitor)]
+    else:
+        chunks = numpy.array_split(voxels_position, n_chunks)
+
+        def carve(chunk):
+            return _kept_visible_voxel(chunk, voxels_size, image_views,
+                                       error_tolerance, int_images,
+                                       exact_footprint, monitor)
+
+        if executor is None:
+            with concurrent.futures.ThreadPoolExecutor(n_chunks) as executor:
+                results = list(executor.map(carve, chunks))
+        else:
+            results = list(executor.map(carve, chunks))
+
+    # Same order than the serial path : chunks in order, voxels removed on
+    # the last image view first
+    voxels_position = numpy.concatenate([kept for kept, _ in results], axis=0)
+
     no_kept = None
+    if len(image_views) > 0:
+        no_kept = numpy.concatenate(
+            [removed[i] for i in range(len(image_views) - 1, -1, -1)
+             for _, removed in results], axis=0)
+
+    consistent = Voxels(voxels_position, voxels_size)
+    inconsistent = Voxels(no_kept, voxels_size)
+
+    return VoxelsStage(consistent, inconsistent)
+
+
+def _visible_count(voxels_position,
+                   voxels_size,
+                   image_views,
+                   error_tolerance,
+                   int_images,
+                   exact_footprint=False,
+                   monitor=None):
+
+    count = numpy.zeros((len(voxels_position), ), dtype=numpy.int8)
+    alive = numpy.arange(len(voxels_position))
 
     for i, image_view in enumerate(image_views):
-        photo_consistent += voxels_is_visible_in_image(
-            voxels_position,
+        timings = None if monitor is None else dict()
+        nb_candidates = len(alive)
+        count[alive] += voxels_is_visible_in_image(
+            voxels_position[alive],
             voxels_size,
             image_view.image,
             image_view.projection,
             image_view.inclusive,
-            image_int=int_images[i])
+            image_int=int_images[i],
+            exact_footprint=exact_footprint,
+            timings=timings).astype(numpy.int8)
 
-        cond = photo_consistent >= i + 1 - error_tolerance
+        if error_tolerance is not None:
+            alive = alive[count[alive] >= i + 1 - error_tolerance]
 
-        if no_kept is None:
-            no_kept = voxels_position[numpy.logical_not(cond)]
-        else:
-            no_kept = numpy.insert(no_kept,
-                                   0,
-                                   voxels_position[numpy.logical_not(cond)],
-                                   axis=0)
+        if monitor is not None:
+            monitor.view(voxels_size, i, nb_candidates, len(alive), timings)
 
-        voxels_position = voxels_position[cond]
-        photo_consistent = photo_consistent[cond]
+    return count
 
-    consistent = Voxels(voxels_position, voxels_size)
-    inconsistent = Voxels(no_kept, voxels_size)
 
-    return VoxelsStage(consistent, inconsistent)
+def visible_count(voxels_position,
+                  voxels_size,
+                  image_views,
+                  error_tolerance=None,
+                  int_images=None,
+                  n_jobs=1,
+                  executor=None,
+                  exact_footprint=False,
+                  monitor=None):
+    """
+    Return for each voxel the number of image views where it is visible.
+
+    Parameters
+    ----------
+    voxels_position : numpy.array([[x, y, z], ...]
+        Center position of the voxels
+
+    voxels_size : float
+        Diameter size of the voxels
+
+    image_views : [ImageView, ...]
+        At most 127 image views
+
+    error_tolerance : int, optional
+        If not None, a voxel not visible on more than error_tolerance image
+        views is not tested on the next ones, its count is then lower than
+        len(image_views) - error_tolerance but not exact.
+
+    int_images, n_jobs, executor, exact_footprint, monitor :
+        See kept_visible_voxel. Without error_tolerance, nb_kept of the
+        views of the monitor is the number of voxels tested.
+
+    Returns
+    -------
+    out : numpy.ndarray
+        Number of image views (numpy.int8) of each voxel
+    """
+
+    if len(image_views) > 127:
+        raise ValueError("More than 127 image views")
+
+    if int_images is None:
+        int_images = get_integral_images(image_views)
+
+    n_chunks = max(min(n_jobs, len(voxels_position)), 1)
+
+    def count(chunk):
+        return _visible_count(chunk, voxels_size, image_views,
+                              error_tolerance, int_images, exact_footprint,
+                              monitor)
+
+    if n_chunks == 1:
+        return count(voxels_position)
+
+    chunks = numpy.array_split(voxels_position, n_chunks)
+    if executor is None:
+        with concurrent.futures.ThreadPoolExecutor(n_chunks) as executor:
+            return numpy.concatenate(list(executor.map(count, chunks)))
+
+    return numpy.concatenate(list(executor.map(count, chunks)))
 
 # ==============================================================================
 
@@ -415,6 +739,150 @@ def check_groups(neigh, inconsistent, groups, nb_distance):
     return Voxels(position, inconsistent.size)
 
 
+def iter_boxes_pixels(boxes, length, max_pixels=2 ** 24):
+    """ Iterate on the pixels of the boxes, by chunks of at most max_pixels
+    pixels (at least one box).
+
+    Parameters
+    ----------
+    boxes : numpy.ndarray
+        [[x_min, y_min, x_max, y_max], ...] integer boxes of pixels, bounds
+        included, on an image of length columns
+
+    length : int
+        Number of columns of the image
+
+    max_pixels : int, optional
+
+    Yields
+    ------
+    out : (numpy.ndarray, numpy.ndarray)
+        Index of the box and flat index (y * length + x) of each pixel
+    """
+    width = boxes[:, 2] - boxes[:, 0] + 1
+    area = width * (boxes[:, 3] - boxes[:, 1] + 1)
+    end = numpy.cumsum(area)
+
+    start = 0
+    while start < len(boxes):
+        stop = max(numpy.searchsorted(
+            end, end[start] - area[start] + max_pixels, side='right'),
+            start + 1)
+
+        a = area[start:stop]
+        box = numpy.repeat(numpy.arange(start, stop), a)
+        offset = (numpy.arange(len(box)) -
+                  numpy.repeat(numpy.cumsum(a) - a, a))
+
+        pixel = ((boxes[box, 1] + offset // width[box]) * length +
+                 boxes[box, 0] + offset % width[box])
+
+        yield box, pixel
+
+        start = stop
+
+
+def create_groups_incidence(image_views, inconsistent, max_pairs=2 ** 24):
+    """ Vectorized create_groups, the groups are returned as a sparse
+    pixel -> voxel incidence instead of a dict of lists.
+
+    Parameters
+    ----------
+    image_views : [ImageView, ...]
+        Image views, with il, yy and xx attributes when image_ref is not
+        None (see reconstruction_inconsistent)
+
+    inconsistent : Voxels
+
+    max_pairs : int, optional
+        Maximum number of (pixel, voxel) pairs of the projected bounding
+        boxes expanded at once, it bounds the memory used.
+
+    Returns
+    -------
+    out : (numpy.ndarray, numpy.ndarray)
+        groups, index : the voxel index[k] belongs to the group (pixel
+        kept of an image view) groups[k]. Sorted by group then voxel index,
+        as the lists of create_groups.
+    """
+    groups, index = [numpy.zeros(0, dtype=numpy.int64)], \
+                    [numpy.zeros(0, dtype=numpy.int64)]
+
+    group_offset = 0
+    for iv in image_views:
+        if iv.image_ref is None:
+            continue
+
+        height, length = iv.image.shape
+
+        # Pixels positive on the reference image and kept
+        kept = numpy.zeros((height, length), dtype=bool)
+        kept[iv.yy, iv.xx] = True
+        kept &= iv.image_ref > 0
+        kept = kept.ravel()
+
+        boxes, outside = get_clamped_bounding_box_voxel_projected(
+            inconsistent.position, inconsistent.size, iv.projection,
+            (height, length))
+
+        voxels_index = numpy.flatnonzero(numpy.logical_not(outside))
+        boxes = boxes[voxels_index]
+
+        for box, pixel in iter_boxes_pixels(boxes, length, max_pairs):
+            cond = kept[pixel]
+            groups.append(pixel[cond] + group_offset)
+            index.append(voxels_index[box[cond]])
+
+        group_offset += height * length
+
+    groups = numpy.concatenate(groups)
+    index = numpy.concatenate(index)
+
+    order = numpy.lexsort((index, groups))
+
+    return groups[order], index[order]
+
+
+def check_groups_incidence(neigh, inconsistent, groups, index, nb_distance):
+    """ Vectorized check_groups on the groups of create_groups_incidence,
+    with one nearest neighbors query for all the voxels of the groups.
+
+    The voxels at the same distance are taken in the order of
+    distance.argsort() in check_groups : the groups where such a tie
+    crosses the nb_distance limit are sorted as in check_groups.
+    """
+    if len(groups) == 0:
+        return None
+
+    voxels_index, inverse = numpy.unique(index, return_inverse=True)
+    distance, _ = neigh.kneighbors(inconsistent.position[voxels_index])
+    distance = distance.min(axis=1)[inverse]
+
+    group_start = numpy.flatnonzero(numpy.r_[True, groups[1:] != groups[:-1]])
+    group_size = numpy.diff(numpy.r_[group_start, len(groups)])
+
+    # Rank of each voxel in its group, by distance
+    order = numpy.lexsort((distance, groups))
+    sorted_distance, sorted_index = distance[order], index[order]
+    rank = numpy.arange(len(groups)) - numpy.repeat(group_start, group_size)
+
+    kept = rank < nb_distance
+    tie = numpy.flatnonzero(group_size > nb_distance)
+    tie = tie[sorted_distance[group_start[tie] + nb_distance - 1] ==
+              sorted_distance[group_start[tie] + nb_distance]]
+
+    selected = list()
+    for start, size in zip(group_start[tie], group_size[tie]):
+        kept[start:start + size] = False
+        xx = distance[start:start + size].argsort()[:nb_distance]
+        selected.append(index[start:start + size][xx])
+
+    index = numpy.unique(numpy.concatenate([sorted_index[kept]] + selected))
+    position = numpy.unique(inconsistent.position[index], axis=0)
+
+    return Voxels(position, inconsistent.size)
+
+
 def reconstruction_inconsistent(image_views, stages, attractor=None):
 
     for iv in image_views:
@@ -451,10 +919,10 @@ def reconstruction_inconsistent(image_views, stages, attractor=None):
             position = numpy.unique(position, axis=0)
             inconsistent = Voxels(position, inconsistent.size)
 
-        groups = create_groups(image_views, inconsistent)
+        groups, index = create_groups_incidence(image_views, inconsistent)
         nb_distance = max(20 - int((20 / len(stages)) * i), 2)
-        consistents[i] = check_groups(
-            consistent_neighbors, inconsistent, groups, nb_distance)
+        consistents[i] = check_groups_incidence(
+            consistent_neighbors, inconsistent, groups, index, nb_distance)
 
     consistent_stages = [None] * len(stages)
     for i, (stage, consistent) in enumerate(zip(stages, consistents)):
@@ -474,17 +942,163 @@ def reconstruction_inconsistent(image_views, stages, attractor=None):
 # ==============================================================================
 
 def get_integrale_image(img):
-    a = numpy.zeros_like(img, dtype=int)
-    a[img > 0] = 1
-    for y, x in numpy.ndindex(a.shape):
-        if x - 1 >= 0:
-            a[y, x] += a[y, x - 1]
-        if y - 1 >= 0:
-            a[y, x] += a[y - 1, x]
-        if x - 1 >= 0 and y - 1 >= 0:
-            a[y, x] -= a[y - 1, x - 1]
-    return a
+    return integral_image(img, dtype=int)
+
+
+def get_integral_images(image_views, cache=None):
+    """ Return the list of the integral images of the binary image of each
+    image view (see integral_image).
+
+    If cache (ImageViewCache) is given, the integral images are taken from
+    it and computed only for the image views never seen before.
+    """
+    if cache is not None:
+        return [cache.integral_image(image_view) for image_view in image_views]
+
+    return [integral_image(image_view.image) for image_view in image_views]
+
+# ==============================================================================
+
+
+def get_bounding_volume(image_views, bounds=None, margin=1, cache=None):
+    """ Return the axis aligned bounding box of the intersection of the
+    frusta back-projected from the foreground bounding rectangle of each
+    image view.
+
+    Only the image views not inclusive, with a projection carrying its
+    3x4 projection_matrix attribute (see CalibrationCamera.get_projection),
+    constrain the volume. The bounding box of each linear constraint
+    intersection is computed with 6 linear programs.
+
+    Parameters
+    ----------
+    image_views : [ImageView, ...]
+
+    bounds : ((x_min, y_min, z_min), (x_max, y_max, z_max)), optional
+        Volume where the intersection is searched, its center (the origin
+        if None) must be in front of the cameras.
+
+    margin : int, optional
+        Number of pixels the foreground rectangles are dilated by
+
+    cache : ImageViewCache, optional
+        Cache of the foreground bounding rectangles
+
+    Returns
+    -------
+    out : (numpy.ndarray, numpy.ndarray) or None
+        (x_min, y_min, z_min), (x_max, y_max, z_max) of the volume, None if
+        no image view constrains it or the intersection is empty.
+    """
+    center = numpy.zeros(3)
+    if bounds is not None:
+        center = (numpy.array(bounds[0]) + numpy.array(bounds[1])) / 2
+
+    a_ub, b_ub = list(), list()
+    for image_view in image_views:
+        projection_matrix = getattr(
+            image_view.projection, "projection_matrix", None)
+
+        if image_view.inclusive or projection_matrix is None:
+            continue
+
+        if cache is not None:
+            bbox = cache.foreground_bounding_box(image_view)
+        else:
+            bbox = foreground_bounding_box(image_view.image)
+
+        if bbox is None:
+            return None
+
+        x_min, y_min, x_max, y_max = bbox
+        p = numpy.asarray(projection_matrix, dtype=float)
+        # Orient the matrix so that w > 0 for the points in front of the
+        # camera, the center of the volume is taken in front of it
+        if numpy.dot(p[2], numpy.append(center, 1)) < 0:
+            p = -p
+
+        # Pixel i covers [i, i + 1[, point in front of the camera (w > 0)
+        # u >= x_min <=> (x_min * p[2] - p[0]) . X <= 0 ...
+        for row in (x_min - margin) * p[2] - p[0], \
+                   p[0] - (x_max + 1 + margin) * p[2], \
+                   (y_min - margin) * p[2] - p[1], \
+                   p[1] - (y_max + 1 + margin) * p[2], \
+                   -p[2]:
+            norm = numpy.linalg.norm(row[:3])
+            a_ub.append(row[:3] / norm)
+            b_ub.append(-row[3] / norm)
+
+    if len(a_ub) == 0:
+        return None
+
+    a_ub, b_ub = numpy.array(a_ub), numpy.array(b_ub)
+    if bounds is not None:
+        bounds = list(zip(bounds[0], bounds[1]))
+    else:
+        bounds = [(None, None)] * 3
+
+    bbox_min, bbox_max = numpy.zeros(3), numpy.zeros(3)
+    for i in range(3):
+        for sign, bbox in ((1, bbox_min), (-1, bbox_max)):
+            c = numpy.zeros(3)
+            c[i] = sign
+            res = scipy.optimize.linprog(c, A_ub=a_ub, b_ub=b_ub,
+                                         bounds=bounds, method="highs")
+            if res.status != 0:
+                return None
+            bbox[i] = res.x[i]
+
+    return bbox_min, bbox_max
+
+
+# Rank in split_voxels_in_eight of the son [x][y][z] offset (0 : minus,
+# 1 : plus)
+_SPLIT_OFFSET_RANK = numpy.array([[[0, 3], [2, 6]],
+                                  [[1, 5], [4, 7]]])
+
+
+def get_bounding_volume_voxels(bounding_volume,
+                               voxel_center_origin,
+                               list_voxels_size,
+                               max_voxels=4096):
+    """ Return the voxels of the finest level of the octree starting with a
+    voxel of size list_voxels_size[0] centered on voxel_center_origin which
+    cover the bounding volume with at most max_voxels voxels.
+
+    Returns
+    -------
+    out : (Voxels, int)
+        Voxels covering the bounding volume, in the order of the splits of
+        the first voxel, and their level in list_voxels_size
+    """
+    bbox_min, bbox_max = bounding_volume
+    corner = numpy.array(voxel_center_origin, dtype=float)
+    corner -= list_voxels_size[0] / 2
+
+    voxels, level = None, 0
+    for i, size in enumerate(list_voxels_size):
+        nb = int(round(list_voxels_size[0] / size))
+        i_min = numpy.clip(numpy.floor((bbox_min - corner) / size), 0, nb - 1)
+        i_max = numpy.clip(numpy.floor((bbox_max - corner) / size), 0, nb - 1)
+
+        if numpy.prod(i_max - i_min + 1) > max_voxels:
+            break
 
+        index = numpy.stack(numpy.meshgrid(
+            *[numpy.arange(i_min[j], i_max[j] + 1) for j in range(3)],
+            indexing="ij"), axis=-1).reshape(-1, 3)
+
+        # Order of split_voxels_in_eight applied i times : the son offset
+        # of the split l is the digit l - 1 (base 8) of the rank
+        bits = (index[:, numpy.newaxis, :].astype(int) >>
+                numpy.arange(i - 1, -1, -1)[:, numpy.newaxis]) & 1
+        offset = _SPLIT_OFFSET_RANK[bits[..., 0], bits[..., 1], bits[..., 2]]
+        rank = numpy.dot(offset, 8 ** numpy.arange(i))
+        index = index[numpy.argsort(rank, kind="stable")]
+
+        voxels, level = Voxels(corner + (index + 0.5) * size, size), i
+
+    return voxels, level
 
 # ==============================================================================
 
@@ -495,7 +1109,13 @@ def reconstruction_3d(image_views,
                       voxel_center_origin=(0.0, 0.0, 0.0),
                       start_voxel_size=4096,
                       voxels_position=None,
-                      attractor=None):
+                      attractor=None,
+                      n_jobs=1,
+                      cache=None,
+                      bounding_volume=False,
+                      all_tolerances=False,
+                      exact_footprint=False,
+                      monitor=None):
     """
     Construct a list of voxel represented object with positive value on binary
     image in images of images_projections.
@@ -524,56 +1144,170 @@ def reconstruction_3d(image_views,
         List of first original voxel who will be split. If None, a list is
         create with the voxel_center_origin value.
 
+    n_jobs : int, optional
+        Number of threads used to carve the voxels of each level, -1 to use
+        all the processors. The result is identical whatever the value.
+
+    cache : ImageViewCache, optional
+        Cache of the integral images of the image views, for instance
+        image_view_cache, so that reconstructing again from the same image
+        views skips the pre-processing. The images must then not be modified
+        in place between the calls (see ImageViewCache). None by default,
+        nothing is kept.
+
+    bounding_volume : bool, optional
+        If True and voxels_position is None, the octree is seeded with the
+        voxels covering the intersection of the frusta back-projected from
+        the foreground rectangles of the images (see get_bounding_volume),
+        skipping the first levels. Ignored if error_tolerance > 0, a voxel
+        can then be out of some frusta, or if an image view has an
+        image_ref, the voxels removed on the skipped levels can then be
+        added back.
+
+    all_tolerances : bool, optional
+        If True, each voxel carries the number of image views where it and
+        its parents are visible, the voxels are pruned at error_tolerance
+        only and the voxel grids of all the tolerances 0 to error_tolerance
+        are returned, computed in one pass. Not available with image_ref.
+
+    exact_footprint : bool, optional
+        If True, the voxels are tested with the exact footprint of the cube
+        projected instead of its bounding box, see
+        voxels_is_visible_in_image. Fewer voxels are kept.
+
+    monitor : ReconstructionMonitor, optional
+        Hooks called for the pre-processing steps, each level and each image
+        view, see ReconstructionMonitor. By default the levels are logged at
+        the DEBUG level (LoggingMonitor).
+
     Returns
     -------
-    out : VoxelGrid
+    out : VoxelGrid or [VoxelGrid, ...]
+        The list of the voxel grids of each tolerance if all_tolerances
     """
 
     if len(image_views) == 0:
         raise ValueError("Len images view have not length")
 
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    if monitor is None:
+        monitor = LoggingMonitor(level=logging.DEBUG)
+
+    seed_with_origin = voxels_position is None
     if voxels_position is None:
         voxels_position = numpy.array([voxel_center_origin])
 
     list_voxels_size = [voxels_size * 2 ** i for i in range(20, -1, -1) if
                         voxels_size * 2 ** (i - 1) < start_voxel_size]
 
+    if (bounding_volume and seed_with_origin and error_tolerance == 0 and
+            not have_image_ref(image_views) and len(list_voxels_size) > 1):
+        start = time.perf_counter()
+        half_size = list_voxels_size[0] / 2
+        volume = get_bounding_volume(
+            image_views,
+            bounds=(voxels_position[0] - half_size,
+                    voxels_position[0] + half_size),
+            cache=cache)
+
+        if volume is not None:
+            # Margin of a voxel, its projected bounding box is larger
+            # than its projection
+            volume = (volume[0] - voxels_size, volume[1] + voxels_size)
+            # The seeds are not carved, they are taken before the last level
+            voxels, level = get_bounding_volume_voxels(
+                volume, voxels_position[0], list_voxels_size[:-1])
+
+            logger.info("Bounding volume : %d levels skipped, %d voxels of "
+                        "size %s instead of %d", level, len(voxels.position),
+                        voxels.size, 8 ** level)
+
+            voxels_position = voxels.position
+            list_voxels_size = list_voxels_size[level:]
+
+        monitor.step("bounding_volume", time.perf_counter() - start)
+
     # Pre-processing (optimization): Compute integral image for speed
     # computation
+    start = time.perf_counter()
+    int_images = get_integral_images(image_views, cache=cache)
+    monitor.step("integral_images", time.perf_counter() - start)
 
-    int_images = list()
-    for i, image_view in enumerate(image_views):
-
-        a = numpy.zeros_like(image_view.image, dtype=numpy.uint32)
-        c_mvr.integral_image(image_view.image, a)
-        int_images.append(a)
-
+    executor = None
+    if n_jobs > 1:
+        executor = concurrent.futures.ThreadPoolExecutor(n_jobs)
 
     stage = VoxelsStage(Voxels(voxels_position, list_voxels_size[0]), None)
     stages = [stage]
 
-    while stage.consistent.size != voxels_size:
-        if len(stage.consistent.position) == 0:
-            break
-
-        voxels = split_voxels_in_eight(stage.consistent)
-
-        print(voxels.size)
-
-        if voxels.size < 512:
-            stage = kept_visible_voxel(
-                voxels.position, voxels.size, image_views,
-                error_tolerance=error_tolerance,
-                int_images=int_images)
-        else:
-            stage = VoxelsStage(voxels, None)
-
-        stages.append(stage)
+    nb_views = len(image_views)
+    if all_tolerances:
+        if have_image_ref(image_views):
+            raise ValueError("all_tolerances is not available with image_ref")
+        # Minimum along the voxel and its parents of the number of views
+        # where they are visible
+        views_count = numpy.full(len(voxels_position), nb_views,
+                                 dtype=numpy.int8)
+
+    try:
+        while stage.consistent.size != voxels_size:
+            if len(stage.consistent.position) == 0:
+                break
+
+            start = time.perf_counter()
+            voxels = split_voxels_in_eight(stage.consistent)
+            monitor.level_start(voxels.size, len(voxels.position))
+
+            if all_tolerances:
+                # Sons are ordered by son offset then parent
+                views_count = numpy.tile(views_count, 8)
+
+            if all_tolerances:
+                views_count = numpy.minimum(views_count, visible_count(
+                    voxels.position, voxels.size, image_views,
+                    error_tolerance=error_tolerance,
+                    int_images=int_images,
+                    n_jobs=n_jobs,
+                    executor=executor,
+                    exact_footprint=exact_footprint,
+                    monitor=monitor))
+
+                cond = views_count >= nb_views - error_tolerance
+                views_count = views_count[cond]
+                stage = VoxelsStage(
+                    Voxels(voxels.position[cond], voxels.size), None)
+
+            else:
+                stage = kept_visible_voxel(
+                    voxels.position, voxels.size, image_views,
+                    error_tolerance=error_tolerance,
+                    int_images=int_images,
+                    n_jobs=n_jobs,
+                    executor=executor,
+                    exact_footprint=exact_footprint,
+                    monitor=monitor)
+
+            stages.append(stage)
+            monitor.level_end(voxels.size, len(voxels.position),
+                              len(stage.consistent.position),
+                              time.perf_counter() - start)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if all_tolerances:
+        return [VoxelGrid(stage.consistent.position[
+            views_count >= nb_views - tolerance], stage.consistent.size)
+            for tolerance in range(error_tolerance + 1)]
 
     consistent_stages = [stage.consistent for stage in stages]
     if have_image_ref(image_views):
+        start = time.perf_counter()
         consistent_stages = reconstruction_inconsistent(image_views, stages,
                                                         attractor=attractor)
+        monitor.step("inconsistent", time.perf_counter() - start)
 
     return VoxelGrid(consistent_stages[-1].position, consistent_stages[-1].size)
 
@@ -585,11 +1319,18 @@ def project_voxel_centers_on_image(voxels_position,
                                    shape_image,
                                    projection,
                                    value=255,
-                                   dtype=numpy.uint8):
+                                   dtype=numpy.uint8,
+                                   accumulate=False,
+                                   labels=None,
+                                   max_loop_boxes=2048):
     """
     Create a image with same shape that shape_image and project each voxel on
     image and write positive value (255) on it.
 
+    Above max_loop_boxes voxels, all the boxes are painted at once : the
+    number of boxes covering each pixel comes from a 2D difference array and
+    two cumulative sums.
+
     Parameters
     ----------
     voxels_position : numpy.ndarray
@@ -605,6 +1346,13 @@ def project_voxel_centers_on_image(voxels_position,
         value between 0 and 255 of positive pixel. By default 255.
     dtype : type
         numpy type of the returned image. By default numpy.uint8.
+    accumulate : bool, optional
+        If True, each pixel is value times the number of voxels covering it.
+    labels : numpy.ndarray, optional
+        Label of each voxel. If given, each pixel is the label of the last
+        voxel covering it (value is not used), 0 elsewhere.
+    max_loop_boxes : int, optional
+        Number of voxels up to which the boxes are painted one by one.
 
     Returns
     -------
@@ -612,29 +1360,64 @@ def project_voxel_centers_on_image(voxels_position,
         Binary image
     """
     height, length = shape_image
-    img = numpy.zeros((height, length), dtype=dtype)
-
-    min_xy_max_xy = get_bounding_box_voxel_projected(
-        voxels_position, voxels_size, projection)
 
-    vv = ((min_xy_max_xy[:, 2] < 0) |
-          (min_xy_max_xy[:, 0] >= length) |
-          (min_xy_max_xy[:, 3] < 0) |
-          (min_xy_max_xy[:, 1] >= height))
+    min_xy_max_xy, vv = get_clamped_bounding_box_voxel_projected(
+        voxels_position, voxels_size, projection, shape_image)
 
     not_vv = numpy.logical_not(vv)
     min_xy_max_xy = min_xy_max_xy[not_vv]
 
-    min_xy_max_xy = numpy.floor(min_xy_max_xy)
-    min_xy_max_xy[min_xy_max_xy < 0] = 0
-    (min_xy_max_xy[:, 0])[min_xy_max_xy[:, 0] >= length] = length - 1
-    (min_xy_max_xy[:, 1])[min_xy_max_xy[:, 1] >= height] = height - 1
-    (min_xy_max_xy[:, 2])[min_xy_max_xy[:, 2] >= length] = length - 1
-    (min_xy_max_xy[:, 3])[min_xy_max_xy[:, 3] >= height] = height - 1
-    min_xy_max_xy = min_xy_max_xy.astype(int)
-
-    for x_min, y_min, x_max, y_max in min_xy_max_xy:
-        img[y_min:y_max + 1, x_min:x_max + 1] = value
+    if labels is not None:
+        labels = numpy.asarray(labels)[not_vv]
+
+        # Last voxel covering each pixel
+        last = numpy.full(height * length, -1, dtype=numpy.int64)
+        for box, pixel in iter_boxes_pixels(min_xy_max_xy, length):
+            numpy.maximum.at(last, pixel, box)
+
+        img = numpy.zeros(height * length, dtype=dtype)
+        cond = last >= 0
+        img[cond] = labels[last[cond]]
+
+        return img.reshape((height, length))
+
+    img = numpy.zeros((height, length), dtype=dtype)
+
+    # Few boxes : painting them one by one is cheaper than the cumulative sums
+    if len(min_xy_max_xy) <= max_loop_boxes:
+        for x_min, y_min, x_max, y_max in min_xy_max_xy:
+            if accumulate:
+                img[y_min:y_max + 1, x_min:x_max + 1] += value
+            else:
+                img[y_min:y_max + 1, x_min:x_max + 1] = value
+        return img
+
+    # Difference array on the region covered by the boxes, with a margin
+    # of one pixel
+    x_0, y_0 = min_xy_max_xy[:, 0].min(), min_xy_max_xy[:, 1].min()
+    x_1, y_1 = min_xy_max_xy[:, 2].max(), min_xy_max_xy[:, 3].max()
+    shape = (y_1 - y_0 + 2, x_1 - x_0 + 2)
+
+    x_min, y_min, x_max, y_max = (min_xy_max_xy -
+                                  numpy.array([x_0, y_0, x_0, y_0])).T
+
+    index = numpy.concatenate(
+        (numpy.ravel_multi_index((y_min, x_min), shape),
+         numpy.ravel_multi_index((y_min, x_max + 1), shape),
+         numpy.ravel_multi_index((y_max + 1, x_min), shape),
+         numpy.ravel_multi_index((y_max + 1, x_max + 1), shape)))
+    weight = numpy.repeat([1, -1, -1, 1], len(x_min))
+
+    count = numpy.bincount(index, weights=weight,
+                           minlength=shape[0] * shape[1])
+    count = count.astype(numpy.int64).reshape(shape)
+    count = numpy.cumsum(numpy.cumsum(count, axis=0), axis=1)[:-1, :-1]
+
+    region = img[y_0:y_1 + 1, x_0:x_1 + 1]
+    if accumulate:
+        region[:] = count * value
+    else:
+        region[count > 0] = value
 
     return img
 
@@ -16,3 +16,87 @@ def integral_image(np.ndarray[unsigned char, ndim=2, mode="c"] input,
                      input.shape[0], 
                      input.shape[1], 
                      <unsigned int*> output.data);
+
+
+cdef extern from "projection.h":
+    void c_bounding_box_voxel_projected(const double* voxels_position,
+                                        const long long nb_voxels,
+                                        const double voxels_size,
+                                        const double* projection_matrix,
+                                        double* output) nogil
+
+    void c_clamped_bounding_box_voxel_projected(
+        const double* voxels_position,
+        const long long nb_voxels,
+        const double voxels_size,
+        const double* projection_matrix,
+        const long long height,
+        const long long length,
+        long long* output,
+        unsigned char* outside) nogil
+
+
+def bounding_box_voxel_projected(
+        np.ndarray[double, ndim=2, mode="c"] voxels_position,
+        double voxels_size,
+        np.ndarray[double, ndim=2, mode="c"] projection_matrix,
+        np.ndarray[double, ndim=2, mode="c"] output):
+
+    with nogil:
+        c_bounding_box_voxel_projected(
+            <const double*> voxels_position.data,
+            voxels_position.shape[0],
+            voxels_size,
+            <const double*> projection_matrix.data,
+            <double*> output.data)
+
+
+def clamped_bounding_box_voxel_projected(
+        np.ndarray[double, ndim=2, mode="c"] voxels_position,
+        double voxels_size,
+        np.ndarray[double, ndim=2, mode="c"] projection_matrix,
+        long long height,
+        long long length,
+        np.ndarray[long long, ndim=2, mode="c"] output,
+        np.ndarray[unsigned char, ndim=1, mode="c"] outside):
+
+    with nogil:
+        c_clamped_bounding_box_voxel_projected(
+            <const double*> voxels_position.data,
+            voxels_position.shape[0],
+            voxels_size,
+            <const double*> projection_matrix.data,
+            height,
+            length,
+            <long long*> output.data,
+            <unsigned char*> outside.data)
+
+
+cdef extern from "projection.h":
+    void c_voxels_footprint_visible(const double* voxels_position,
+                                    const long long nb_voxels,
+                                    const double voxels_size,
+                                    const double* projection_matrix,
+                                    const unsigned int* image_int,
+                                    const long long height,
+                                    const long long length,
+                                    unsigned char* output) nogil
+
+
+def voxels_footprint_visible(
+        np.ndarray[double, ndim=2, mode="c"] voxels_position,
+        double voxels_size,
+        np.ndarray[double, ndim=2, mode="c"] projection_matrix,
+        np.ndarray[unsigned int, ndim=2, mode="c"] image_int,
+        np.ndarray[unsigned char, ndim=1, mode="c"] output):
+
+    with nogil:
+        c_voxels_footprint_visible(
+            <const double*> voxels_position.data,
+            voxels_position.shape[0],
+            voxels_size,
+            <const double*> projection_matrix.data,
+            <const unsigned int*> image_int.data,
+            image_int.shape[0],
+            image_int.shape[1],
+            <unsigned char*> output.data)
@@ -9,15 +9,14 @@ void c_integral_image(const unsigned char* input,
     /* ####################################################### */
     /*             INITIALIZE BORDER X OF THE IMAGE            */
     /* ####################################################### */
+    output[0] = (input[0] > 0) ? 1 : 0;
+
     for(unsigned int x = 1; x < size_x; ++x)
     {
+        output[x * size_y] = output[(x - 1) * size_y];
         if (input[x * size_y] > 0)
         {
-            output[x * size_y] = 1;
-        }
-        else
-        {
-            output[x * size_y] = 0;
+            output[x * size_y] += 1;
         }
     }
 
@@ -27,13 +26,10 @@ void c_integral_image(const unsigned char* input,
 
     for(unsigned int y = 1; y < size_y; ++y)
     {
+        output[y] = output[y - 1];
         if (input[y] > 0)
         {
-            output[y] = 1;
-        }
-        else
-        {
-            output[y] = 0;
+            output[y] += 1;
         }
     }
 
@@ -0,0 +1,221 @@
+#include <cmath>
+#include "projection.h"
+
+/* ####################################################### */
+/*      BOUNDING BOX OF THE 8 CORNERS OF A VOXEL PROJECTED */
+/* ####################################################### */
+
+static inline void voxel_bounding_box(const double* position,
+                                      const double r,
+                                      const double* p,
+                                      double* bbox)
+{
+    bbox[0] = HUGE_VAL;
+    bbox[1] = HUGE_VAL;
+    bbox[2] = -HUGE_VAL;
+    bbox[3] = -HUGE_VAL;
+
+    for(int k = 0; k < 8; ++k)
+    {
+        const double x = position[0] + ((k & 1) ? r : -r);
+        const double y = position[1] + ((k & 2) ? r : -r);
+        const double z = position[2] + ((k & 4) ? r : -r);
+
+        const double w = p[8] * x + p[9] * y + p[10] * z + p[11];
+        const double u = (p[0] * x + p[1] * y + p[2] * z + p[3]) / w;
+        const double v = (p[4] * x + p[5] * y + p[6] * z + p[7]) / w;
+
+        if (u < bbox[0]) bbox[0] = u;
+        if (v < bbox[1]) bbox[1] = v;
+        if (u > bbox[2]) bbox[2] = u;
+        if (v > bbox[3]) bbox[3] = v;
+    }
+}
+
+void c_bounding_box_voxel_projected(const double* voxels_position,
+                                    const long long nb_voxels,
+                                    const double voxels_size,
+                                    const double* projection_matrix,
+                                    double* output)
+{
+    const double r = voxels_size / 2.0;
+
+    #pragma omp parallel for
+    for(long long i = 0; i < nb_voxels; ++i)
+    {
+        voxel_bounding_box(voxels_position + 3 * i,
+                           r,
+                           projection_matrix,
+                           output + 4 * i);
+    }
+}
+
+/* ####################################################### */
+/*      BOUNDING BOX FLOORED AND CLAMPED ON THE IMAGE      */
+/* ####################################################### */
+
+static inline long long clamp(const double value, const long long size)
+{
+    if (value < 0.0) return 0;
+    if (value >= (double) size) return size - 1;
+    return (long long) std::floor(value);
+}
+
+void c_clamped_bounding_box_voxel_projected(const double* voxels_position,
+                                            const long long nb_voxels,
+                                            const double voxels_size,
+                                            const double* projection_matrix,
+                                            const long long height,
+                                            const long long length,
+                                            long long* output,
+                                            unsigned char* outside)
+{
+    const double r = voxels_size / 2.0;
+
+    #pragma omp parallel for
+    for(long long i = 0; i < nb_voxels; ++i)
+    {
+        double bbox[4];
+        voxel_bounding_box(voxels_position + 3 * i,
+                           r,
+                           projection_matrix,
+                           bbox);
+
+        outside[i] = (bbox[2] < 0.0 || bbox[0] >= (double) length ||
+                      bbox[3] < 0.0 || bbox[1] >= (double) height) ? 1 : 0;
+
+        output[4 * i + 0] = clamp(bbox[0], length);
+        output[4 * i + 1] = clamp(bbox[1], height);
+        output[4 * i + 2] = clamp(bbox[2], length);
+        output[4 * i + 3] = clamp(bbox[3], height);
+    }
+}
+
+/* ####################################################### */
+/*      EXACT FOOTPRINT : PROJECTED CUBE AGAINST PIXELS    */
+/* ####################################################### */
+
+// Edges of the cube, corner k has the offsets (k & 1, k & 2, k & 4)
+static const int CUBE_EDGES[12][2] = {
+    {0, 1}, {2, 3}, {4, 5}, {6, 7},
+    {0, 2}, {1, 3}, {4, 6}, {5, 7},
+    {0, 4}, {1, 5}, {2, 6}, {3, 7}};
+
+static inline unsigned int rectangle_sum(const unsigned int* image_int,
+                                         const long long length,
+                                         const long long x_min,
+                                         const long long y_min,
+                                         const long long x_max,
+                                         const long long y_max)
+{
+    // Summed-area table, bounds included
+    unsigned int s = image_int[y_max * length + x_max];
+    if (x_min > 0)
+        s -= image_int[y_max * length + x_min - 1];
+    if (y_min > 0)
+        s -= image_int[(y_min - 1) * length + x_max];
+    if (x_min > 0 && y_min > 0)
+        s += image_int[(y_min - 1) * length + x_min - 1];
+    return s;
+}
+
+static inline bool footprint_visible(const double* position,
+                                     const double r,
+                                     const double* p,
+                                     const unsigned int* image_int,
+                                     const long long height,
+                                     const long long length)
+{
+    double u[8], v[8];
+    double v_min = HUGE_VAL, v_max = -HUGE_VAL;
+
+    for(int k = 0; k < 8; ++k)
+    {
+        const double x = position[0] + ((k & 1) ? r : -r);
+        const double y = position[1] + ((k & 2) ? r : -r);
+        const double z = position[2] + ((k & 4) ? r : -r);
+
+        const double w = p[8] * x + p[9] * y + p[10] * z + p[11];
+        u[k] = (p[0] * x + p[1] * y + p[2] * z + p[3]) / w;
+        v[k] = (p[4] * x + p[5] * y + p[6] * z + p[7]) / w;
+
+        if (v[k] < v_min) v_min = v[k];
+        if (v[k] > v_max) v_max = v[k];
+    }
+
+    const long long row_min = clamp(v_min, height);
+    const long long row_max = clamp(v_max, height);
+
+    for(long long row = row_min; row <= row_max; ++row)
+    {
+        // x extent of the projected cube in the band [row, row + 1], the
+        // silhouette edges of the cube are cube edges
+        const double band_min = (double) row;
+        const double band_max = (double) (row + 1);
+        double x_lo = HUGE_VAL, x_hi = -HUGE_VAL;
+
+        for(int e = 0; e < 12; ++e)
+        {
+            double ua = u[CUBE_EDGES[e][0]], va = v[CUBE_EDGES[e][0]];
+            double ub = u[CUBE_EDGES[e][1]], vb = v[CUBE_EDGES[e][1]];
+
+            if (va > vb)
+            {
+                double t;
+                t = ua; ua = ub; ub = t;
+                t = va; va = vb; vb = t;
+            }
+
+            if (vb < band_min || va > band_max)
+                continue;
+
+            double x0 = ua, x1 = ub;
+            if (vb > va)
+            {
+                const double slope = (ub - ua) / (vb - va);
+                if (va < band_min)
+                    x0 = ua + (band_min - va) * slope;
+                if (vb > band_max)
+                    x1 = ua + (band_max - va) * slope;
+            }
+
+            if (x0 < x_lo) x_lo = x0;
+            if (x1 < x_lo) x_lo = x1;
+            if (x0 > x_hi) x_hi = x0;
+            if (x1 > x_hi) x_hi = x1;
+        }
+
+        if (x_hi < 0.0 || x_lo >= (double) length || x_lo > x_hi)
+            continue;
+
+        if (rectangle_sum(image_int, length,
+                          clamp(x_lo, length), row,
+                          clamp(x_hi, length), row) > 0)
+            return true;
+    }
+
+    return false;
+}
+
+void c_voxels_footprint_visible(const double* voxels_position,
+                                const long long nb_voxels,
+                                const double voxels_size,
+                                const double* projection_matrix,
+                                const unsigned int* image_int,
+                                const long long height,
+                                const long long length,
+                                unsigned char* output)
+{
+    const double r = voxels_size / 2.0;
+
+    #pragma omp parallel for schedule(dynamic, 64)
+    for(long long i = 0; i < nb_voxels; ++i)
+    {
+        output[i] = footprint_visible(voxels_position + 3 * i,
+                                      r,
+                                      projection_matrix,
+                                      image_int,
+                                      height,
+                                      length) ? 1 : 0;
+    }
+}
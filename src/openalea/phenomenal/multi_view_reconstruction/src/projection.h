@@ -0,0 +1,24 @@
+
+void c_bounding_box_voxel_projected(const double* voxels_position,
+                                    const long long nb_voxels,
+                                    const double voxels_size,
+                                    const double* projection_matrix,
+                                    double* output);
+
+void c_clamped_bounding_box_voxel_projected(const double* voxels_position,
+                                            const long long nb_voxels,
+                                            const double voxels_size,
+                                            const double* projection_matrix,
+                                            const long long height,
+                                            const long long length,
+                                            long long* output,
+                                            unsigned char* outside);
+
+void c_voxels_footprint_visible(const double* voxels_position,
+                                const long long nb_voxels,
+                                const double voxels_size,
+                                const double* projection_matrix,
+                                const unsigned int* image_int,
+                                const long long height,
+                                const long long length,
+                                unsigned char* output);
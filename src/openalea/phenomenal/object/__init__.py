@@ -18,8 +18,11 @@ Data Structure
    :toctree: generated/
 
    Image3D
+   BrickImage3D
    ImageView
    VoxelGrid
+   VoxelOctree
+   VoxelLinearOctree
    VoxelSegment
    VoxelOrgan
    VoxelSkeleton
@@ -30,7 +33,9 @@ from __future__ import division, print_function, absolute_import
 
 from .imageView import ImageView
 from .image3D import Image3D
+from .brickImage3D import BrickImage3D
 from .voxelOctree import VoxelOctree
+from .voxelLinearOctree import VoxelLinearOctree
 from .voxelGrid import VoxelGrid
 from .voxelSegment import VoxelSegment
 from .voxelSkeleton import VoxelSkeleton
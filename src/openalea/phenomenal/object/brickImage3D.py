@@ -0,0 +1,160 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+# ==============================================================================
+from __future__ import division, print_function, absolute_import
+
+import itertools
+import numpy
+
+from .image3D import Image3D
+# ==============================================================================
+
+
+class BrickImage3D(object):
+    """ Sparse 3D image stored as a dict of dense cubic bricks.
+
+    bricks[(i, j, k)] is the dense block [i * brick_size, (i + 1) *
+    brick_size) x ... of the image, the missing bricks are zeros. Only the
+    bricks containing a voxel are allocated, so the memory follows the
+    number of voxels and not the volume of the bounding box.
+
+    Slicing the image with 3 slices returns the dense Image3D of the region.
+    """
+
+    def __init__(self, shape,
+                 voxels_size=1,
+                 world_coordinate=(0, 0, 0),
+                 brick_size=32,
+                 dtype=numpy.uint8):
+
+        if len(shape) != 3:
+            raise ValueError("shape len must be equal to 3")
+
+        self.shape = tuple(int(v) for v in shape)
+        self.voxels_size = voxels_size
+        self.world_coordinate = world_coordinate
+        self.brick_size = int(brick_size)
+        self.dtype = numpy.dtype(dtype)
+        self.bricks = dict()
+
+    @staticmethod
+    def from_index(voxels_index, shape,
+                   voxels_size=1,
+                   world_coordinate=(0, 0, 0),
+                   brick_size=32,
+                   dtype=numpy.uint8,
+                   value=1):
+        """ Sparse image with value at the (N, 3) voxels index """
+        image = BrickImage3D(shape,
+                             voxels_size=voxels_size,
+                             world_coordinate=world_coordinate,
+                             brick_size=brick_size,
+                             dtype=dtype)
+
+        voxels_index = numpy.asarray(voxels_index).reshape((-1, 3))
+        if len(voxels_index) == 0:
+            return image
+
+        # Sort the voxels by brick
+        bs = image.brick_size
+        grid_shape = tuple(-(-n // bs) for n in image.shape)
+        brick_id = numpy.ravel_multi_index(tuple((voxels_index // bs).T),
+                                           grid_shape)
+        order = numpy.argsort(brick_id, kind='stable')
+        brick_id = brick_id[order]
+        local = voxels_index[order] % bs
+
+        starts = numpy.flatnonzero(numpy.diff(brick_id)) + 1
+        starts = numpy.concatenate(([0], starts, [len(brick_id)]))
+        for start, stop in zip(starts[:-1], starts[1:]):
+            r = local[start:stop]
+            brick = numpy.zeros((bs, bs, bs), dtype=image.dtype)
+            brick[r[:, 0], r[:, 1], r[:, 2]] = value
+            key = numpy.unravel_index(brick_id[start], grid_shape)
+            image.bricks[tuple(int(v) for v in key)] = brick
+
+        return image
+
+    # ==========================================================================
+
+    @property
+    def ndim(self):
+        return 3
+
+    @property
+    def size(self):
+        return int(numpy.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return sum(brick.nbytes for brick in self.bricks.values())
+
+    def region(self, index_min, index_max):
+        """ Dense numpy array of the voxels [index_min, index_max), the
+        voxels outside the image are zeros """
+        index_min = numpy.array(index_min, dtype=int)
+        index_max = numpy.maximum(numpy.array(index_max, dtype=int),
+                                  index_min)
+        out = numpy.zeros(index_max - index_min, dtype=self.dtype)
+
+        bs = self.brick_size
+        ranges = [range(max(lo, 0) // bs, (min(hi, n) - 1) // bs + 1)
+                  for lo, hi, n in zip(index_min, index_max, self.shape)]
+
+        for key in itertools.product(*ranges):
+            brick = self.bricks.get(key)
+            if brick is None:
+                continue
+            lo = numpy.maximum(numpy.array(key) * bs, index_min)
+            hi = numpy.minimum(numpy.array(key) * bs + bs, index_max)
+            src = tuple(slice(a, b) for a, b in zip(lo - numpy.array(key) * bs,
+                                                    hi - numpy.array(key) * bs))
+            dst = tuple(slice(a, b) for a, b in zip(lo - index_min,
+                                                    hi - index_min))
+            out[dst] = brick[src]
+
+        return out
+
+    def __getitem__(self, key):
+        if (not isinstance(key, tuple) or len(key) != 3 or
+                not all(isinstance(s, slice) and s.step in (None, 1)
+                        for s in key)):
+            raise TypeError("BrickImage3D only supports 3 slices of step 1")
+
+        bounds = [s.indices(n)[:2] for s, n in zip(key, self.shape)]
+        index_min = [lo for lo, hi in bounds]
+        index_max = [max(lo, hi) for lo, hi in bounds]
+
+        world_coordinate = tuple(
+            numpy.array(self.world_coordinate) +
+            numpy.array(index_min) * self.voxels_size)
+
+        return Image3D(self.region(index_min, index_max),
+                       voxels_size=self.voxels_size,
+                       world_coordinate=world_coordinate,
+                       dtype=self.dtype)
+
+    def argwhere(self, voxels_value=1):
+        """ (N, 3) index of the voxels >= voxels_value, in the order of
+        numpy.argwhere on the dense image """
+        index = list()
+        for key, brick in self.bricks.items():
+            r = numpy.argwhere(brick >= voxels_value)
+            if len(r):
+                index.append(r + numpy.array(key) * self.brick_size)
+
+        if not index:
+            return numpy.zeros((0, 3), dtype=int)
+
+        index = numpy.concatenate(index)
+        return index[numpy.lexsort(index.T[::-1])]
+
+    def to_image_3d(self):
+        """ Dense Image3D of the whole image """
+        return self[:, :, :]
@@ -16,6 +16,7 @@ import numpy
 import csv
 
 from .image3D import Image3D
+from .brickImage3D import BrickImage3D
 # ==============================================================================
 
 
@@ -31,6 +32,31 @@ class NumpyEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+# Header of the binary format (.vxg), followed by the raw array of count
+# voxels : int16 or int32 index (compact) or float64 position
+_VXG_MAGIC = b"PHMVXG"
+_VXG_VERSION = 1
+_VXG_DTYPES = {0: numpy.dtype("<f8"),
+               1: numpy.dtype("<i2"),
+               2: numpy.dtype("<i4")}
+_VXG_HEADER = numpy.dtype([("magic", "S8"),
+                           ("version", "<u4"),
+                           ("kind", "<u4"),
+                           ("count", "<u8"),
+                           ("voxels_size", "<f8"),
+                           ("origin", "<f8", (3,)),
+                           ("reserved", "S8")])
+
+
+def _index_dtype(voxels_index):
+    """ numpy.int16, or numpy.int32 if the index does not fit in int16 """
+    if (len(voxels_index) > 0 and
+            (voxels_index.min() < numpy.iinfo(numpy.int16).min or
+             voxels_index.max() > numpy.iinfo(numpy.int16).max)):
+        return numpy.int32
+    return numpy.int16
+
+
 class VoxelGrid(object):
 
     def __init__(self, voxels_position, voxels_size):
@@ -38,28 +64,79 @@ class VoxelGrid(object):
         self._voxels_position = voxels_position
         self._voxels_size = voxels_size
 
+        # Compact representation : voxels_position == origin + index * size
+        self._voxels_index = None
+        self._origin = None
+
+    @staticmethod
+    def from_voxels_index(voxels_index, voxels_size, origin=(0.0, 0.0, 0.0)):
+        """ Create a compact VoxelGrid, where the voxels are stored as integer
+        index on the lattice origin + index * voxels_size.
+
+        Parameters
+        ----------
+        voxels_index : numpy.ndarray
+            (N, 3) integer array (int16 or int32) of the voxels index
+
+        voxels_size : float
+            Diameter size of the voxels
+
+        origin : (x, y, z), optional
+            Center position of the voxel of index (0, 0, 0)
+
+        Returns
+        -------
+        out : VoxelGrid
+        """
+        voxel_grid = VoxelGrid(None, voxels_size)
+        voxel_grid._voxels_index = voxels_index
+        voxel_grid._origin = numpy.array(origin, dtype=float)
+
+        return voxel_grid
+
     # ==========================================================================
     # GETTER & SETTER
     # ==========================================================================
 
     @property
     def voxels_position(self):
+        if self._voxels_position is None and self._voxels_index is not None:
+            # Computed on each access, the grid keeps only the index
+            return self._origin + self._voxels_index * self._voxels_size
         return self._voxels_position
 
     @voxels_position.setter
     def voxels_position(self, voxels_position):
         self._voxels_position = voxels_position
+        self._voxels_index = None
+        self._origin = None
 
     @voxels_position.deleter
     def voxels_position(self):
         del self._voxels_position
 
+    @property
+    def voxels_index(self):
+        return self._voxels_index
+
+    @property
+    def origin(self):
+        return self._origin
+
+    @property
+    def is_compact(self):
+        return self._voxels_index is not None
+
     @property
     def voxels_size(self):
         return self._voxels_size
 
     @voxels_size.setter
     def voxels_size(self, voxels_size):
+        if self.is_compact:
+            self._voxels_position = self.voxels_position
+            self._voxels_index = None
+            self._origin = None
         self._voxels_size = voxels_size
 
     @voxels_size.deleter
@@ -72,36 +149,31 @@ class VoxelGrid(object):
 
     def bounding_box(self):
 
-        if len(self._voxels_position) == 0:
+        if len(self) == 0:
             raise ValueError("Empty list")
 
-        x_min = float("inf")
-        y_min = float("inf")
-        z_min = float("inf")
-
-        x_max = - float("inf")
-        y_max = - float("inf")
-        z_max = - float("inf")
+        if self.is_compact:
+            index_min = self._voxels_index.min(axis=0)
+            index_max = self._voxels_index.max(axis=0)
+            return (tuple(self._origin + index_min * self._voxels_size),
+                    tuple(self._origin + index_max * self._voxels_size))
 
-        for x, y, z in self._voxels_position:
-            x_min = min(x_min, x)
-            y_min = min(y_min, y)
-            z_min = min(z_min, z)
+        voxels_position = numpy.asarray(self._voxels_position, dtype=float)
+        voxels_position = voxels_position.reshape((-1, 3))
 
-            x_max = max(x_max, x)
-            y_max = max(y_max, y)
-            z_max = max(z_max, z)
-
-        return (x_min, y_min, z_min), (x_max, y_max, z_max)
+        return (tuple(voxels_position.min(axis=0)),
+                tuple(voxels_position.max(axis=0)))
 
     def volume(self):
         """
         Compute the volume of the voxel point cloud
         """
 
-        return len(self._voxels_position) * self._voxels_size ** 3
+        return len(self) * self._voxels_size ** 3
 
     def __len__(self):
+        if self.is_compact:
+            return len(self._voxels_index)
         return len(self._voxels_position)
 
     # ==========================================================================
@@ -115,33 +187,113 @@ class VoxelGrid(object):
     # TRANSFORM
     # ==========================================================================
 
-    def to_image_3d(self):
-            (x_min, y_min, z_min), (x_max, y_max, z_max) = self.bounding_box()
-
-            len_x = int((x_max - x_min) / self.voxels_size + 1)
-            len_y = int((y_max - y_min) / self.voxels_size + 1)
-            len_z = int((z_max - z_min) / self.voxels_size + 1)
-
-            image_3d = Image3D.zeros((len_x, len_y, len_z),
-                                     dtype=numpy.bool,
-                                     voxels_size=self.voxels_size,
-                                     world_coordinate=(x_min, y_min, z_min))
-
-            bound_min = numpy.array((x_min, y_min, z_min))
-            vs_pos = numpy.array(self.voxels_position)
+    def to_compact(self, origin=None):
+        """ Return the compact representation of the voxel grid, the voxels
+        position are stored as int16 (or int32 if needed) index on the
+        lattice origin + index * voxels_size.
 
-            r = ((vs_pos - bound_min) / self.voxels_size).astype(int)
-            image_3d[r[:, 0], r[:, 1], r[:, 2]] = 1
-
-            return image_3d
+        Parameters
+        ----------
+        origin : (x, y, z), optional
+            Center position of the voxel of index (0, 0, 0). By default the
+            minimum corner of the bounding box.
 
+        Returns
+        -------
+        out : VoxelGrid
+        """
+        if self.is_compact:
+            if origin is None:
+                return self
+            return VoxelGrid(self.voxels_position,
+                             self._voxels_size).to_compact(origin=origin)
+
+        voxels_position = numpy.array(self._voxels_position, dtype=float)
+        voxels_position = voxels_position.reshape((-1, 3))
+
+        if origin is None:
+            if len(voxels_position) == 0:
+                origin = (0.0, 0.0, 0.0)
+            else:
+                origin = voxels_position.min(axis=0)
+        origin = numpy.array(origin, dtype=float)
+
+        voxels_index = numpy.round(
+            (voxels_position - origin) / self._voxels_size)
+
+        if not numpy.array_equal(origin + voxels_index * self._voxels_size,
+                                 voxels_position):
+            raise ValueError("voxels position are not on the lattice of "
+                             "origin {} and voxels size {}".format(
+                                 tuple(origin), self._voxels_size))
+
+        dtype = _index_dtype(voxels_index)
+
+        return VoxelGrid.from_voxels_index(voxels_index.astype(dtype),
+                                           self._voxels_size,
+                                           origin=origin)
+
+    def to_float(self):
+        """ Return the voxel grid with the voxels position stored as float
+        (N, 3) array.
+        """
+        return VoxelGrid(self.voxels_position, self._voxels_size)
+
+    def to_image_3d(self, sparse=False, brick_size=32):
+        """ Return the 3D binary image of the voxels over their bounding box.
+
+        Parameters
+        ----------
+        sparse : bool, optional
+            If True, return a BrickImage3D where only the bricks of
+            brick_size ** 3 voxels containing a voxel are allocated, instead
+            of the dense Image3D.
+        brick_size : int, optional
+            Size of the bricks of the sparse image
+
+        Returns
+        -------
+        out : Image3D or BrickImage3D
+        """
+        if self.is_compact:
+            index_min = self._voxels_index.min(axis=0)
+            r = self._voxels_index - index_min
+            world_coordinate = tuple(
+                self._origin + index_min * self._voxels_size)
+        else:
+            bound_min, _ = self.bounding_box()
+            vs_pos = numpy.asarray(self.voxels_position, dtype=float)
+            r = numpy.round((vs_pos.reshape((-1, 3)) - bound_min) /
+                            self.voxels_size).astype(int)
+            world_coordinate = bound_min
+
+        shape = tuple(r.max(axis=0) + 1)
+
+        if sparse:
+            return BrickImage3D.from_index(r, shape,
+                                           voxels_size=self.voxels_size,
+                                           world_coordinate=world_coordinate,
+                                           brick_size=brick_size,
+                                           dtype=numpy.bool_)
+
+        image_3d = Image3D.zeros(shape,
+                                 dtype=numpy.bool_,
+                                 voxels_size=self.voxels_size,
+                                 world_coordinate=world_coordinate)
+        image_3d[r[:, 0], r[:, 1], r[:, 2]] = 1
+
+        return image_3d
 
     @staticmethod
     def from_image_3d(image_3d, voxels_value=1,
                       voxels_size=None,
-                      world_coordinate=None):
+                      world_coordinate=None,
+                      compact=False):
 
-        xx, yy, zz = numpy.where(image_3d >= voxels_value)
+        if isinstance(image_3d, BrickImage3D):
+            xx, yy, zz = image_3d.argwhere(voxels_value).T
+        else:
+            xx, yy, zz = numpy.where(image_3d >= voxels_value)
 
         if voxels_size is None:
             voxels_size = image_3d.voxels_size
@@ -149,6 +301,16 @@ class VoxelGrid(object):
         if world_coordinate is None:
             world_coordinate = image_3d.world_coordinate
 
+        if compact:
+            dtype = numpy.int16
+            if max(image_3d.shape) > numpy.iinfo(numpy.int16).max:
+                dtype = numpy.int32
+
+            voxels_index = numpy.column_stack((xx, yy, zz)).astype(dtype)
+            return VoxelGrid.from_voxels_index(voxels_index,
+                                               voxels_size,
+                                               origin=world_coordinate)
+
         xxx = world_coordinate[0] + xx * voxels_size
         yyy = world_coordinate[1] + yy * voxels_size
 
@@ -158,6 +320,136 @@ class VoxelGrid(object):
 
         return VoxelGrid(voxels_position, voxels_size)
 
+    # ==========================================================================
+    # MULTI-RESOLUTION
+    # ==========================================================================
+
+    def cells_index(self, cells_size, origin=(0.0, 0.0, 0.0)):
+        """ (N, 3) int64 index of the cells of size cells_size, with a corner
+        at origin, containing the center of each voxel.
+
+        With origin equal to the voxel_center_origin of reconstruction_3d,
+        the cells of size 2 * voxels_size are the parents of the voxels in
+        the octree of the reconstruction.
+        """
+        return numpy.floor((self.voxels_position - numpy.array(origin)) /
+                           cells_size).astype(numpy.int64)
+
+    def downsample(self, factor=2, mode="any", origin=(0.0, 0.0, 0.0)):
+        """ Return the voxel grid of size factor * voxels_size.
+
+        Parameters
+        ----------
+        factor : int, optional
+            Each coarse voxel covers factor ** 3 voxels
+        mode : "any" or "majority", optional
+            A coarse voxel is kept if any of its voxels is occupied, or if
+            more than half of them are occupied.
+        origin : (x, y, z), optional
+            A corner of the coarse voxels, see cells_index
+
+        Returns
+        -------
+        out : VoxelGrid
+            Compact if the voxel grid is compact
+        """
+        if mode not in ("any", "majority"):
+            raise ValueError("Unknown mode {}".format(mode))
+
+        voxels_size = self._voxels_size * factor
+        origin = numpy.array(origin, dtype=float)
+        index = self.cells_index(voxels_size, origin=origin)
+
+        if len(index) == 0:
+            return VoxelGrid(numpy.zeros((0, 3)), voxels_size)
+
+        index_min = index.min(axis=0)
+        shape = tuple(index.max(axis=0) - index_min + 1)
+        keys, counts = numpy.unique(
+            numpy.ravel_multi_index(tuple((index - index_min).T), shape),
+            return_counts=True)
+
+        if mode == "majority":
+            keys = keys[2 * counts > factor ** 3]
+
+        index = numpy.column_stack(numpy.unravel_index(keys, shape))
+        origin = origin + (index_min + 0.5) * voxels_size
+
+        if self.is_compact:
+            return VoxelGrid.from_voxels_index(
+                index.astype(_index_dtype(index)), voxels_size, origin=origin)
+
+        return VoxelGrid(origin + index * voxels_size, voxels_size)
+
+    def upsample(self, factor=2):
+        """ Return the voxel grid of size voxels_size / factor, where each
+        voxel is split in factor ** 3 voxels.
+        """
+        voxels_size = self._voxels_size / factor
+        offsets = (numpy.argwhere(numpy.ones((factor,) * 3)) -
+                   (factor - 1) / 2) * voxels_size
+
+        voxels_position = numpy.asarray(self.voxels_position, dtype=float)
+        voxels_position = voxels_position.reshape((-1, 3))
+
+        voxels_position = (voxels_position[:, numpy.newaxis, :] +
+                           offsets[numpy.newaxis, :, :])
+
+        return VoxelGrid(voxels_position.reshape((-1, 3)), voxels_size)
+
+    def pyramid(self, nb_levels, mode="any", origin=(0.0, 0.0, 0.0)):
+        """ List of nb_levels voxel grids, the first is the voxel grid and
+        each next is downsampled by 2 from the previous, see downsample """
+        voxel_grids = [self]
+        for i in range(1, nb_levels):
+            voxel_grids.append(voxel_grids[-1].downsample(
+                factor=2, mode=mode, origin=origin))
+        return voxel_grids
+
+    def coarse_index(self, coarse_voxel_grid, origin=(0.0, 0.0, 0.0)):
+        """ Index in coarse_voxel_grid of the voxel containing each voxel,
+        -1 if there is none.
+
+        Data computed on a coarse grid (labels, segmentation, ...) are
+        transferred to the voxels with coarse_data[coarse_index], where
+        coarse_index >= 0.
+
+        Parameters
+        ----------
+        coarse_voxel_grid : VoxelGrid
+            Voxel grid with a voxels size multiple of voxels_size
+        origin : (x, y, z), optional
+            A corner of the voxels of both grids, see cells_index
+
+        Returns
+        -------
+        out : numpy.ndarray
+            (N, ) int64 array
+        """
+        voxels_size = coarse_voxel_grid.voxels_size
+        index = self.cells_index(voxels_size, origin=origin)
+        coarse_index = coarse_voxel_grid.cells_index(voxels_size,
+                                                     origin=origin)
+
+        result = numpy.full(len(index), -1, dtype=numpy.int64)
+        if len(index) == 0 or len(coarse_index) == 0:
+            return result
+
+        index_min = numpy.minimum(index.min(axis=0), coarse_index.min(axis=0))
+        index_max = numpy.maximum(index.max(axis=0), coarse_index.max(axis=0))
+        shape = tuple(index_max - index_min + 1)
+
+        keys = numpy.ravel_multi_index(tuple((index - index_min).T), shape)
+        coarse_keys = numpy.ravel_multi_index(
+            tuple((coarse_index - index_min).T), shape)
+
+        order = numpy.argsort(coarse_keys)
+        i = numpy.searchsorted(coarse_keys[order], keys)
+        i = numpy.minimum(i, len(order) - 1)
+        found = coarse_keys[order[i]] == keys
+        result[found] = order[i[found]]
+
+        return result
 
     # ==========================================================================
     # READ / WRITE
@@ -172,13 +464,19 @@ class VoxelGrid(object):
             return self.write_to_json(filename)
         if ext == "csv":
             return self.write_to_csv(filename)
+        if ext == "vxg":
+            return self.write_to_vxg(filename)
 
         raise ValueError("No extension")
 
     @staticmethod
-    def read(filename):
+    def read(filename, mmap_mode="r"):
+        """ Read the voxel grid, mmap_mode is used by the vxg format only
+        (see read_from_vxg) """
         ext = filename.split(".")[-1]
 
+        if ext == "vxg":
+            return VoxelGrid.read_from_vxg(filename, mmap_mode=mmap_mode)
         if ext == "npz":
             return VoxelGrid.read_from_npz(filename)
         if ext == "json":
@@ -197,6 +495,94 @@ class VoxelGrid(object):
         image_3d = Image3D.read_from_npz(filename)
         return VoxelGrid.from_image_3d(image_3d)
 
+    def write_to_vxg(self, filename):
+        """ Write the voxel grid in the binary vxg format : a 64 bytes header
+        (voxels size, origin, count and type of the array) followed by the
+        raw voxels array, which read_from_vxg maps without copy.
+
+        The voxels are stored as int16 / int32 index when the grid is
+        compact or its positions are on a lattice of step voxels_size,
+        as float64 positions otherwise.
+        """
+        if (os.path.dirname(filename) and not os.path.exists(
+                os.path.dirname(filename))):
+            os.makedirs(os.path.dirname(filename))
+
+        voxel_grid = self
+        if not self.is_compact:
+            try:
+                voxel_grid = self.to_compact()
+            except ValueError:
+                pass
+
+        header = numpy.zeros((), dtype=_VXG_HEADER)
+        header["magic"] = _VXG_MAGIC
+        header["version"] = _VXG_VERSION
+        header["count"] = len(voxel_grid)
+        header["voxels_size"] = voxel_grid.voxels_size
+
+        if voxel_grid.is_compact:
+            data = voxel_grid.voxels_index
+            header["kind"] = 1 if data.dtype == numpy.int16 else 2
+            header["origin"] = voxel_grid.origin
+        else:
+            data = numpy.array(voxel_grid.voxels_position, dtype=float)
+
+        data = numpy.ascontiguousarray(
+            data, dtype=_VXG_DTYPES[int(header["kind"])]).reshape((-1, 3))
+
+        with open(filename, 'wb') as f:
+            f.write(header.tobytes())
+            data.tofile(f)
+
+    @staticmethod
+    def read_from_vxg(filename, mmap_mode="r"):
+        """ Read a voxel grid written by write_to_vxg.
+
+        Parameters
+        ----------
+        filename : str
+        mmap_mode : None, 'r', 'r+', 'w+' or 'c', optional
+            Mode of numpy.memmap. By default the voxels array is mapped read
+            only, so only the pages used are read from the disk. If None, the
+            array is loaded in memory.
+
+        Returns
+        -------
+        out : VoxelGrid
+            Compact VoxelGrid when the file stores index
+        """
+        with open(filename, 'rb') as f:
+            header = numpy.fromfile(f, dtype=_VXG_HEADER, count=1)
+
+        if len(header) == 0 or header[0]["magic"] != _VXG_MAGIC:
+            raise ValueError("{} is not a vxg file".format(filename))
+        header = header[0]
+        if header["version"] != _VXG_VERSION:
+            raise ValueError("Unknown vxg version {}".format(
+                header["version"]))
+
+        dtype = _VXG_DTYPES[int(header["kind"])]
+        shape = (int(header["count"]), 3)
+
+        if shape[0] == 0:
+            data = numpy.zeros(shape, dtype=dtype)
+        elif mmap_mode is None:
+            with open(filename, 'rb') as f:
+                f.seek(_VXG_HEADER.itemsize)
+                data = numpy.fromfile(f, dtype=dtype, count=3 * shape[0])
+            data = data.reshape(shape)
+        else:
+            data = numpy.memmap(filename, dtype=dtype, mode=mmap_mode,
+                                offset=_VXG_HEADER.itemsize, shape=shape)
+
+        voxels_size = float(header["voxels_size"])
+        if header["kind"] == 0:
+            return VoxelGrid(data, voxels_size)
+
+        return VoxelGrid.from_voxels_index(data, voxels_size,
+                                           origin=header["origin"])
+
     def write_to_json(self, filename):
 
         if (os.path.dirname(filename) and not os.path.exists(
@@ -0,0 +1,463 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+# ==============================================================================
+""" Array based (linear) octree.
+
+Each level of the octree is stored as numpy arrays sorted by Morton key :
+the key of a node, its data, the bitmask of its existing sons and the index
+of its first son in the next level. The sons of a node are contiguous in the
+next level, so there is no Python object per node.
+"""
+# ==============================================================================
+from __future__ import division, print_function, absolute_import
+
+import collections
+import json
+import os
+import numpy
+
+from .voxelGrid import VoxelGrid
+from .voxelOctree import VoxelOctree
+# ==============================================================================
+
+OctreeNode = collections.namedtuple(
+    "OctreeNode", ['position', 'size', 'data', 'is_leaf', 'level', 'index'])
+
+# Offset (x, y, z) of each son in the VoxelNode.sons order
+_SONS_OFFSET = numpy.array([[0, 0, 0],
+                            [1, 0, 0],
+                            [0, 1, 0],
+                            [0, 0, 1],
+                            [1, 1, 0],
+                            [1, 0, 1],
+                            [0, 1, 1],
+                            [1, 1, 1]], dtype=numpy.uint64)
+
+# Offset (x, y, z) of the 26 neighbors of a node
+_NEIGHBORS_OFFSET = numpy.array(
+    [(dx, dy, dz) for dz in (1, 0, -1) for dy in (0, -1, 1)
+     for dx in (0, -1, 1) if (dx, dy, dz) != (0, 0, 0)], dtype=numpy.int64)
+
+# ==============================================================================
+
+
+def _spread_bits(v):
+    v = numpy.asarray(v, dtype=numpy.uint64) & numpy.uint64(0x1fffff)
+    v = (v | (v << numpy.uint64(32))) & numpy.uint64(0x1f00000000ffff)
+    v = (v | (v << numpy.uint64(16))) & numpy.uint64(0x1f0000ff0000ff)
+    v = (v | (v << numpy.uint64(8))) & numpy.uint64(0x100f00f00f00f00f)
+    v = (v | (v << numpy.uint64(4))) & numpy.uint64(0x10c30c30c30c30c3)
+    v = (v | (v << numpy.uint64(2))) & numpy.uint64(0x1249249249249249)
+    return v
+
+
+def _compact_bits(v):
+    v = numpy.asarray(v, dtype=numpy.uint64) & numpy.uint64(0x1249249249249249)
+    v = (v | (v >> numpy.uint64(2))) & numpy.uint64(0x10c30c30c30c30c3)
+    v = (v | (v >> numpy.uint64(4))) & numpy.uint64(0x100f00f00f00f00f)
+    v = (v | (v >> numpy.uint64(8))) & numpy.uint64(0x1f0000ff0000ff)
+    v = (v | (v >> numpy.uint64(16))) & numpy.uint64(0x1f00000000ffff)
+    v = (v | (v >> numpy.uint64(32))) & numpy.uint64(0x1fffff)
+    return v
+
+
+def morton_encode(index):
+    """ Return the Morton keys (numpy.uint64) of the (N, 3) integer index,
+    each coordinate must be in [0, 2**21[.
+    """
+    index = numpy.asarray(index, dtype=numpy.uint64).reshape((-1, 3))
+    return (_spread_bits(index[:, 0]) |
+            (_spread_bits(index[:, 1]) << numpy.uint64(1)) |
+            (_spread_bits(index[:, 2]) << numpy.uint64(2)))
+
+
+def morton_decode(keys):
+    """ Return the (N, 3) integer index of the Morton keys """
+    keys = numpy.asarray(keys, dtype=numpy.uint64)
+    return numpy.column_stack((_compact_bits(keys),
+                               _compact_bits(keys >> numpy.uint64(1)),
+                               _compact_bits(keys >> numpy.uint64(2))))
+
+# ==============================================================================
+
+
+class VoxelLinearOctree(object):
+
+    def __init__(self, position, size):
+        """ Octree of root center position and root size, without node. Use
+        from_position to create an octree with a root node.
+        """
+        self.position = numpy.array(position, dtype=float)
+        self.size = size
+
+        # One numpy array by level, level 0 is the root
+        self._keys = list()
+        self._data = list()
+        self._sons_mask = list()
+        self._sons_offset = list()
+
+    @classmethod
+    def from_position(cls, position, size, data):
+        octree = cls(position, size)
+        octree._append_level(numpy.zeros(1, dtype=numpy.uint64),
+                             numpy.array([data], dtype=bool))
+        return octree
+
+    def _append_level(self, keys, data):
+        self._keys.append(keys)
+        self._data.append(data)
+        self._sons_mask.append(numpy.zeros(len(keys), dtype=numpy.uint8))
+        self._sons_offset.append(numpy.full(len(keys), -1, dtype=numpy.int64))
+
+    # ==========================================================================
+    # GETTER
+    # ==========================================================================
+
+    def depth(self):
+        return len(self._keys) - 1
+
+    def __len__(self):
+        return sum(len(keys) for keys in self._keys)
+
+    def nbytes(self):
+        """ Memory used by the nodes arrays, in bytes """
+        return sum(a.nbytes for arrays in (self._keys,
+                                           self._data,
+                                           self._sons_mask,
+                                           self._sons_offset)
+                   for a in arrays)
+
+    def level_size(self, level):
+        return self.size / 2 ** level
+
+    def size_level(self, size):
+        """ Return the level of the nodes of size or None """
+        level = int(round(numpy.log2(self.size / size)))
+        if (level < 0 or level >= len(self._keys) or
+                self.level_size(level) != size):
+            return None
+        return level
+
+    def get_level_index(self, level):
+        """ Return the (N, 3) integer index of the nodes of the level """
+        return morton_decode(self._keys[level]).astype(numpy.int64)
+
+    def get_level_position(self, level):
+        """ Return the (N, 3) center position of the nodes of the level """
+        size = self.level_size(level)
+        corner = self.position - self.size / 2.0
+        return corner + (self.get_level_index(level) + 0.5) * size
+
+    def get_level_data(self, level):
+        return self._data[level]
+
+    def set_level_data(self, level, data):
+        self._data[level][:] = data
+
+    def get_level_is_leaf(self, level):
+        return self._sons_mask[level] == 0
+
+    def _index_of(self, position, level):
+        """ Return the integer index of the node of the level containing the
+        position """
+        size = self.level_size(level)
+        corner = self.position - self.size / 2.0
+        return numpy.floor(
+            (numpy.asarray(position, dtype=float) - corner) / size).astype(
+            numpy.int64)
+
+    def _find(self, level, keys):
+        """ Return the node index of the keys in the level, -1 if the node
+        does not exist """
+        level_keys = self._keys[level]
+        if len(level_keys) == 0:
+            return numpy.full(numpy.shape(keys), -1, dtype=numpy.int64)
+        i = numpy.searchsorted(level_keys, keys)
+        i = numpy.minimum(i, len(level_keys) - 1)
+        found = level_keys[i] == keys
+        return numpy.where(found, i, -1)
+
+    def _node(self, level, i):
+        size = self.level_size(level)
+        corner = self.position - self.size / 2.0
+        index = morton_decode(self._keys[level][i:i + 1])[0]
+        position = tuple(corner + (index.astype(numpy.int64) + 0.5) * size)
+
+        return OctreeNode(position, size, bool(self._data[level][i]),
+                          bool(self._sons_mask[level][i] == 0), level, i)
+
+    # ==========================================================================
+    # CONSTRUCTION
+    # ==========================================================================
+
+    def creates_sons(self, mask=None):
+        """ Split in 8 the nodes of the deepest level (where mask is True if
+        not None) and append the sons as a new level. Sons inherit the data
+        of their father.
+
+        Returns
+        -------
+        out : numpy.ndarray
+            (N, 3) center position of the created sons, in the order of the
+            new level.
+        """
+        level = len(self._keys) - 1
+        fathers = numpy.arange(len(self._keys[level]))
+        if mask is not None:
+            fathers = fathers[mask]
+
+        sons_keys = ((self._keys[level][fathers, None] << numpy.uint64(3)) +
+                     numpy.arange(8, dtype=numpy.uint64)).ravel()
+        sons_data = numpy.repeat(self._data[level][fathers], 8)
+
+        self._sons_mask[level][fathers] = 0xFF
+        self._sons_offset[level][fathers] = numpy.arange(len(fathers)) * 8
+
+        self._append_level(sons_keys, sons_data)
+
+        return self.get_level_position(level + 1)
+
+    # ==========================================================================
+    # QUERY
+    # ==========================================================================
+
+    def get_node_position(self, position):
+        """ Return the node centered on position or None, O(depth log n) """
+        position = numpy.asarray(position, dtype=float)
+        corner = self.position - self.size / 2.0
+        for level in range(len(self._keys)):
+            size = self.level_size(level)
+            index = (position - corner) / size - 0.5
+            if numpy.array_equal(index, numpy.round(index)) and (index >= 0).all():
+                i = self._find(level, morton_encode(index))[0]
+                if i >= 0:
+                    return self._node(level, i)
+        return None
+
+    def get_leaf_with_position(self, position):
+        """ Return the leaf containing the position or None,
+        O(depth log n) """
+        level = len(self._keys) - 1
+        index = self._index_of(position, level)
+        if (index < 0).any() or (index >= 2 ** level).any():
+            return None
+
+        key = morton_encode(index)
+        for level in range(len(self._keys) - 1, -1, -1):
+            i = self._find(level, key)[0]
+            if i >= 0:
+                return self._node(level, i)
+            key = key >> numpy.uint64(3)
+
+        return None
+
+    def get_neighbors_leaf(self, position, size):
+        """ Return the leafs containing the 26 neighbors positions of the node
+        of center position and size """
+        neighbors = numpy.asarray(position, dtype=float) + (
+            _NEIGHBORS_OFFSET * size)
+
+        leafs = list()
+        for neighbor in neighbors:
+            leaf = self.get_leaf_with_position(neighbor)
+            if leaf is not None:
+                leafs.append(leaf)
+
+        return leafs
+
+    def is_surrounded(self, position, size):
+        """ Return True if the 26 neighbors positions of the node of center
+        position and size are in leafs with data True """
+        neighbors = numpy.asarray(position, dtype=float) + (
+            _NEIGHBORS_OFFSET * size)
+
+        for neighbor in neighbors:
+            leaf = self.get_leaf_with_position(neighbor)
+            if leaf is None or leaf.data is False:
+                return False
+        return True
+
+    # ==========================================================================
+    # VoxelOctree API
+    # ==========================================================================
+
+    def get_leafs(self):
+        leafs = list()
+        for level in range(len(self._keys)):
+            for i in numpy.flatnonzero(self._sons_mask[level] == 0):
+                leafs.append(self._node(level, i))
+        return leafs
+
+    def get_leafs_with_data_equal_to(self, data):
+        return [leaf for leaf in self.get_leafs() if leaf.data == data]
+
+    def get_voxels_nodes_with_size_equal_to(self, voxels_size):
+        level = self.size_level(voxels_size)
+        if level is None:
+            return list()
+        return [self._node(level, i)
+                for i in numpy.flatnonzero(self._data[level])]
+
+    def get_voxel_point_cloud(self, voxels_size):
+        level = self.size_level(voxels_size)
+        if level is None:
+            return VoxelGrid(numpy.zeros((0, 3)), voxels_size)
+
+        voxels_position = self.get_level_position(level)[self._data[level]]
+        return VoxelGrid(voxels_position, voxels_size)
+
+    def get_voxels_position(self, voxels_size):
+        """ Return the (N, 3) center position of the voxels of voxels_size
+        with data True, the bigger leafs with data True are split to
+        voxels_size.
+        """
+        level = self.size_level(voxels_size)
+        if level is None:
+            return numpy.zeros((0, 3))
+
+        corner = self.position - self.size / 2.0
+        voxels_index = [self.get_level_index(level)[self._data[level]]]
+
+        for coarse_level in range(level):
+            cond = self._data[coarse_level] & (
+                self._sons_mask[coarse_level] == 0)
+            if not cond.any():
+                continue
+
+            f = 2 ** (level - coarse_level)
+            offset = numpy.array(list(numpy.ndindex((f, f, f))))
+            index = morton_decode(self._keys[coarse_level][cond]).astype(
+                numpy.int64) * f
+            voxels_index.append(
+                (index[:, None, :] + offset[None, :, :]).reshape((-1, 3)))
+
+        voxels_index = numpy.concatenate(voxels_index, axis=0)
+        return corner + (voxels_index + 0.5) * voxels_size
+
+    # ==========================================================================
+    # CONVERSION
+    # ==========================================================================
+
+    @classmethod
+    def _from_tree(cls, position, size, root, get_node):
+        """ Build the octree from a tree of nodes, get_node(node) return the
+        (position, data, sons) of the node, sons is None for a leaf.
+        """
+        octree = cls(position, size)
+
+        corner = octree.position - octree.size / 2.0
+        level, nodes = 0, [get_node(root)]
+        while nodes:
+            index = (numpy.array([node[0] for node in nodes],
+                                 dtype=float).reshape((-1, 3)) - corner)
+            index = numpy.round(index / octree.level_size(level) - 0.5)
+
+            keys = morton_encode(index)
+            order = numpy.argsort(keys, kind="stable")
+            nodes = [nodes[i] for i in order]
+
+            octree._append_level(keys[order], numpy.array(
+                [node[1] is True for node in nodes], dtype=bool))
+
+            # Sons of a node stay contiguous once the next level is sorted
+            sons = list()
+            for i, (_, _, node_sons) in enumerate(nodes):
+                if node_sons is not None:
+                    octree._sons_mask[level][i] = 0xFF
+                    octree._sons_offset[level][i] = len(sons)
+                    sons.extend(get_node(son) for son in node_sons)
+            nodes = sons
+            level += 1
+
+        return octree
+
+    @classmethod
+    def from_voxel_octree(cls, voxel_octree):
+
+        def get_node(node):
+            return node.position, node.data, (
+                None if node.is_leaf else node.sons)
+
+        root = voxel_octree.root
+        return cls._from_tree(root.position, root.size, root, get_node)
+
+    @classmethod
+    def from_dict(cls, dict_node):
+        """ Build the octree from the VoxelOctree json dict format """
+
+        def get_node(node):
+            return node["position"], node["data"], node["sons"]
+
+        return cls._from_tree(dict_node["position"], dict_node["size"],
+                              dict_node, get_node)
+
+    def _get_dict_nodes(self, level, i):
+        node = self._node(level, i)
+
+        sons = None
+        if not node.is_leaf:
+            offset = self._sons_offset[level][i]
+            keys = self._keys[level][i] << numpy.uint64(3)
+            sons_keys = keys + (_SONS_OFFSET[:, 0] |
+                                (_SONS_OFFSET[:, 1] << numpy.uint64(1)) |
+                                (_SONS_OFFSET[:, 2] << numpy.uint64(2)))
+            sons_index = self._find(level + 1, sons_keys)
+            sons = [self._get_dict_nodes(level + 1, j)
+                    for j in sons_index if j >= 0]
+
+        return {"position": node.position,
+                "size": node.size,
+                "data": node.data,
+                "sons": sons}
+
+    def to_voxel_octree(self):
+        return VoxelOctree.from_voxel_node(
+            VoxelOctree.from_dict(self._get_dict_nodes(0, 0), None))
+
+    # ==========================================================================
+    # READ / WRITES
+    # ==========================================================================
+
+    def write(self, filename):
+        ext = filename.split(".")[-1]
+
+        if ext == "json":
+            return self.write_to_json(filename)
+
+        raise ValueError("No extension")
+
+    @staticmethod
+    def read(filename):
+        ext = filename.split(".")[-1]
+
+        if ext == "json":
+            return VoxelLinearOctree.read_from_json(filename)
+
+        raise ValueError("No extension")
+
+    def write_to_json(self, filename):
+        """ Write the octree with the VoxelOctree json format """
+
+        if len(self._keys) == 0:
+            raise ValueError("No root define")
+
+        if (os.path.dirname(filename) and not os.path.exists(
+                os.path.dirname(filename))):
+            os.makedirs(os.path.dirname(filename))
+
+        with open(filename, 'w') as f:
+            json.dump(self._get_dict_nodes(0, 0), f)
+
+    @staticmethod
+    def read_from_json(filename):
+
+        with open(filename, 'r') as f:
+            load_dict_octree = json.load(f)
+
+        return VoxelLinearOctree.from_dict(load_dict_octree)
@@ -10,42 +10,60 @@
 from __future__ import division, print_function, absolute_import
 
 import numpy
+import scipy.ndimage
 
-from ..object import Image3D
+from ..object import Image3D, BrickImage3D
 # ==============================================================================
 
 
+def _surface_voxels(im):
+    """ Voxels of value 1 of im with a null voxel in their 26-neighborhood,
+    the voxels outside im are null """
+    full = scipy.ndimage.binary_erosion(im != 0,
+                                        structure=numpy.ones((3, 3, 3)),
+                                        border_value=0)
+    return (im == 1) & ~full
+
+
 def remove_internal(image_3d):
+    """ Remove the voxels of value 1 whose 26 neighbors are all positive,
+    only the surface of the objects is kept.
+
+    Parameters
+    ----------
+    image_3d : Image3D or BrickImage3D
+
+    Returns
+    -------
+    out : Image3D or BrickImage3D
+        Same type as image_3d. A BrickImage3D is processed brick by brick.
+    """
+    if isinstance(image_3d, BrickImage3D):
+        result = BrickImage3D(image_3d.shape,
+                              voxels_size=image_3d.voxels_size,
+                              world_coordinate=image_3d.world_coordinate,
+                              brick_size=image_3d.brick_size,
+                              dtype=image_3d.dtype)
+
+        bs = image_3d.brick_size
+        for key, brick in image_3d.bricks.items():
+            index_min = numpy.array(key) * bs
+            im = image_3d.region(index_min - 1, index_min + bs + 1)
+            internal = ~_surface_voxels(im)[1:-1, 1:-1, 1:-1] & (brick == 1)
+            brick = brick.copy()
+            brick[internal] = 0
+            if brick.any():
+                result.bricks[key] = brick
+
+        return result
+
     len_x, len_y, len_z = image_3d.shape
     im = Image3D.zeros((len_x + 2, len_y + 2, len_z + 2),
                        voxels_size=image_3d.voxels_size)
     im[1:-1, 1:-1, 1:-1] = image_3d
 
-    xx, yy, zz = numpy.where(image_3d == 1)
-
-    ijk = [(-1, -1, -1), (-1, -1, 0), (-1, -1, 1),
-           (-1, 0, -1), (-1, 0, 0), (-1, 0, 1),
-           (-1, 1, -1), (-1, 1, 0), (-1, 1, 1),
-           (0, -1, -1), (0, -1, 0), (0, -1, 1),
-           (0, 0, -1), (0, 0, 0), (0, 0, 1),
-           (0, 1, -1), (0, 1, 0), (0, 1, 1),
-           (1, -1, -1), (1, -1, 0), (1, -1, 1),
-           (1, 0, -1), (1, 0, 0), (1, 0, 1),
-           (1, 1, -1), (1, 1, 0), (1, 1, 1)]
-
-    def removable(x, y, z):
-        for i, j, k in ijk:
-            if im[x + i, y + j, z + k] == 0:
-                return False
-        return True
-
-    im2 = Image3D.zeros_like(im)
-    for i in range(len(xx)):
-        x, y, z = xx[i], yy[i], zz[i]
-        if removable(x, y, z):
-            im2[(x, y, z)] = 1
-
-    result = im - im2
+    result = im.copy()
+    result[(im == 1) & ~_surface_voxels(im)] = 0
 
     return result[1:-1, 1:-1, 1:-1]
 
@@ -25,47 +25,57 @@ import openalea.phenomenal.display as phm_display
 
 def detect_chessboard(chessboard_images,
                       size_of_chessboard=47,
-                      shape_of_chessboard=(8, 6)):
+                      shape_of_chessboard=(8, 6),
+                      n_jobs=1,
+                      scale=None):
 
     # BUILD CHESSBOARD OBJECT
     chessboard = phm_calib.Chessboard(size_of_chessboard,
                                       shape_of_chessboard)
 
-    for id_camera in chessboard_images:
-        for angle in chessboard_images[id_camera]:
-            im = chessboard_images[id_camera][angle]
-            found = chessboard.detect_corners(id_camera, angle, im)
+    chessboard.detect_corners_many(chessboard_images,
+                                   n_jobs=n_jobs,
+                                   scale=scale)
 
     return [chessboard],
 
 
 def calibrations(chessboards,
                  size_image=(2056, 2454),
-                 number_of_repetition=1):
+                 number_of_repetition=1,
+                 n_processes=1,
+                 cache_dir=None):
 
     id_cameras = ["side", "top"]
     calibrations = dict()
     for id_camera in id_cameras:
-        calibration = None
         if len(chessboards) == 1:
-            calibration = phm_calib.CalibrationCameraSideWith1Target()
-            err = calibration.calibrate(chessboards[0].get_corners_2d(id_camera),
-                                        chessboards[0].get_corners_local_3d(),
-                                        size_image,
-                                        number_of_repetition=number_of_repetition,
-                                        # repetion here is 0 to optimize time consuming (for better result put 4)
-                                        verbose=False)
-
-        if len(chessboards) == 2:
-            calibration = phm_calib.CalibrationCameraSideWith2TargetYXZ()
-            err = calibration.calibrate(chessboards[0].get_corners_2d(id_camera),
-                                        chessboards[0].get_corners_local_3d(),
-                                        chessboards[1].get_corners_2d(id_camera),
-                                        chessboards[1].get_corners_local_3d(),
-                                        size_image,
-                                        number_of_repetition=number_of_repetition,
-                                        # repetion here is 0 to optimize time consuming (for better result put 4)
-                                        verbose=False)
+            calibration_class = phm_calib.CalibrationCameraSideWith1Target
+            args = (chessboards[0].get_corners_2d(id_camera),
+                    chessboards[0].get_corners_local_3d(),
+                    size_image)
+        elif len(chessboards) == 2:
+            calibration_class = phm_calib.CalibrationCameraSideWith2TargetYXZ
+            args = (chessboards[0].get_corners_2d(id_camera),
+                    chessboards[0].get_corners_local_3d(),
+                    chessboards[1].get_corners_2d(id_camera),
+                    chessboards[1].get_corners_local_3d(),
+                    size_image)
+        else:
+            raise ValueError("Calibration needs 1 or 2 chessboards, "
+                             "got {}".format(len(chessboards)))
+
+        kwargs = dict(number_of_repetition=number_of_repetition,
+                      verbose=False,
+                      n_processes=n_processes)
+
+        # The cache returns the calibration of the same chessboard points
+        if cache_dir is None:
+            calibration = calibration_class()
+            err = calibration.calibrate(*args, **kwargs)
+        else:
+            calibration, err = phm_calib.calibrate_cached(
+                calibration_class, cache_dir, *args, **kwargs)
 
         calibrations[id_camera] = calibration
 
@@ -12,6 +12,7 @@
 from __future__ import division, print_function
 
 import os
+import numpy
 
 import openalea.phenomenal.calibration as phm_calib
 
@@ -25,6 +26,135 @@ def test_calibration_working():
 
     chessboards = phm_data.chessboards(name_dir)
 
+
+def test_calibration_side_with_1_target_residuals():
+
+    calibration = phm_calib.CalibrationCameraSideWith1Target()
+    calibration._cam_width_image = 2056
+    calibration._cam_height_image = 2454
+    calibration._cam_focal_length_x = 4700.0
+    calibration._cam_focal_length_y = 4690.0
+    calibration._cam_pos_x = 5500.0
+    calibration._cam_pos_y = 10.0
+    calibration._cam_rot_x = 0.01
+    calibration._cam_rot_y = -0.02
+    calibration._cam_rot_z = 0.03
+    calibration._angle_factor = 1.0
+    calibration._target_pos_x = 200.0
+    calibration._target_pos_y = -100.0
+    calibration._target_pos_z = 300.0
+    calibration._target_rot_x = 0.1
+    calibration._target_rot_y = 0.2
+    calibration._target_rot_z = 0.3
+
+    points_local_3d = [numpy.array([x * 47.0, y * 47.0, 0.0])
+                       for y in range(6) for x in range(8)]
+
+    points_2d = dict()
+    for angle in range(-60, 61, 30):
+        points_2d[angle] = numpy.array(calibration.get_target_projected(
+            angle, points_local_3d))
+
+    parameters = numpy.array([4700.0, 4690.0, 5500.0, 10.0,
+                              0.01, -0.02, 0.03, 1.0,
+                              200.0, -100.0, 300.0, 0.1, 0.2, 0.3])
+
+    calibration._ref_target_points_local_3d = points_local_3d
+    calibration._ref_target_stack = calibration.stack_target_points_2d(
+        points_2d, len(points_local_3d))
+
+    residuals = calibration.residuals(parameters)
+    assert residuals.shape == (5 * 48 * 2,)
+    assert numpy.allclose(residuals, 0, atol=1e-6)
+
+    # Same error as the projection point by point
+    parameters[2] += 10.0
+    parameters[11] += 0.01
+    calibration._cam_pos_x = parameters[2]
+    calibration._target_rot_x = parameters[11]
+    err = sum(numpy.linalg.norm(
+        numpy.array(calibration.get_target_projected(
+            angle, points_local_3d)) - points_2d[angle], axis=1).sum()
+        for angle in points_2d)
+    assert numpy.isclose(calibration.fit_function(parameters), err)
+
+
+def test_calibration_side_with_2_target_yxz_jacobian():
+
+    name_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+    chessboards = phm_data.chessboards(name_dir)
+
+    numpy.random.seed(0)
+    calibration = phm_calib.CalibrationCameraSideWith2TargetYXZ()
+    err = calibration.calibrate(chessboards[0].get_corners_2d("side"),
+                                chessboards[0].get_corners_local_3d(),
+                                chessboards[1].get_corners_2d("side"),
+                                chessboards[1].get_corners_local_3d(),
+                                (2056, 2454),
+                                number_of_repetition=0)
+
+    # Optimum found by BFGS on the summed error : err 7.689, focal length
+    # x 4681.66, cam pos y -5455.23, angle factor 1.000209
+    assert err < 7.76
+    assert abs(calibration._cam_focal_length_x - 4681.66) < 0.01 * 4681.66
+    assert abs(calibration._cam_pos_y + 5455.23) < 0.01 * 5455.23
+    assert abs(calibration._angle_factor - 1.000209) < 1e-4
+
+    # Jacobian against finite differences
+    parameters = numpy.array([
+        calibration._cam_focal_length_x, calibration._cam_focal_length_y,
+        calibration._cam_pos_x, calibration._cam_pos_y,
+        calibration._cam_rot_x, calibration._cam_rot_z,
+        calibration._angle_factor,
+        calibration._target_1_pos_x, calibration._target_1_pos_y,
+        calibration._target_1_pos_z, calibration._target_1_rot_x,
+        calibration._target_1_rot_y, calibration._target_1_rot_z,
+        calibration._target_2_pos_x, calibration._target_2_pos_y,
+        calibration._target_2_pos_z, calibration._target_2_rot_x,
+        calibration._target_2_rot_y, calibration._target_2_rot_z])
+
+    jacobian = calibration.jacobian(parameters)
+    assert jacobian.shape == (len(calibration.residuals(parameters)), 19)
+
+    for i in range(19):
+        h = 1e-6 * max(1.0, abs(parameters[i]))
+        x_1, x_2 = parameters.copy(), parameters.copy()
+        x_1[i] += h
+        x_2[i] -= h
+        column = (calibration.residuals(x_1) -
+                  calibration.residuals(x_2)) / (2 * h)
+        assert numpy.allclose(jacobian[:, i], column,
+                              rtol=1e-4, atol=1e-4 * abs(column).max())
+
+def test_calibration_side_with_2_target_yxz_multi_start():
+
+    name_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+    chessboards = phm_data.chessboards(name_dir)
+
+    def calibrate(**kwargs):
+        calibration = phm_calib.CalibrationCameraSideWith2TargetYXZ()
+        err = calibration.calibrate(chessboards[0].get_corners_2d("side"),
+                                    chessboards[0].get_corners_local_3d(),
+                                    chessboards[1].get_corners_2d("side"),
+                                    chessboards[1].get_corners_local_3d(),
+                                    (2056, 2454),
+                                    **kwargs)
+        return err, calibration._cam_focal_length_x
+
+    # The restarts only depend on the seed, not on the processes
+    result = calibrate(number_of_repetition=2, seed=3)
+    assert numpy.allclose(result, calibrate(number_of_repetition=2, seed=3))
+    assert numpy.allclose(result, calibrate(number_of_repetition=2, seed=3,
+                                            n_processes=2))
+
+    # The first restart is under the threshold, the others are skipped
+    assert numpy.allclose(
+        calibrate(number_of_repetition=15, seed=3, err_threshold=8.0),
+        calibrate(number_of_repetition=0, seed=3))
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
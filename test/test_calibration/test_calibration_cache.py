@@ -0,0 +1,96 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+# ==============================================================================
+from __future__ import division, print_function
+
+import os
+import shutil
+import numpy
+
+import openalea.phenomenal.calibration as phm_calib
+import openalea.phenomenal.data as phm_data
+# ==============================================================================
+
+
+def test_calibration_key():
+
+    points_local_3d = [numpy.array([x * 47.0, y * 47.0, 0.0])
+                       for y in range(6) for x in range(8)]
+    points_2d = {42: numpy.arange(96.0).reshape((48, 2)),
+                 0: numpy.zeros((48, 2))}
+
+    cls = phm_calib.CalibrationCameraSideWith1Target
+    key = phm_calib.calibration_key(cls, points_2d, points_local_3d,
+                                    (2056, 2454))
+    assert len(key) == 64
+
+    # Same content, angles as float and other order of the dict
+    same_points_2d = {0.0: numpy.zeros((48, 2)),
+                      42.0: numpy.arange(96.0).reshape((48, 1, 2))[:, 0, :]}
+    assert key == phm_calib.calibration_key(
+        cls, same_points_2d, numpy.array(points_local_3d), [2056, 2454])
+
+    points_2d[42][10, 1] += 0.01
+    assert key != phm_calib.calibration_key(cls, points_2d, points_local_3d,
+                                            (2056, 2454))
+    points_2d[42][10, 1] -= 0.01
+
+    assert key != phm_calib.calibration_key(cls, points_2d, points_local_3d,
+                                            (2454, 2056))
+
+    assert key != phm_calib.calibration_key(
+        phm_calib.CalibrationCameraSideWith2Target,
+        points_2d, points_local_3d, (2056, 2454))
+
+
+def test_calibrate_cached():
+
+    name_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+    chessboards = phm_data.chessboards(name_dir)
+
+    cache_dir = 'calibration_cache'
+    args = (chessboards[0].get_corners_2d("side"),
+            chessboards[0].get_corners_local_3d(),
+            chessboards[1].get_corners_2d("side"),
+            chessboards[1].get_corners_local_3d(),
+            (2056, 2454))
+    cls = phm_calib.CalibrationCameraSideWith2TargetYXZ
+
+    calibration, err = phm_calib.calibrate_cached(
+        cls, cache_dir, *args, number_of_repetition=0, seed=3)
+
+    assert os.listdir(cache_dir) == [
+        phm_calib.calibration_key(cls, *args) + ".json"]
+
+    cached_calibration, cached_err = phm_calib.calibrate_cached(
+        cls, cache_dir, *args, number_of_repetition=0, seed=3)
+
+    assert isinstance(cached_calibration, cls)
+    assert cached_err == err
+    assert (cached_calibration._cam_focal_length_x ==
+            calibration._cam_focal_length_x)
+    assert (cached_calibration._target_2_rot_z ==
+            calibration._target_2_rot_z)
+
+    projection = calibration.get_projection(42)
+    cached_projection = cached_calibration.get_projection(42)
+    pts = numpy.array([[0.0, 0.0, 0.0], [100.0, -50.0, 500.0]])
+    assert numpy.allclose(projection(pts), cached_projection(pts))
+
+    shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    for func_name in dir():
+        if func_name.startswith('test_'):
+            print("{func_name}".format(func_name=func_name))
+            eval(func_name)()
@@ -113,6 +113,31 @@ def test_projection():
         assert tuple(pt_2d) == (1337.425449561377, 1070.8621710384346)
 
 
+def test_projection_matrix():
+    dir_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+    calibrations = phm_data.calibrations(dir_path)
+
+    pts_3d = numpy.array([[-472, -472, 200],
+                          [0, 0, 0],
+                          [100, -250, 1500]], dtype=float)
+
+    for id_camera, angle in [("side", 0), ("side", 120), ("top", 0)]:
+        calibration = calibrations[id_camera]
+        projection_matrix = calibration.get_projection_matrix(angle)
+        assert projection_matrix.shape == (3, 4)
+
+        # Reference : point by point projection through the camera frame
+        projection = calibration.get_projection2(angle)
+        ref = numpy.array([projection((-x, y, z)) for x, y, z in pts_3d])
+
+        out = numpy.zeros((len(pts_3d), 2))
+        result = calibration.get_projection(angle)(pts_3d, out=out)
+
+        assert result is out
+        assert numpy.allclose(ref, result)
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
@@ -70,6 +70,33 @@ def test_chessboard_3():
         assert False
 
 
+def test_chessboard_detect_corners_many():
+
+    dir_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+    image = phm_data.chessboard_images(dir_path)[0]['side'][42]
+    images = {"side": {42: image,
+                       0: numpy.zeros((200, 300), dtype=numpy.uint8)}}
+
+    chess = phm_calib.Chessboard(47, (8, 6))
+    detections = chess.detect_corners_many(images)
+
+    assert [(d.id_camera, d.angle, d.found) for d in detections] == [
+        ("side", 42, True), ("side", 0, False)]
+    assert all(d.seconds >= 0 and d.error is None for d in detections)
+    assert list(chess.image_points["side"]) == [42]
+    assert chess.get_corners_2d("side")[42].shape == (48, 2)
+
+    # Search in the downscaled image, refined in the full resolution one
+    chess_scale = phm_calib.Chessboard(47, (8, 6))
+    detections = chess_scale.detect_corners_many(images, n_jobs=2,
+                                                 scale=0.25)
+
+    assert [d.found for d in detections] == [True, False]
+    assert numpy.allclose(chess_scale.get_corners_2d("side")[42],
+                          chess.get_corners_2d("side")[42], atol=0.01)
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
@@ -0,0 +1,65 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+# ==============================================================================
+from __future__ import division, print_function
+
+import os
+import time
+import numpy
+
+import openalea.phenomenal.data as phm_data
+import openalea.phenomenal.multi_view_reconstruction as phm_mvr
+# ==============================================================================
+
+plant_1_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                           "../data/plant_1")
+
+
+def integral_image_loop(img):
+    # Reference : pixel by pixel python loop
+    a = numpy.zeros_like(img, dtype=int)
+    a[img > 0] = 1
+    for y, x in numpy.ndindex(a.shape):
+        if x - 1 >= 0:
+            a[y, x] += a[y, x - 1]
+        if y - 1 >= 0:
+            a[y, x] += a[y - 1, x]
+        if x - 1 >= 0 and y - 1 >= 0:
+            a[y, x] -= a[y - 1, x - 1]
+    return a
+
+
+image = phm_data.bin_images(plant_1_dir)["side"][0]
+print("image : {} - {}".format(image.shape, image.dtype))
+
+# The python loop takes minutes on the whole image, it is timed on a crop
+crop = image[1000:1256, 800:1056]
+start = time.time()
+ref = integral_image_loop(crop)
+time_loop = (time.time() - start) * image.size / crop.size
+assert numpy.array_equal(ref, phm_mvr.integral_image(crop))
+print("python loop : {:.2f}s (extrapolated from a 256x256 crop)".format(
+    time_loop))
+
+ref = phm_mvr.integral_image(image, method="numpy")
+for method in ("numpy", "native"):
+    for img, layout in ((image, "contiguous"), (image.T, "transposed")):
+        start = time.time()
+        for i in range(10):
+            a = phm_mvr.integral_image(img, method=method)
+        print("{} {} : {:.4f}s".format(method, layout,
+                                       (time.time() - start) / 10))
+
+    assert numpy.array_equal(phm_mvr.integral_image(image, method=method), ref)
+
+start = time.time()
+a = phm_mvr.integral_image(image, dtype=numpy.uint64)
+print("numpy uint64 : {:.4f}s".format(time.time() - start))
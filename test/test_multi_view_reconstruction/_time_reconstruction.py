@@ -0,0 +1,103 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+# ==============================================================================
+from __future__ import division, print_function
+
+import os
+import time
+import numpy
+
+import openalea.phenomenal.data as phm_data
+import openalea.phenomenal.object as phm_obj
+import openalea.phenomenal.multi_view_reconstruction as phm_mvr
+# ==============================================================================
+
+plant_1_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                           "../data/plant_1")
+
+
+def boxes_sum_loop(image_int, min_xy_max_xy):
+    # Reference : integral image query voxel by voxel
+    res = numpy.zeros(len(min_xy_max_xy), dtype=image_int.dtype)
+    for i, (x_min, y_min, x_max, y_max) in enumerate(min_xy_max_xy):
+        res[i] = (image_int[y_max, x_max] + image_int[y_min, x_min] -
+                  image_int[y_min, x_max] - image_int[y_max, x_min])
+    return res
+
+
+def clamped_boxes(voxels_position, voxels_size, shape_image, projection):
+    height, length = shape_image
+
+    min_xy_max_xy = phm_mvr.get_bounding_box_voxel_projected(
+        voxels_position, voxels_size, projection)
+
+    min_xy_max_xy = numpy.floor(min_xy_max_xy).astype(int)
+    min_xy_max_xy[:, 0::2] = numpy.clip(min_xy_max_xy[:, 0::2], 0, length - 1)
+    min_xy_max_xy[:, 1::2] = numpy.clip(min_xy_max_xy[:, 1::2], 0, height - 1)
+    min_xy_max_xy[:, 0:2] -= 1
+    min_xy_max_xy[min_xy_max_xy < 0] = 0
+
+    return min_xy_max_xy
+
+
+bin_images = phm_data.bin_images(plant_1_dir)
+calibrations = phm_data.calibrations(plant_1_dir)
+
+image_views = list()
+for id_camera in bin_images:
+    for angle in bin_images[id_camera]:
+        projection = calibrations[id_camera].get_projection(angle)
+        image_views.append(phm_obj.ImageView(bin_images[id_camera][angle],
+                                             projection,
+                                             inclusive=False))
+
+int_images = list()
+for image_view in image_views:
+    a = numpy.zeros_like(image_view.image, dtype=numpy.uint32)
+    phm_mvr.c_mvr.integral_image(image_view.image, a)
+    int_images.append(a)
+
+# ==============================================================================
+
+voxels_size = 4
+voxels = phm_mvr.Voxels(numpy.array([[0.0, 0.0, 0.0]]), 4096)
+
+while voxels.size != voxels_size:
+    voxels = phm_mvr.split_voxels_in_eight(voxels)
+
+    time_loop, time_vectorized = 0.0, 0.0
+    for image_view, image_int in zip(image_views, int_images):
+        min_xy_max_xy = clamped_boxes(voxels.position,
+                                      voxels.size,
+                                      image_view.image.shape,
+                                      image_view.projection)
+
+        start = time.time()
+        ref = boxes_sum_loop(image_int, min_xy_max_xy)
+        time_loop += time.time() - start
+
+        start = time.time()
+        res = phm_mvr.integral_image_boxes_sum(image_int, min_xy_max_xy)
+        time_vectorized += time.time() - start
+
+        assert numpy.array_equal(ref, res)
+
+    print("voxels_size : {} - nb voxels : {} - loop : {:.4f}s - "
+          "vectorized : {:.4f}s".format(voxels.size,
+                                        len(voxels.position),
+                                        time_loop,
+                                        time_vectorized))
+
+    stage = phm_mvr.kept_visible_voxel(voxels.position,
+                                       voxels.size,
+                                       image_views,
+                                       int_images=int_images)
+    voxels = stage.consistent
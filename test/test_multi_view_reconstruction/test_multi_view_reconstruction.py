@@ -13,6 +13,8 @@ from __future__ import division, print_function
 
 import numpy
 import os
+import pytest
+import sklearn.neighbors
 
 import openalea.phenomenal.data as phm_data
 import openalea.phenomenal.object as phm_obj
@@ -117,6 +119,83 @@ def test_get_bounding_box_voxel_projected_2():
     assert numpy.allclose(ref, res)
 
 
+def test_get_bounding_box_voxel_projected_native():
+    calibrations = phm_data.calibrations(plant_1_dir)
+    projection = calibrations["side"].get_projection(30)
+
+    def numpy_projection(pts):
+        return projection(pts)
+
+    numpy.random.seed(0)
+    voxels_position = numpy.random.uniform(-1000, 1000, (1000, 3))
+
+    ref = phm_mvr.get_bounding_box_voxel_projected(
+        voxels_position, 16, numpy_projection)
+    res = phm_mvr.get_bounding_box_voxel_projected(
+        voxels_position, 16, projection)
+    assert numpy.allclose(ref, res)
+
+    shape_image = (2454, 2056)
+    ref, ref_outside = phm_mvr.get_clamped_bounding_box_voxel_projected(
+        voxels_position, 16, numpy_projection, shape_image)
+    res, res_outside = phm_mvr.get_clamped_bounding_box_voxel_projected(
+        voxels_position, 16, projection, shape_image)
+
+    assert numpy.count_nonzero(ref_outside) > 0
+    assert numpy.array_equal(ref_outside, res_outside)
+    assert numpy.array_equal(ref, res)
+    assert res.min() >= 0
+    assert numpy.all(res[:, 2] < 2056) and numpy.all(res[:, 3] < 2454)
+
+
+def test_voxels_footprint_visible():
+    calibrations = phm_data.calibrations(plant_1_dir)
+    projection = calibrations["side"].get_projection(30)
+
+    numpy.random.seed(0)
+    image = numpy.zeros((2454, 2056), dtype=numpy.uint8)
+    image[numpy.random.randint(0, 2454, 300),
+          numpy.random.randint(0, 2056, 300)] = 255
+    image_int = phm_mvr.integral_image(image)
+
+    voxels_position = numpy.random.uniform(-300, 300, (500, 3))
+    voxels_size = 40
+
+    res = phm_mvr.voxels_footprint_visible(
+        voxels_position, voxels_size, projection, image_int)
+
+    with pytest.raises(ValueError):
+        phm_mvr.voxels_footprint_visible(
+            voxels_position, voxels_size, projection,
+            image_int.astype(numpy.uint64))
+
+    boxes, outside = phm_mvr.get_clamped_bounding_box_voxel_projected(
+        voxels_position, voxels_size, projection, image.shape)
+
+    yy, xx = numpy.nonzero(image)
+    for i, (x_min, y_min, x_max, y_max) in enumerate(boxes):
+        in_box = ((xx >= x_min) & (xx <= x_max) &
+                  (yy >= y_min) & (yy <= y_max) & (not outside[i]))
+        # Footprint inside the bounding box
+        if not numpy.any(in_box):
+            assert not res[i]
+            continue
+
+        # Reference : points sampled in the voxel, projected
+        pts = (voxels_position[i] +
+               numpy.random.uniform(-0.5, 0.5, (5000, 3)) * voxels_size)
+        pixels = numpy.floor(projection(pts)).astype(int)
+        covered = set(map(tuple, pixels)) & set(zip(xx[in_box], yy[in_box]))
+        if covered:
+            assert res[i]
+
+    assert 0 < numpy.count_nonzero(res) < numpy.count_nonzero(
+        phm_mvr.voxels_is_visible_in_image(
+            voxels_position, voxels_size, image, projection, False,
+            image_int=phm_mvr.get_integral_images(
+                [phm_obj.ImageView(image, projection)])[0]))
+
+
 def test_split_and_projection():
 
     plant_number = 1
@@ -149,6 +228,103 @@ def test_split_and_projection():
         voxels_size = voxels.size
 
 
+def test_project_voxel_centers_on_image():
+    calibrations = phm_data.calibrations(plant_1_dir)
+    projection = calibrations["side"].get_projection(30)
+    shape = (2454, 2056)
+
+    rs = numpy.random.RandomState(0)
+    voxels_position = rs.uniform(-500, 500, (3000, 3)) + [0, 0, 300]
+    labels = numpy.arange(1, len(voxels_position) + 1)
+
+    boxes, outside = phm_mvr.get_clamped_bounding_box_voxel_projected(
+        voxels_position, 4, projection, shape)
+
+    ref_count = numpy.zeros(shape, dtype=numpy.int32)
+    ref_labels = numpy.zeros(shape, dtype=numpy.int32)
+    for label, (x_min, y_min, x_max, y_max) in zip(labels[~outside],
+                                                   boxes[~outside]):
+        ref_count[y_min:y_max + 1, x_min:x_max + 1] += 1
+        ref_labels[y_min:y_max + 1, x_min:x_max + 1] = label
+
+    for max_loop_boxes in (0, len(voxels_position)):
+        img = phm_mvr.project_voxel_centers_on_image(
+            voxels_position, 4, shape, projection,
+            max_loop_boxes=max_loop_boxes)
+        assert img.dtype == numpy.uint8
+        assert numpy.array_equal(img, (ref_count > 0) * 255)
+
+        img = phm_mvr.project_voxel_centers_on_image(
+            voxels_position, 4, shape, projection, value=2,
+            dtype=numpy.int32, accumulate=True,
+            max_loop_boxes=max_loop_boxes)
+        assert numpy.array_equal(img, ref_count * 2)
+
+    img = phm_mvr.project_voxel_centers_on_image(
+        voxels_position, 4, shape, projection, dtype=numpy.int32,
+        labels=labels)
+    assert numpy.array_equal(img, ref_labels)
+
+    img = phm_mvr.project_voxel_centers_on_image(
+        numpy.zeros((0, 3)), 4, shape, projection, max_loop_boxes=0)
+    assert numpy.count_nonzero(img) == 0
+
+
+# ==============================================================================
+
+
+def test_integral_image():
+    numpy.random.seed(0)
+    image = (numpy.random.random((37, 53)) > 0.7).astype(numpy.uint8) * 255
+
+    ref = numpy.zeros(image.shape, dtype=int)
+    for y, x in numpy.ndindex(image.shape):
+        ref[y, x] = numpy.count_nonzero(image[:y + 1, :x + 1])
+
+    for method in ("auto", "numpy", "native"):
+        a = phm_mvr.integral_image(image, method=method)
+        assert a.dtype == numpy.uint32
+        assert numpy.array_equal(a, ref)
+
+        # Not contiguous, not uint8
+        a = phm_mvr.integral_image(image.T > 0, method=method)
+        assert numpy.array_equal(a, ref.T)
+
+    a = phm_mvr.integral_image(image[::2, 1::3], dtype=numpy.uint64)
+    assert a.dtype == numpy.uint64
+    assert numpy.array_equal(a, phm_mvr.integral_image(image[::2, 1::3]))
+
+    assert numpy.array_equal(phm_mvr.get_integrale_image(image), ref)
+    assert phm_mvr.integral_image_dtype((2454, 2056)) == numpy.uint32
+    assert phm_mvr.integral_image_dtype((70000, 70000)) == numpy.uint64
+
+    try:
+        phm_mvr.integral_image(image, dtype=numpy.uint64, method="native")
+        assert False
+    except ValueError:
+        pass
+
+
+def test_integral_image_boxes_sum():
+
+    numpy.random.seed(0)
+    image = (numpy.random.rand(50, 60) > 0.9).astype(numpy.uint8) * 255
+    image_int = numpy.zeros_like(image, dtype=numpy.uint32)
+    phm_mvr.c_mvr.integral_image(image, image_int)
+
+    x_min = numpy.random.randint(0, 59, 200)
+    y_min = numpy.random.randint(0, 49, 200)
+    x_max = numpy.minimum(x_min + numpy.random.randint(0, 10, 200), 59)
+    y_max = numpy.minimum(y_min + numpy.random.randint(0, 10, 200), 49)
+    min_xy_max_xy = numpy.column_stack((x_min, y_min, x_max, y_max))
+
+    res = phm_mvr.integral_image_boxes_sum(image_int, min_xy_max_xy)
+
+    for i, (x_min, y_min, x_max, y_max) in enumerate(min_xy_max_xy):
+        assert res[i] == numpy.count_nonzero(
+            image[y_min + 1:y_max + 1, x_min + 1:x_max + 1])
+
+
 # ==============================================================================
 
 
@@ -246,6 +422,324 @@ def test_reconstruction_3d_3():
     assert len(vg.voxels_position) > 0
 
 
+def test_kept_visible_voxel_n_jobs():
+    image_views = get_image_views_cube_projected()
+
+    int_images = list()
+    for image_view in image_views:
+        a = numpy.zeros_like(image_view.image, dtype=numpy.uint32)
+        phm_mvr.c_mvr.integral_image(image_view.image, a)
+        int_images.append(a)
+
+    voxels = phm_mvr.Voxels(numpy.array([[0.0, 0.0, 0.0]]), 256)
+    for i in range(3):
+        voxels = phm_mvr.split_voxels_in_eight(voxels)
+
+    ref = phm_mvr.kept_visible_voxel(voxels.position, voxels.size,
+                                     image_views, int_images=int_images)
+    res = phm_mvr.kept_visible_voxel(voxels.position, voxels.size,
+                                     image_views, int_images=int_images,
+                                     n_jobs=3)
+
+    assert len(ref.consistent.position) > 0
+    assert numpy.array_equal(ref.consistent.position,
+                             res.consistent.position)
+    assert numpy.array_equal(ref.inconsistent.position,
+                             res.inconsistent.position)
+
+
+def test_reconstruction_3d_n_jobs():
+    image_views = get_image_views_cube_projected(with_ref=True)
+
+    vg_ref = phm_mvr.reconstruction_3d(image_views, voxels_size=20)
+    vg = phm_mvr.reconstruction_3d(image_views, voxels_size=20, n_jobs=4)
+
+    assert numpy.array_equal(vg_ref.voxels_position, vg.voxels_position)
+
+
+def test_reconstruction_3d_octree():
+    image_views = get_image_views_cube_projected()
+
+    vg = phm_mvr.reconstruction_3d(image_views, voxels_size=20)
+    octree = phm_mvr.reconstruction_3d_octree(image_views,
+                                              voxels_size=20,
+                                              world_size=5120,
+                                              linear_octree=True)
+
+    assert octree.depth() == 8
+    assert (sorted(map(tuple, vg.voxels_position)) == sorted(map(
+        tuple, octree.get_voxel_point_cloud(20).voxels_position)))
+
+    octree = phm_mvr.reconstruction_3d_octree(image_views,
+                                              voxels_size=40,
+                                              world_size=5120)
+
+    assert isinstance(octree, phm_obj.VoxelOctree)
+    assert len(octree.get_voxel_point_cloud(40).voxels_position) > 0
+
+
+def test_image_view_cache():
+    image_views = get_image_views_cube_projected()
+    cache = phm_mvr.ImageViewCache()
+
+    int_images = phm_mvr.get_integral_images(image_views)
+    res = phm_mvr.get_integral_images(image_views, cache=cache)
+    assert len(cache) == len(image_views)
+    assert all(numpy.array_equal(a, b) for a, b in zip(int_images, res))
+    assert all(a is b for a, b in zip(
+        res, phm_mvr.get_integral_images(image_views, cache=cache)))
+
+    iv = image_views[0]
+    x_min, y_min, x_max, y_max = cache.foreground_bounding_box(iv)
+    yy, xx = numpy.nonzero(iv.image)
+    assert (x_min, y_min, x_max, y_max) == (
+        xx.min(), yy.min(), xx.max(), yy.max())
+
+    images = cache.pyramid(iv, 4)
+    assert len(images) == 4
+    assert images[3].shape == tuple((s + 7) // 8 for s in iv.image.shape)
+    assert images[3].sum() >= images[2].sum() / 4
+
+    # New image : entry recomputed
+    iv.image = iv.image.copy()
+    assert cache.integral_image(iv) is not res[0]
+
+    # Memory bound : least recently used image views are evicted
+    cache.max_nbytes = 2 * res[0].nbytes
+    assert len(cache) == 2
+    phm_mvr.get_integral_images(image_views, cache=cache)
+    assert len(cache) == 2
+    assert cache.nbytes <= cache.max_nbytes
+
+    # Image views garbage collected : entry dropped
+    del image_views, iv
+    assert len(cache) == 0
+
+    vg_ref = phm_mvr.reconstruction_3d(get_image_views_cube_projected(),
+                                       voxels_size=20)
+    image_views = get_image_views_cube_projected()
+    for i in range(2):
+        vg = phm_mvr.reconstruction_3d(image_views, voxels_size=20,
+                                       cache=phm_mvr.image_view_cache)
+        assert numpy.array_equal(vg_ref.voxels_position, vg.voxels_position)
+
+
+def test_bounding_volume():
+    image_views = get_image_views_cube_projected()
+
+    bbox_min, bbox_max = phm_mvr.get_bounding_volume(image_views)
+    # Cube of 10 x 10 x 10 voxels of size 10 from the origin
+    assert numpy.all(bbox_min <= -5) and numpy.all(bbox_min > -50)
+    assert numpy.all(bbox_max >= 95) and numpy.all(bbox_max < 150)
+
+    voxels, level = phm_mvr.get_bounding_volume_voxels(
+        (bbox_min, bbox_max), (0, 0, 0), [160, 80, 40, 20], max_voxels=64)
+    assert level == 2
+    assert voxels.size == 40
+    assert len(voxels.position) <= 64
+
+    # Same order than the splits of the first voxel
+    ref = phm_mvr.Voxels(numpy.array([[0.0, 0.0, 0.0]]), 160)
+    for i in range(level):
+        ref = phm_mvr.split_voxels_in_eight(ref)
+    ref = [tuple(v) for v in ref.position]
+    rank = [ref.index(tuple(v)) for v in voxels.position]
+    assert rank == sorted(rank)
+
+    vg_ref = phm_mvr.reconstruction_3d(image_views, voxels_size=20)
+    vg = phm_mvr.reconstruction_3d(image_views, voxels_size=20,
+                                   bounding_volume=True)
+    assert numpy.array_equal(vg_ref.voxels_position, vg.voxels_position)
+
+    # With a reference image, the voxels removed by the view cut in half are
+    # added back
+    image_views = get_image_views_cube_projected()
+    image_views[3].image_ref = image_views[3].image.copy()
+    yy, _ = numpy.where(image_views[0].image > 0)
+    image_views[0].image[:(yy.min() + yy.max()) // 2] = 0
+
+    vg_ref = phm_mvr.reconstruction_3d(image_views, voxels_size=20)
+    vg = phm_mvr.reconstruction_3d(image_views, voxels_size=20,
+                                   bounding_volume=True)
+    assert numpy.array_equal(vg_ref.voxels_position, vg.voxels_position)
+
+    image_views[0].image = numpy.zeros_like(image_views[0].image)
+    assert phm_mvr.get_bounding_volume(image_views) is None
+
+
+def test_create_groups_incidence():
+    image_views = get_image_views_cube_projected(with_ref=True)
+
+    voxels = phm_mvr.Voxels(numpy.array([[0.0, 0.0, 0.0]]), 320)
+    for i in range(3):
+        voxels = phm_mvr.split_voxels_in_eight(voxels)
+
+    for iv in image_views:
+        if iv.image_ref is not None:
+            iv.il = iv.image_ref
+            iv.yy, iv.xx = numpy.where(iv.il > 0)
+
+    ref_groups = phm_mvr.create_groups(image_views, voxels)
+    groups, index = phm_mvr.create_groups_incidence(image_views, voxels,
+                                                    max_pairs=1000)
+
+    assert len(numpy.unique(groups)) == len(ref_groups)
+    res_groups = numpy.split(index, numpy.flatnonzero(numpy.diff(groups)) + 1)
+    assert (sorted(list(g) for g in res_groups) ==
+            sorted(ref_groups.values()))
+
+    # Voxels at the same distance of the origin, taken in the order of
+    # check_groups when the limit nb_distance falls between them
+    for point in ([10.0, 20.0, 30.0], [0.0, 0.0, 0.0]):
+        neigh = sklearn.neighbors.NearestNeighbors(n_neighbors=1)
+        neigh.fit(numpy.array([point]))
+        for nb_distance in (2, 5, 20):
+            ref = phm_mvr.check_groups(neigh, voxels, ref_groups, nb_distance)
+            res = phm_mvr.check_groups_incidence(neigh, voxels, groups, index,
+                                                 nb_distance)
+            assert numpy.array_equal(ref.position, res.position)
+
+
+def test_reconstruction_3d_all_tolerances():
+    image_views = get_image_views_cube_projected()
+    image_views[3].image = numpy.zeros_like(image_views[3].image)
+    image_views[5].image[:1200] = 0
+
+    vgs = phm_mvr.reconstruction_3d(image_views, voxels_size=20,
+                                    error_tolerance=2,
+                                    all_tolerances=True)
+    assert len(vgs) == 3
+
+    for error_tolerance, vg in enumerate(vgs):
+        ref = phm_mvr.reconstruction_3d(image_views, voxels_size=20,
+                                        error_tolerance=error_tolerance)
+        assert numpy.array_equal(ref.voxels_position, vg.voxels_position)
+
+    assert len(vgs[0].voxels_position) == 0
+    assert len(vgs[2].voxels_position) > len(vgs[1].voxels_position) > 0
+
+    count = phm_mvr.visible_count(vgs[2].voxels_position, 20, image_views)
+    assert count.dtype == numpy.int8
+    assert numpy.all(count >= len(image_views) - 2)
+
+    try:
+        phm_mvr.reconstruction_3d(
+            get_image_views_cube_projected(with_ref=True),
+            voxels_size=20, error_tolerance=1, all_tolerances=True)
+        assert False
+    except ValueError:
+        pass
+
+
+
+def test_reconstruction_3d_downsample():
+    image_views = get_image_views_cube_projected()
+    vg_10 = phm_mvr.reconstruction_3d(image_views, voxels_size=10)
+    vg_20 = phm_mvr.reconstruction_3d(image_views, voxels_size=20)
+
+    # The octree of the reconstruction has a corner at its center (0, 0, 0)
+    vg = vg_10.downsample()
+    assert vg.voxels_size == 20
+    assert numpy.all(vg.coarse_index(vg_20) >= 0)
+    assert numpy.all(vg_10.coarse_index(vg_20) >= 0)
+
+
+def test_reconstruction_3d_monitor(capsys):
+    image_views = get_image_views_cube_projected()
+
+    monitor = phm_mvr.RecordingMonitor(trace_memory=True)
+    vg = phm_mvr.reconstruction_3d(image_views, voxels_size=20,
+                                   monitor=monitor)
+    monitor.close()
+    assert capsys.readouterr().out == ""
+
+    assert "integral_images" in monitor.steps
+    assert [level["voxels_size"] for level in monitor.levels] == [
+        2560, 1280, 640, 320, 160, 80, 40, 20]
+    assert monitor.levels[-1]["nb_kept"] == len(vg.voxels_position)
+    for level, next_level in zip(monitor.levels[:-1], monitor.levels[1:]):
+        assert 8 * level["nb_kept"] == next_level["nb_candidates"]
+        assert level["peak_nbytes"] > 0
+
+    views = [view for view in monitor.views if view["voxels_size"] == 20]
+    assert len(views) == len(image_views)
+    assert views[0]["nb_candidates"] == monitor.levels[-1]["nb_candidates"]
+    assert views[-1]["nb_kept"] == len(vg.voxels_position)
+    for view, next_view in zip(views[:-1], views[1:]):
+        assert view["nb_kept"] == next_view["nb_candidates"]
+    assert all(monitor.view_seconds(20)[k] > 0
+               for k in ("projection", "bounding_box", "lookup"))
+
+    monitor = phm_mvr.RecordingMonitor()
+    phm_mvr.reconstruction_3d_octree(image_views, voxels_size=16,
+                                     monitor=monitor)
+    assert monitor.levels[-1]["voxels_size"] == 16
+    assert monitor.levels[-1]["nb_kept"] == monitor.views[-1]["nb_kept"] > 0
+
+
+def test_reconstruction_3d_batch(tmp_path):
+    output_dir = str(tmp_path)
+    bin_images = phm_data.bin_images(plant_1_dir)
+    calibrations = phm_data.calibrations(plant_1_dir)
+
+    image_views = list()
+    for id_camera in bin_images:
+        for angle in bin_images[id_camera]:
+            projection = calibrations[id_camera].get_projection(angle)
+            image_views.append(phm_obj.ImageView(
+                bin_images[id_camera][angle], projection,
+                inclusive=id_camera == "top"))
+    ref = phm_mvr.reconstruction_3d(image_views, voxels_size=16)
+
+    for n_processes in (1, 2):
+        results, stats = phm_mvr.reconstruction_3d_batch(
+            [plant_1_dir, plant_1_dir], calibrations,
+            with_ref_view=False, n_processes=n_processes, voxels_size=16)
+
+        assert len(results) == 2
+        for result in results:
+            assert result.nb_images == 13
+            assert numpy.array_equal(result.voxel_grid.voxels_position,
+                                     ref.voxels_position)
+        assert stats.nb_plants == 2
+        assert stats.nb_voxels == 2 * len(ref.voxels_position)
+        assert stats.seconds["reconstruction"] > 0
+
+    results, stats = phm_mvr.reconstruction_3d_batch(
+        [plant_1_dir], calibrations, output_dir=output_dir,
+        with_ref_view=False, voxels_size=16)
+    assert results[0].voxel_grid is None
+    assert results[0].filename == os.path.join(output_dir, "plant_1.npz")
+    vg = phm_obj.VoxelGrid.read(results[0].filename)
+    assert len(vg.voxels_position) == len(ref.voxels_position)
+
+    # A plant failing does not stop the batch
+    for n_processes in (1, 2):
+        results, stats = phm_mvr.reconstruction_3d_batch(
+            ["missing_plant", plant_1_dir], calibrations,
+            with_ref_view=False, n_processes=n_processes, voxels_size=16)
+
+        assert results[0].voxel_grid is None
+        assert results[0].error is not None
+        assert results[1].error is None
+        assert len(results[1].voxel_grid) == len(ref)
+        assert stats.nb_plants == 2
+        assert stats.nb_errors == 1
+
+    # Same basenames are written in different files only with output_names
+    with pytest.raises(ValueError):
+        phm_mvr.reconstruction_3d_batch(
+            [plant_1_dir, plant_1_dir], calibrations, output_dir=output_dir,
+            with_ref_view=False, voxels_size=16)
+
+    results, stats = phm_mvr.reconstruction_3d_batch(
+        [plant_1_dir, plant_1_dir], calibrations, output_dir=output_dir,
+        with_ref_view=False, voxels_size=16, output_names=["day_1", "day_2"])
+    assert [r.filename for r in results] == [
+        os.path.join(output_dir, "day_1.npz"),
+        os.path.join(output_dir, "day_2.npz")]
+
+
 if __name__ == "__main__":
 
     for func_name in dir():
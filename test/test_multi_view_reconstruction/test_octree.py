@@ -12,6 +12,7 @@
 from __future__ import division, print_function
 
 import os
+import numpy
 
 import openalea.phenomenal.object as phm_obj
 # ==============================================================================
@@ -94,6 +95,103 @@ def test_octree_4():
     print(octree.root.sons[0])
 
 
+def build_octrees():
+    world_coordinate = (0, 0, 0)
+    voxel_size = 16
+
+    octree = phm_obj.VoxelOctree.from_position(world_coordinate,
+                                               voxel_size,
+                                               True)
+    linear_octree = phm_obj.VoxelLinearOctree.from_position(world_coordinate,
+                                                            voxel_size,
+                                                            True)
+
+    leafs = [octree.root]
+    for level in range(3):
+        sons = list()
+        for leaf in leafs:
+            sons.extend(leaf.creates_sons())
+        for son in sons:
+            x, y, z = son.position
+            son.data = bool(x < 4 and y + z > -6)
+        leafs = [son for son in sons if son.data]
+
+        positions = linear_octree.creates_sons(
+            mask=linear_octree.get_level_data(level))
+        linear_octree.set_level_data(
+            level + 1,
+            (positions[:, 0] < 4) & (positions[:, 1] + positions[:, 2] > -6))
+
+    return octree, linear_octree
+
+
+def test_linear_octree():
+    octree, linear_octree = build_octrees()
+
+    assert linear_octree.depth() == 3
+    assert len(linear_octree) == len(octree.get_voxel_nodes())
+
+    for voxels_size in (8, 4, 2):
+        ref = numpy.array(octree.get_voxel_point_cloud(
+            voxels_size).voxels_position)
+        res = linear_octree.get_voxel_point_cloud(voxels_size).voxels_position
+        assert sorted(map(tuple, ref)) == sorted(map(tuple, res))
+
+        ref = octree.get_voxels_position(voxels_size)
+        res = linear_octree.get_voxels_position(voxels_size)
+        assert sorted(map(tuple, ref)) == sorted(map(tuple, res))
+
+    ref = sorted((leaf.position, leaf.size, leaf.data)
+                 for leaf in octree.get_leafs())
+    res = sorted((leaf.position, leaf.size, leaf.data)
+                 for leaf in linear_octree.get_leafs())
+    assert ref == res
+
+
+def test_linear_octree_query():
+    octree, linear_octree = build_octrees()
+
+    node = linear_octree.get_node_position((-6.0, -2.0, 2.0))
+    assert node.size == 4
+    assert node.position == (-6.0, -2.0, 2.0)
+    assert node.is_leaf is False
+    assert linear_octree.get_node_position((-6.5, -2.0, 2.0)) is None
+
+    leaf = linear_octree.get_leaf_with_position((-6.5, -2.2, 2.9))
+    assert leaf.size == 2
+    assert leaf.position == (-7.0, -3.0, 3.0)
+
+    leaf = linear_octree.get_leaf_with_position((6.0, 6.0, 6.0))
+    assert leaf.size == 8
+    assert leaf.data is False
+
+    assert linear_octree.get_leaf_with_position((10.0, 0.0, 0.0)) is None
+    assert len(linear_octree.get_neighbors_leaf((-3.0, -3.0, 3.0), 2)) == 26
+    assert linear_octree.is_surrounded((-3.0, 5.0, 5.0), 2)
+    assert not linear_octree.is_surrounded((-7.0, -7.0, -7.0), 2)
+
+
+def test_linear_octree_json():
+    octree, linear_octree = build_octrees()
+
+    linear_octree.write_to_json("test.json")
+    res = phm_obj.VoxelOctree.read_from_json("test.json")
+    os.remove("test.json")
+    assert (sorted(map(tuple, res.get_voxels_position(2))) ==
+            sorted(map(tuple, octree.get_voxels_position(2))))
+
+    octree.write_to_json("test.json")
+    res = phm_obj.VoxelLinearOctree.read_from_json("test.json")
+    os.remove("test.json")
+    assert numpy.array_equal(res.get_voxels_position(2),
+                             linear_octree.get_voxels_position(2))
+
+    res = phm_obj.VoxelLinearOctree.from_voxel_octree(
+        linear_octree.to_voxel_octree())
+    assert numpy.array_equal(res.get_voxels_position(2),
+                             linear_octree.get_voxels_position(2))
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
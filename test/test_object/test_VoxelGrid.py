@@ -24,7 +24,7 @@ def test_read_write():
     voxels_position = numpy.array(list(numpy.ndindex((10, 15, 5)))) * 16
     src_vg = phm_obj.VoxelGrid(voxels_position, voxels_size)
 
-    for ext in ('npz', 'json', 'csv'):
+    for ext in ('npz', 'json', 'csv', 'vxg'):
         filename = 'test.' + ext
         src_vg.write(filename)
         dist_vg = phm_obj.VoxelGrid.read(filename)
@@ -34,6 +34,194 @@ def test_read_write():
         assert (src_vg.voxels_position == dist_vg.voxels_position).all()
 
 
+def test_compact():
+
+    voxels_size = 4
+    voxels_position = (numpy.array(list(numpy.ndindex((10, 15, 5)))) * 4 +
+                       numpy.array([-102.0, 6.0, 2.0]))
+    src_vg = phm_obj.VoxelGrid(voxels_position, voxels_size)
+    vg = src_vg.to_compact()
+
+    assert vg.is_compact
+    assert vg.voxels_index.dtype == numpy.int16
+    assert len(vg) == len(src_vg)
+    assert vg.volume() == src_vg.volume()
+    assert vg.bounding_box() == src_vg.bounding_box()
+    assert numpy.array_equal(vg.voxels_position, voxels_position)
+    assert numpy.array_equal(vg.to_float().voxels_position, voxels_position)
+    assert numpy.array_equal(vg.to_image_3d(), src_vg.to_image_3d())
+
+    # The float positions are not kept after a read, only the index
+    assert vg._voxels_position is None
+
+    vg.voxels_position = voxels_position[:10]
+    assert not vg.is_compact
+    assert len(vg) == 10
+    assert numpy.array_equal(vg.voxels_position, voxels_position[:10])
+
+    vg = src_vg.to_compact()
+    vg.voxels_size = 2
+    assert not vg.is_compact
+    assert numpy.array_equal(vg.voxels_position, voxels_position)
+
+    vg = phm_obj.VoxelGrid.from_image_3d(src_vg.to_image_3d(), compact=True)
+    assert vg.is_compact
+    assert numpy.array_equal(vg.voxels_position, voxels_position)
+
+    for ext in ('npz', 'json', 'csv', 'vxg'):
+        filename = 'test.' + ext
+        vg.write(filename)
+        dist_vg = phm_obj.VoxelGrid.read(filename)
+        os.remove(filename)
+
+        assert (dist_vg.voxels_position == voxels_position).all()
+
+    try:
+        phm_obj.VoxelGrid(voxels_position + 0.5, 4).to_compact(
+            origin=(0, 0, 0))
+        assert False
+    except ValueError:
+        pass
+
+
+
+def test_read_write_vxg():
+    filename = 'test.vxg'
+    voxels_position = (numpy.array(list(numpy.ndindex((10, 15, 5)))) * 4 +
+                       numpy.array([-102.0, 6.0, 2.0]))
+
+    # Positions on a lattice are stored as int16 index and mapped
+    phm_obj.VoxelGrid(voxels_position, 4).write(filename)
+    vg = phm_obj.VoxelGrid.read(filename)
+    assert vg.is_compact
+    assert isinstance(vg.voxels_index, numpy.memmap)
+    assert vg.voxels_index.dtype == numpy.int16
+    assert vg.voxels_size == 4
+    assert numpy.array_equal(vg.voxels_position, voxels_position)
+    del vg
+
+    vg = phm_obj.VoxelGrid.read_from_vxg(filename, mmap_mode=None)
+    assert not isinstance(vg.voxels_index, numpy.memmap)
+    assert numpy.array_equal(vg.voxels_position, voxels_position)
+
+    # int32 index
+    voxels_index = numpy.array([[0, 0, 0], [100000, -5, 3]], dtype=numpy.int32)
+    phm_obj.VoxelGrid.from_voxels_index(
+        voxels_index, 2, origin=(1.0, 2.0, 3.0)).write(filename)
+    vg = phm_obj.VoxelGrid.read(filename)
+    assert vg.voxels_index.dtype == numpy.int32
+    assert numpy.array_equal(vg.voxels_index, voxels_index)
+    assert numpy.array_equal(vg.origin, (1.0, 2.0, 3.0))
+    del vg
+
+    # Positions out of a lattice are stored as float64
+    phm_obj.VoxelGrid(voxels_position + [0.0, 0.0, 0.3], 3).write(filename)
+    vg = phm_obj.VoxelGrid.read(filename)
+    assert not vg.is_compact
+    assert numpy.array_equal(vg.voxels_position,
+                             voxels_position + [0.0, 0.0, 0.3])
+    del vg
+
+    # Empty grid
+    phm_obj.VoxelGrid(numpy.zeros((0, 3)), 4).write(filename)
+    assert len(phm_obj.VoxelGrid.read(filename)) == 0
+
+    with open(filename, 'wb') as f:
+        f.write(b"not a voxel grid")
+    try:
+        phm_obj.VoxelGrid.read(filename)
+        assert False
+    except ValueError:
+        pass
+
+    os.remove(filename)
+
+
+def test_to_image_3d_sparse():
+    rs = numpy.random.RandomState(0)
+    voxels_index = numpy.argwhere(rs.rand(70, 40, 90) < 0.05)
+    vg = phm_obj.VoxelGrid(voxels_index * 4.0 + [-150, 2, 7], 4)
+
+    image_3d = vg.to_image_3d()
+    assert image_3d.dtype == numpy.bool_
+    assert numpy.allclose(image_3d.world_coordinate,
+                          vg.bounding_box()[0])
+
+    for src_vg in (vg, vg.to_compact()):
+        sparse = src_vg.to_image_3d(sparse=True, brick_size=16)
+        assert isinstance(sparse, phm_obj.BrickImage3D)
+        assert sparse.shape == image_3d.shape
+        assert numpy.array_equal(sparse.to_image_3d(), image_3d)
+        assert numpy.allclose(sparse.world_coordinate,
+                              image_3d.world_coordinate)
+
+    roi = sparse[5:40, -30:, :]
+    assert numpy.array_equal(roi, image_3d[5:40, -30:, :])
+    assert numpy.allclose(roi.world_coordinate,
+                          image_3d.world_coordinate +
+                          numpy.array([5, image_3d.shape[1] - 30, 0]) * 4)
+    assert sparse[60:50, :, :].size == 0
+
+    dst_vg = phm_obj.VoxelGrid.from_image_3d(sparse)
+    assert numpy.array_equal(
+        dst_vg.voxels_position,
+        phm_obj.VoxelGrid.from_image_3d(image_3d).voxels_position)
+
+
+def test_downsample_upsample():
+    # Voxels of 4 on the lattice of reconstruction_3d, centers (k + 0.5) * 4
+    voxels_index = numpy.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0],
+                                [0, 0, 1], [1, 0, 1], [0, 1, 1],
+                                [2, 0, 0],
+                                [-1, -3, 5]])
+    src_vg = phm_obj.VoxelGrid((voxels_index + 0.5) * 4, 4)
+
+    vg = src_vg.downsample()
+    assert vg.voxels_size == 8
+    assert numpy.array_equal(
+        vg.voxels_position,
+        (numpy.array([[-1, -2, 2], [0, 0, 0], [1, 0, 0]]) + 0.5) * 8)
+
+    vg = src_vg.downsample(mode="majority")
+    assert numpy.array_equal(vg.voxels_position, [[4, 4, 4]])
+
+    vg = src_vg.to_compact().downsample()
+    assert vg.is_compact
+    assert numpy.array_equal(vg.voxels_position,
+                             src_vg.downsample().voxels_position)
+
+    vg = src_vg.downsample(factor=4)
+    assert vg.voxels_size == 16
+    assert len(vg) == 2
+    assert len(src_vg.downsample(factor=4, origin=(-8, -8, -8))) == 3
+
+    # Upsample then downsample is the identity
+    vg = src_vg.downsample()
+    up_vg = vg.upsample()
+    assert up_vg.voxels_size == 4
+    assert len(up_vg) == 8 * len(vg)
+    assert numpy.array_equal(up_vg.downsample(mode="majority").voxels_position,
+                             vg.voxels_position)
+
+    # Voxels position given as a list
+    list_vg = phm_obj.VoxelGrid(vg.voxels_position.tolist(), 8)
+    assert numpy.array_equal(list_vg.upsample().voxels_position,
+                             up_vg.voxels_position)
+    assert numpy.array_equal(list_vg.downsample().voxels_position,
+                             vg.downsample().voxels_position)
+
+    voxel_grids = src_vg.pyramid(3)
+    assert [v.voxels_size for v in voxel_grids] == [4, 8, 16]
+
+    # Transfer of labels from the coarse grid
+    labels = numpy.array([10, 20, 30])
+    index = src_vg.coarse_index(vg)
+    assert numpy.array_equal(labels[index],
+                             [20, 20, 20, 20, 20, 20, 20, 30, 10])
+
+    index = src_vg.coarse_index(src_vg.downsample(mode="majority"))
+    assert numpy.array_equal(index, [0, 0, 0, 0, 0, 0, 0, -1, -1])
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
@@ -32,6 +32,24 @@ def test_simply_working_1():
     assert len(xx) == 488
 
 
+
+def test_sparse():
+    rs = numpy.random.RandomState(0)
+    image_3d = phm_obj.Image3D(
+        (rs.rand(50, 40, 70) < 0.9).astype(numpy.uint8), voxels_size=4)
+    image_3d[:5] = 0
+
+    im = phm_seg.remove_internal(image_3d)
+
+    voxels_index = numpy.argwhere(image_3d)
+    sparse = phm_obj.BrickImage3D.from_index(voxels_index, image_3d.shape,
+                                             voxels_size=4, brick_size=16)
+    sparse_im = phm_seg.remove_internal(sparse)
+
+    assert isinstance(sparse_im, phm_obj.BrickImage3D)
+    assert numpy.array_equal(sparse_im.to_image_3d(), im)
+    assert 0 < numpy.count_nonzero(im) < len(voxels_index)
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):